@@ -0,0 +1,71 @@
+import argparse
+import json
+import timeit
+from datetime import datetime, timedelta
+
+from pydantic import BaseModel
+
+from model import Concert, User
+from services.broker import BrokerEvent
+from services.broker.decoding import decode_event
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class LegacyConcert(Concert):
+    images: list[str]
+
+
+class LegacyBrokerEvent(BaseModel):
+    user: User
+    concerts: list[LegacyConcert]
+
+
+def make_event(concerts_count: int) -> dict:
+    concert_datetime = datetime(2026, 12, 1, 20, 0)
+    return {
+        'user': {'telegram_id': 123456789, 'creation_datetime': '2024-01-01T00:00:00'},
+        'concerts': [
+            {
+                'title': f'Concert {i}',
+                'afisha_url': f'https://afisha.yandex.ru/moscow/concert/concert-{i}',
+                'city': 'Москва',
+                'place': 'ВТБ Арена',
+                'address': 'Ленинградский проспект, 36',
+                'datetime': (concert_datetime + timedelta(days=i)).isoformat(),
+                'map_url': 'https://yandex.ru/maps/?ll=37.558970%2C55.791540&z=16',
+                'images': [f'https://avatars.mds.yandex.net/get-afishanew/{i}/{j}/orig' for j in range(8)],
+                'min_price': {'price': 2500, 'currency': 'RUB'},
+                'artists': [{'name': f'Artist {j}', 'yandex_music_id': j} for j in range(3)],
+            }
+            for i in range(concerts_count)
+        ],
+    }
+
+
+def main(number: int) -> None:
+    for concerts_count in (1, 10, 100):
+        event = make_event(concerts_count)
+        json_body = json.dumps(event).encode()
+        decoders = {
+            'legacy json': lambda: LegacyBrokerEvent.model_validate_json(json_body.decode()),
+            'json': lambda: decode_event(json_body, 'application/json', BrokerEvent),
+        }
+        if msgpack is not None:
+            msgpack_body = msgpack.packb(event)
+            decoders['msgpack'] = lambda: decode_event(msgpack_body, 'application/msgpack', BrokerEvent)
+            print(f'{concerts_count} concert(s), json {len(json_body)} bytes, msgpack {len(msgpack_body)} bytes')
+        else:
+            print(f'{concerts_count} concert(s), json {len(json_body)} bytes, msgpack is not installed')
+        for name, decoder in decoders.items():
+            seconds = min(timeit.repeat(decoder, number=number, repeat=5))
+            print(f'    {name:<12} {seconds / number * 1_000_000:10.1f} us per event')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compares decoders of broker events')
+    parser.add_argument('--number', type=int, default=1000, help='count of decodings in one measurement')
+    main(parser.parse_args().number)
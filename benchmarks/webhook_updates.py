@@ -0,0 +1,62 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+
+from aiohttp import ClientSession
+
+from settings import settings
+
+
+def load_updates(path: str, repeat: int) -> list[dict]:
+    """
+    Reads recorded updates, one json update per line. Repeated updates get new update ids.
+    """
+
+    with open(path, encoding='utf-8') as file:
+        updates = [json.loads(line) for line in file if line.strip()]
+    return [
+        {**update, 'update_id': update['update_id'] + i * len(updates)}
+        for i in range(repeat)
+        for update in updates
+    ]
+
+
+async def post_updates(url: str, secret: str, updates: list[dict], concurrency: int) -> Counter:
+    statuses: Counter = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+    headers = {'X-Telegram-Bot-Api-Secret-Token': secret} if secret else {}
+
+    async with ClientSession() as session:
+        async def post(update: dict) -> None:
+            async with semaphore:
+                async with session.post(url, json=update, headers=headers) as response:
+                    statuses[response.status] += 1
+
+        await asyncio.gather(*[post(update) for update in updates])
+    return statuses
+
+
+def main(url: str, secret: str, path: str, repeat: int, concurrency: int) -> None:
+    updates = load_updates(path, repeat)
+    started_at = time.monotonic()
+    statuses = asyncio.run(post_updates(url, secret, updates, concurrency))
+    seconds = time.monotonic() - started_at
+    print(f'{len(updates)} updates in {seconds:.2f}s, {len(updates) / seconds:.1f} updates per second')
+    for status, count in sorted(statuses.items()):
+        print(f'    status {status}: {count}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Posts recorded updates to the webhook of a locally running bot')
+    parser.add_argument('--url', type=str,
+                        default=f'http://localhost:{settings.webhook_port}{settings.webhook_path}',
+                        help='url of the webhook')
+    parser.add_argument('--secret', type=str, default=settings.webhook_secret, help='secret token of the webhook')
+    parser.add_argument('--updates', type=str, default='benchmarks/recorded_updates.jsonl',
+                        help='file of recorded updates, one json update per line')
+    parser.add_argument('--repeat', type=int, default=1, help='count of times the updates are posted')
+    parser.add_argument('--concurrency', type=int, default=10, help='maximum count of requests at once')
+    args = parser.parse_args()
+    main(args.url, args.secret, args.updates, args.repeat, args.concurrency)
@@ -0,0 +1,117 @@
+import json
+from typing import Any, Optional, Union
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.redis import KeyBuilder, DefaultKeyBuilder, RedisStorage
+from redis.asyncio import Redis
+
+FSM_KEY_BUILDER: KeyBuilder = DefaultKeyBuilder()
+
+
+class FSMAccess:
+    """
+    Direct access to FSM of users stored by aiogram's RedisStorage, for code running outside of handlers
+    and for updates that must not race with other handlers.
+    """
+
+    __redis: Redis
+    __key_builder: KeyBuilder
+    __bot_id: int
+
+    # KEYS[1] is state key, KEYS[2] is data key, ARGV[1] is new state (empty to keep current one),
+    # ARGV[2] is data the merge was made from (empty if there was no data), ARGV[3] is merged data.
+    # Data is written only if it was not changed since it was read, otherwise current data is returned.
+    # Data is merged by the client, as cjson of redis breaks empty lists and big integers.
+    __UPDATE_SCRIPT = """
+local current = redis.call('GET', KEYS[2]) or ''
+if current ~= ARGV[2] then
+    return {0, current}
+end
+if ARGV[1] ~= '' then
+    redis.call('SET', KEYS[1], ARGV[1])
+end
+redis.call('SET', KEYS[2], ARGV[3])
+return {1}
+"""
+
+    def __init__(self, redis: Redis, bot_id: int, key_builder: KeyBuilder = FSM_KEY_BUILDER) -> None:
+        """
+        :param redis: redis client of FSM storage
+        :param bot_id: id of the bot owning FSM
+        :param key_builder: key builder of FSM storage
+        """
+
+        self.__redis = redis
+        self.__key_builder = key_builder
+        self.__bot_id = bot_id
+        self.__update_script = redis.register_script(self.__UPDATE_SCRIPT)
+
+    @staticmethod
+    def from_storage(storage: RedisStorage, bot_id: int) -> 'FSMAccess':
+        return FSMAccess(redis=storage.redis, bot_id=bot_id, key_builder=storage.key_builder)
+
+    def get_user_key(self, telegram_id: int) -> StorageKey:
+        """
+        Returns key of FSM of the user in private chat with the bot.
+        """
+
+        return StorageKey(bot_id=self.__bot_id, chat_id=telegram_id, user_id=telegram_id)
+
+    async def get_data_many(self, keys: list[StorageKey]) -> list[Optional[dict[str, Any]]]:
+        """
+        Reads FSM data of many users with one request.
+
+        :param keys: keys of users FSM
+        :return: data in order of keys, None if user has no data
+        """
+
+        if len(keys) == 0:
+            return []
+        raw_data = await self.__redis.mget([self.__key_builder.build(key, 'data') for key in keys])
+        return [json.loads(data) if data is not None else None for data in raw_data]
+
+    async def update(self, key: StorageKey, state: Union[State, str, None] = None, **data: Any) -> None:
+        """
+        Atomically sets the state and fields of data, other fields of data are kept.
+
+        :param key: key of user FSM
+        :param state: new state, current state is kept if None
+        :param data: fields of data to set
+        """
+
+        await self.merge(key, data, state=state)
+
+    async def merge(self, key: StorageKey, fields: dict[str, Any], state: Union[State, str, None] = None,
+                    raw_data: Optional[str] = None) -> str:
+        """
+        Atomically sets the state and fields of data, other fields of data are kept. Fields are merged
+        into data read before, the write is retried with current data if data was changed meanwhile.
+
+        :param key: key of user FSM
+        :param fields: fields of data to set
+        :param state: new state, current state is kept if None
+        :param raw_data: data as read by the caller, empty if the user had no data, it is read first if None
+        :return: data as written
+        """
+
+        if isinstance(state, State):
+            state = state.state
+        data_key = self.__key_builder.build(key, 'data')
+        if raw_data is None:
+            raw_data = self.__decode(await self.__redis.get(data_key))
+        while True:
+            data = json.loads(raw_data) if raw_data else {}
+            data.update(fields)
+            new_raw_data = json.dumps(data)
+            result = await self.__update_script(keys=[self.__key_builder.build(key, 'state'), data_key],
+                                                args=[state or '', raw_data, new_raw_data])
+            if result[0] == 1:
+                return new_raw_data
+            raw_data = self.__decode(result[1])
+
+    @staticmethod
+    def __decode(raw_data: Union[bytes, str, None]) -> str:
+        if isinstance(raw_data, bytes):
+            return raw_data.decode('utf-8')
+        return raw_data or ''
@@ -0,0 +1,173 @@
+from typing import Callable, Dict, Any, Awaitable, Optional, cast
+
+from aiogram import Bot
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.middleware import FSMContextMiddleware
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import StateType
+from aiogram.fsm.storage.redis import RedisStorage
+from aiogram.types import TelegramObject
+
+from bot.fsm_access import FSMAccess
+
+
+class SnapshotFSMContext(FSMContext):
+    """
+    FSM context of one update, that reads state and data from storage once and writes changes back on flush.
+    State and data are read by load, under the lock of the user taken by events isolation of the dispatcher.
+    Only changed fields of data are written, atomically with the state, so fields changed meanwhile
+    by the broker listener are kept. Data is written as a whole only after set_data or clear.
+    """
+
+    __state: Optional[str]
+    __data: Optional[dict[str, Any]]
+    __raw_data: Optional[str]
+    __is_state_changed: bool
+    __changed_fields: set[str]
+    __is_data_replaced: bool
+
+    def __init__(self, context: FSMContext) -> None:
+        """
+        :param context: FSM context of the update
+        """
+
+        super().__init__(storage=context.storage, key=context.key)
+        self.__state = None
+        self.__data = None
+        self.__raw_data = None
+        self.__is_state_changed = False
+        self.__changed_fields = set()
+        self.__is_data_replaced = False
+
+    async def load(self) -> None:
+        """
+        Reads state and data of the user, with one request for redis storage.
+        """
+
+        if not isinstance(self.storage, RedisStorage):
+            self.__state = await self.storage.get_state(key=self.key)
+            self.__data = await self.storage.get_data(key=self.key)
+            return
+
+        raw_state, raw_data = await self.storage.redis.mget(
+            self.storage.key_builder.build(self.key, 'state'),
+            self.storage.key_builder.build(self.key, 'data'),
+        )
+        # Values are decoded as RedisStorage.get_state and get_data do.
+        self.__state = raw_state.decode('utf-8') if isinstance(raw_state, bytes) else raw_state
+        if isinstance(raw_data, bytes):
+            raw_data = raw_data.decode('utf-8')
+        self.__data = self.storage.json_loads(raw_data) if raw_data is not None else {}
+        # Changed fields are merged into the data as read, so the flush doesn't read it again.
+        self.__raw_data = raw_data or ''
+
+    async def set_state(self, state: StateType = None) -> None:
+        self.__state = state.state if isinstance(state, State) else state
+        self.__is_state_changed = True
+
+    async def get_state(self) -> Optional[str]:
+        return self.__state
+
+    async def set_data(self, data: Dict[str, Any]) -> None:
+        self.__data = dict(data)
+        self.__changed_fields.clear()
+        self.__is_data_replaced = True
+
+    async def get_data(self) -> Dict[str, Any]:
+        return dict(await self.__load_data())
+
+    async def update_data(self, data: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Dict[str, Any]:
+        if data:
+            kwargs.update(data)
+        current_data = await self.__load_data()
+        current_data.update(kwargs)
+        if not self.__is_data_replaced:
+            self.__changed_fields.update(kwargs)
+        return dict(current_data)
+
+    async def flush(self) -> None:
+        """
+        Writes changes to storage, so they are visible to other updates and to the broker listener.
+        Called after the handler, and by the handler for intermediate states like waiting for the user service.
+        """
+
+        if not self.__is_state_changed and not self.__changed_fields and not self.__is_data_replaced:
+            return
+
+        if not isinstance(self.storage, RedisStorage):
+            await self.__flush_to_storage()
+        elif self.__is_data_replaced:
+            await self.__flush_replaced_data(self.storage)
+        else:
+            fields = {field: self.__data[field] for field in self.__changed_fields} if self.__data else {}
+            state = self.__state if self.__is_state_changed else None
+            self.__raw_data = await FSMAccess.from_storage(self.storage, self.key.bot_id).merge(
+                self.key, fields, state=state, raw_data=self.__raw_data
+            )
+            if self.__is_state_changed and self.__state is None:
+                await self.storage.set_state(key=self.key, state=None)
+
+        self.__is_state_changed = False
+        self.__changed_fields.clear()
+        self.__is_data_replaced = False
+
+    async def __load_data(self) -> dict[str, Any]:
+        if self.__data is None:
+            self.__data = await self.storage.get_data(key=self.key)
+        return self.__data
+
+    async def __flush_to_storage(self) -> None:
+        if self.__is_state_changed:
+            await self.storage.set_state(key=self.key, state=self.__state)
+        if self.__is_data_replaced:
+            await self.storage.set_data(key=self.key, data=self.__data or {})
+        elif self.__changed_fields and self.__data is not None:
+            await self.storage.update_data(key=self.key,
+                                           data={field: self.__data[field] for field in self.__changed_fields})
+
+    async def __flush_replaced_data(self, storage: RedisStorage) -> None:
+        # Same writes as RedisStorage.set_state and set_data, sent in one request.
+        async with storage.redis.pipeline(transaction=True) as pipe:
+            if self.__is_state_changed:
+                state_key = storage.key_builder.build(self.key, 'state')
+                if self.__state is None:
+                    pipe.delete(state_key)
+                else:
+                    pipe.set(state_key, self.__state, ex=storage.state_ttl)
+            data_key = storage.key_builder.build(self.key, 'data')
+            if not self.__data:
+                pipe.delete(data_key)
+                self.__raw_data = ''
+            else:
+                self.__raw_data = storage.json_dumps(self.__data)
+                pipe.set(data_key, self.__raw_data, ex=storage.data_ttl)
+            await pipe.execute()
+
+
+class FSMSnapshotMiddleware(FSMContextMiddleware):
+    """
+    FSM middleware of the dispatcher that gives handlers a snapshot FSM context and flushes it after the handler.
+    State and data are loaded by one request under the lock of the user taken by events isolation, and the state
+    is given to filters of routers without reading it again, so an update costs a read and a write of FSM.
+    The dispatcher must be created with disable_fsm, as this middleware replaces the default one.
+    """
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        context = self.resolve_event_context(cast(Bot, data['bot']), data)
+        data['fsm_storage'] = self.storage
+        if context is None:
+            return await handler(event, data)
+
+        async with self.events_isolation.lock(key=context.key):
+            snapshot = SnapshotFSMContext(context)
+            await snapshot.load()
+            data.update({'state': snapshot, 'raw_state': await snapshot.get_state()})
+            try:
+                return await handler(event, data)
+            finally:
+                await snapshot.flush()
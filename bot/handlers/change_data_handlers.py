@@ -1,6 +1,7 @@
 import json
 import logging
 from contextlib import suppress
+from typing import Optional
 
 from aiogram import F
 from aiogram import Router
@@ -19,7 +20,7 @@ from services.user_service import (UserServiceAgent, InvalidCityException,
 from .cache_models import CacheCities, CachePlaylists
 from .constants import (TEXT_WITHOUT_COMMANDS_FILTER, INTERNAL_ERROR_DEFAULT_TEXT,
                         CHOOSE_ACTION_TEXT, MAXIMUM_CITY_LEN, MAXIMUM_LINK_LEN)
-from .user_data_manager import set_last_keyboard_id, get_last_keyboard_id
+from .user_data_manager import set_last_keyboard_id, get_last_keyboard_id, flush_state
 
 change_data_router = Router()
 
@@ -35,7 +36,7 @@ async def __send_fuzz_variant_message(city: str, variant: str, message: Message,
 
 
 @change_data_router.callback_query(MenuStates.CHANGE_DATA, F.data == KeyboardCallbackData.BACK)
-async def show_change_data_variants(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def show_change_data_variants(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str]) -> None:
     if not isinstance(callback_query.message, Message):
         return
     if callback_query.from_user is None:
@@ -43,16 +44,15 @@ async def show_change_data_variants(callback_query: CallbackQuery, state: FSMCon
     user_id = callback_query.from_user.id
     if user_id is None:
         return
-    bot_logger.info(
-        f'Got message {callback_query.message.message_id} from {user_id}-{callback_query.from_user.username}'
-        f' on state:{await state.get_state()} for show_change_data_variants')
+    bot_logger.info('Got message %s from %s-%s on state:%s for show_change_data_variants',
+                    callback_query.message.message_id, user_id, callback_query.from_user.username, raw_state)
     await state.set_state(MenuStates.MAIN_MENU)
     with suppress(TelegramBadRequest):
         await callback_query.message.edit_text(text=CHOOSE_ACTION_TEXT, reply_markup=keyboards.get_main_menu_keyboard())
 
 
 @change_data_router.callback_query(MenuStates.CHANGE_DATA, F.data == KeyboardCallbackData.ADD_CITY)
-async def add_city_text_send(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def add_city_text_send(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str]) -> None:
     if not isinstance(callback_query.message, Message):
         return
     if callback_query.from_user is None:
@@ -60,9 +60,8 @@ async def add_city_text_send(callback_query: CallbackQuery, state: FSMContext) -
     user_id = callback_query.from_user.id
     if user_id is None:
         return
-    bot_logger.info(
-        f'Got message {callback_query.message.message_id} from {user_id}-{callback_query.from_user.username}'
-        f' on state:{await state.get_state()} for add_city_text_send')
+    bot_logger.info('Got message %s from %s-%s on state:%s for add_city_text_send', callback_query.message.message_id,
+                    user_id, callback_query.from_user.username, raw_state)
 
     await state.set_state(ChangeDataStates.ENTER_NEW_CITY)
     with suppress(TelegramBadRequest):
@@ -71,7 +70,7 @@ async def add_city_text_send(callback_query: CallbackQuery, state: FSMContext) -
 
 
 @change_data_router.message(MenuStates.CHANGE_DATA)
-async def resent(message: Message, state: FSMContext) -> None:
+async def resent(message: Message, state: FSMContext, raw_state: Optional[str]) -> None:
     bot = message.bot
     if bot is None:
         return
@@ -82,8 +81,8 @@ async def resent(message: Message, state: FSMContext) -> None:
     user_id = message.from_user.id
     if user_id is None:
         return
-    bot_logger.info(f'Got message {message.message_id} from {user_id}-{message.from_user.username}'
-                    f' on state:{await state.get_state()} for resent')
+    bot_logger.info('Got message %s from %s-%s on state:%s for resent', message.message_id, user_id,
+                    message.from_user.username, raw_state)
 
     with suppress(TelegramBadRequest):
         await bot.delete_message(chat_id=message.chat.id, message_id=get_last_keyboard_id(user_data))
@@ -94,7 +93,7 @@ async def resent(message: Message, state: FSMContext) -> None:
 
 
 @change_data_router.callback_query(ChangeDataStates.ENTER_NEW_CITY, F.data == KeyboardCallbackData.CANCEL)
-async def cancel_add_city(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def cancel_add_city(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str]) -> None:
     if not isinstance(callback_query.message, Message):
         return
     if callback_query.from_user is None:
@@ -102,9 +101,8 @@ async def cancel_add_city(callback_query: CallbackQuery, state: FSMContext) -> N
     user_id = callback_query.from_user.id
     if user_id is None:
         return
-    bot_logger.info(
-        f'Got message {callback_query.message.message_id} from {user_id}-{callback_query.from_user.username}'
-        f' on state:{await state.get_state()} for cancel_add_city')
+    bot_logger.info('Got message %s from %s-%s on state:%s for cancel_add_city', callback_query.message.message_id,
+                    user_id, callback_query.from_user.username, raw_state)
     await state.set_state(MenuStates.CHANGE_DATA)
     with suppress(TelegramBadRequest):
         await callback_query.message.edit_text(text=CHOOSE_ACTION_TEXT,
@@ -112,7 +110,7 @@ async def cancel_add_city(callback_query: CallbackQuery, state: FSMContext) -> N
 
 
 @change_data_router.message(ChangeDataStates.ENTER_NEW_CITY, TEXT_WITHOUT_COMMANDS_FILTER)
-async def add_one_city(message: Message, state: FSMContext, agent: UserServiceAgent,
+async def add_one_city(message: Message, state: FSMContext, raw_state: Optional[str], agent: UserServiceAgent,
                        redis_storage: Redis) -> None:
     if message.from_user is None:
         return
@@ -124,8 +122,8 @@ async def add_one_city(message: Message, state: FSMContext, agent: UserServiceAg
         return
     city = message.text
 
-    bot_logger.info(f'Got message {message.message_id} from {user_id}-{message.from_user.username}'
-                    f' on state:{await state.get_state()} for add_one_city. City:{city}')
+    bot_logger.info('Got message %s from %s-%s on state:%s for add_one_city. City:%s', message.message_id, user_id,
+                    message.from_user.username, raw_state, city)
 
     if city is None:
         await message.answer(text='Неверный формат текста')
@@ -135,13 +133,13 @@ async def add_one_city(message: Message, state: FSMContext, agent: UserServiceAg
     user_data = await state.get_data()
 
     await state.set_state(MenuStates.WAITING)
+    await flush_state(state)
     with suppress(TelegramBadRequest):
         await bot.delete_message(chat_id=message.chat.id, message_id=get_last_keyboard_id(user_data))
 
     if len(city) > MAXIMUM_CITY_LEN:
         await message.answer(text='Слишком длинное название города')
-        bot_logger.debug(f'Too long city name for {message.message_id} of'
-                         f' {user_id}-{message.from_user.username}')
+        bot_logger.debug('Too long city name for %s of %s-%s', message.message_id, user_id, message.from_user.username)
         msg = await message.answer(text=CHOOSE_ACTION_TEXT, reply_markup=keyboards.get_change_data_keyboard())
         await set_last_keyboard_id(msg.message_id, state)
         await state.set_state(MenuStates.CHANGE_DATA)
@@ -158,42 +156,40 @@ async def add_one_city(message: Message, state: FSMContext, agent: UserServiceAg
                 cities_parsed.cities.append(city)
                 json_str = json.dumps({'cities': cities_parsed.cities})
                 await redis_storage.set(name=f'{user_id}:cities', value=json_str, ex=120)
-                bot_logger.debug(f'Update cache for {message.message_id} of'
-                                 f' {user_id}-{message.from_user.username}')
+                bot_logger.debug('Update cache for %s of %s-%s', message.message_id, user_id,
+                                 message.from_user.username)
             except Exception as e:
-                bot_logger.warning(f'Caching error for {message.message_id} of'
-                                   f' {user_id}-{message.from_user.username}. {str(e)}')
+                bot_logger.warning('Caching error for %s of %s-%s. %s', message.message_id, user_id,
+                                   message.from_user.username, e)
 
         try:
             await redis_storage.delete(f'{user_id}:concerts')
-            bot_logger.debug(f'Removed concerts cache for {message.message_id} of'
-                             f' {user_id}-{message.from_user.username}')
+            bot_logger.debug('Removed concerts cache for %s of %s-%s', message.message_id, user_id,
+                             message.from_user.username)
         except Exception as ex:
-            bot_logger.debug(f'Failed to remove concerts cache for {message.message_id} of'
-                             f' {user_id}-{message.from_user.username}. {str(ex)}')
+            bot_logger.debug('Failed to remove concerts cache for %s of %s-%s. %s', message.message_id, user_id,
+                             message.from_user.username, ex)
 
-        bot_logger.info(f'Successfully city {city} added for {message.message_id} of'
-                        f' {user_id}-{message.from_user.username}')
+        bot_logger.info('Successfully city %s added for %s of %s-%s', city, message.message_id, user_id,
+                        message.from_user.username)
     except InvalidCityException:
         await message.answer(text='Некорректно введен город или его не существует')
-        bot_logger.debug(f'Get incorrect city for {message.message_id} of'
-                         f' {user_id}-{message.from_user.username}')
+        bot_logger.debug('Get incorrect city for %s of %s-%s', message.message_id, user_id, message.from_user.username)
     except FuzzyCityException as e:
         if e.variant is not None:
-            bot_logger.debug(f'Get fuzzy city with variant:{e.variant} for {message.message_id} of'
-                             f' {user_id}-{message.from_user.username}')
+            bot_logger.debug('Get fuzzy city with variant:%s for %s of %s-%s', e.variant, message.message_id, user_id,
+                             message.from_user.username)
             await __send_fuzz_variant_message(city, e.variant, message, state)
             return
         else:
-            bot_logger.warning(f'Get fuzzy without variant for {message.message_id} of'
-                               f' {user_id}-{message.from_user.username}')
+            bot_logger.warning('Get fuzzy without variant for %s of %s-%s', message.message_id, user_id,
+                               message.from_user.username)
             await message.answer(text=INTERNAL_ERROR_DEFAULT_TEXT)
     except CityAlreadyAddedException:
         await message.answer(text='Город уже был добавлен')
-        bot_logger.debug(f'City already added for {message.message_id} of'
-                         f' {user_id}-{message.from_user.username}')
+        bot_logger.debug('City already added for %s of %s-%s', message.message_id, user_id, message.from_user.username)
     except Exception as e:
-        bot_logger.warning(f'On {message.message_id} for {user_id}-{message.from_user.username}: {str(e)}')
+        bot_logger.warning('On %s for %s-%s: %s', message.message_id, user_id, message.from_user.username, e)
         await message.answer(text=INTERNAL_ERROR_DEFAULT_TEXT)
 
     msg = await message.answer(text=CHOOSE_ACTION_TEXT, reply_markup=keyboards.get_change_data_keyboard())
@@ -202,8 +198,8 @@ async def add_one_city(message: Message, state: FSMContext, agent: UserServiceAg
 
 
 @change_data_router.callback_query(ChangeDataStates.CITY_NAME_IS_FUZZY, F.data == KeyboardCallbackData.APPLY)
-async def apply_city_variant(callback_query: CallbackQuery, state: FSMContext, agent: UserServiceAgent,
-                             redis_storage: Redis) -> None:
+async def apply_city_variant(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str],
+                             agent: UserServiceAgent, redis_storage: Redis) -> None:
     if callback_query.from_user is None:
         return
     if callback_query.message is None:
@@ -215,19 +211,19 @@ async def apply_city_variant(callback_query: CallbackQuery, state: FSMContext, a
     if bot is None:
         return
 
-    bot_logger.info(
-        f'Got message {callback_query.message.message_id} from {user_id}-{callback_query.from_user.username}'
-        f' on state:{await state.get_state()} for apply_city_variant')
+    bot_logger.info('Got message %s from %s-%s on state:%s for apply_city_variant', callback_query.message.message_id,
+                    user_id, callback_query.from_user.username, raw_state)
 
     await state.set_state(MenuStates.WAITING)
+    await flush_state(state)
 
     user_data = await state.get_data()
     city = user_data['variant']
     try:
         await agent.add_user_city(user_id, city)
 
-        bot_logger.info(f'Successfully added city:{city} for {callback_query.message.message_id} of'
-                        f' {user_id}-{callback_query.from_user.username}')
+        bot_logger.info('Successfully added city:%s for %s of %s-%s', city, callback_query.message.message_id, user_id,
+                        callback_query.from_user.username)
 
         cities: str = await redis_storage.get(f'{user_id}:cities')
         if cities is not None:
@@ -236,19 +232,19 @@ async def apply_city_variant(callback_query: CallbackQuery, state: FSMContext, a
                 cities_parsed.cities.append(city)
                 json_str = json.dumps({'cities': cities_parsed.cities})
                 await redis_storage.set(name=f'{user_id}:cities', value=json_str, ex=120)
-                bot_logger.debug(f'Update cache for {callback_query.message.message_id} of'
-                                 f' {user_id}-{callback_query.from_user.username}')
+                bot_logger.debug('Update cache for %s of %s-%s', callback_query.message.message_id, user_id,
+                                 callback_query.from_user.username)
             except Exception as e:
-                bot_logger.warning(f'Caching error for {callback_query.message.message_id} of'
-                                   f' {user_id}-{callback_query.from_user.username}. {str(e)}')
+                bot_logger.warning('Caching error for %s of %s-%s. %s', callback_query.message.message_id, user_id,
+                                   callback_query.from_user.username, e)
 
         try:
             await redis_storage.delete(f'{user_id}:concerts')
-            bot_logger.debug(f'Removed concerts cache for {callback_query.message.message_id} of'
-                             f' {user_id}-{callback_query.from_user.username}')
+            bot_logger.debug('Removed concerts cache for %s of %s-%s', callback_query.message.message_id, user_id,
+                             callback_query.from_user.username)
         except Exception as ex:
-            bot_logger.debug(f'Failed to remove concerts cache for {callback_query.message.message_id} of'
-                             f' {user_id}-{callback_query.from_user.username}. {str(ex)}')
+            bot_logger.debug('Failed to remove concerts cache for %s of %s-%s. %s', callback_query.message.message_id,
+                             user_id, callback_query.from_user.username, ex)
 
         with suppress(TelegramBadRequest):
             await bot.edit_message_text(chat_id=callback_query.message.chat.id, text='Город успешно добавлен',
@@ -264,8 +260,8 @@ async def apply_city_variant(callback_query: CallbackQuery, state: FSMContext, a
 
     except CityAlreadyAddedException:
 
-        bot_logger.debug(f'City already added for {callback_query.message.message_id} of'
-                         f' {user_id}-{callback_query.from_user.username}')
+        bot_logger.debug('City already added for %s of %s-%s', callback_query.message.message_id, user_id,
+                         callback_query.from_user.username)
 
         with suppress(TelegramBadRequest):
             await bot.edit_message_text(chat_id=callback_query.message.chat.id, text='Город уже был добавлен',
@@ -278,8 +274,8 @@ async def apply_city_variant(callback_query: CallbackQuery, state: FSMContext, a
         await state.set_data(user_data)
         await state.set_state(MenuStates.CHANGE_DATA)
     except Exception as e:
-        bot_logger.warning(f'On {callback_query.message.message_id}'
-                           f' for {user_id}-{callback_query.from_user.username}: {str(e)}')
+        bot_logger.warning('On %s for %s-%s: %s', callback_query.message.message_id, user_id,
+                           callback_query.from_user.username, e)
         with suppress(TelegramBadRequest):
             if isinstance(callback_query.message, Message):
                 await callback_query.message.edit_text(text=INTERNAL_ERROR_DEFAULT_TEXT,
@@ -287,7 +283,7 @@ async def apply_city_variant(callback_query: CallbackQuery, state: FSMContext, a
 
 
 @change_data_router.callback_query(ChangeDataStates.CITY_NAME_IS_FUZZY, F.data == KeyboardCallbackData.DENY)
-async def deny_city_variant(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def deny_city_variant(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str]) -> None:
     if not isinstance(callback_query.message, Message):
         return
     if callback_query.from_user is None:
@@ -295,9 +291,8 @@ async def deny_city_variant(callback_query: CallbackQuery, state: FSMContext) ->
     user_id = callback_query.from_user.id
     if user_id is None:
         return
-    bot_logger.info(
-        f'Got message {callback_query.message.message_id} from {user_id}-{callback_query.from_user.username}'
-        f' on state:{await state.get_state()} for deny_city_variant')
+    bot_logger.info('Got message %s from %s-%s on state:%s for deny_city_variant', callback_query.message.message_id,
+                    user_id, callback_query.from_user.username, raw_state)
     await state.set_state(MenuStates.CHANGE_DATA)
 
     user_data = await state.get_data()
@@ -310,7 +305,7 @@ async def deny_city_variant(callback_query: CallbackQuery, state: FSMContext) ->
 
 
 @change_data_router.callback_query(MenuStates.CHANGE_DATA, F.data == KeyboardCallbackData.REMOVE_CITY)
-async def show_cities_as_inline_keyboard(callback_query: CallbackQuery, state: FSMContext,
+async def show_cities_as_inline_keyboard(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str],
                                          agent: UserServiceAgent, redis_storage: Redis) -> None:
     if not isinstance(callback_query.message, Message):
         return
@@ -320,11 +315,11 @@ async def show_cities_as_inline_keyboard(callback_query: CallbackQuery, state: F
     if user_id is None:
         return
 
-    bot_logger.info(
-        f'Got message {callback_query.message.message_id} from {user_id}-{callback_query.from_user.username}'
-        f' on state:{await state.get_state()} for show_cities_as_inline_keyboard')
+    bot_logger.info('Got message %s from %s-%s on state:%s for show_cities_as_inline_keyboard',
+                    callback_query.message.message_id, user_id, callback_query.from_user.username, raw_state)
 
     await state.set_state(MenuStates.WAITING)
+    await flush_state(state)
 
     try:
         from_cache = await redis_storage.get(name=f'{user_id}:cities')
@@ -334,26 +329,26 @@ async def show_cities_as_inline_keyboard(callback_query: CallbackQuery, state: F
         if from_cache is not None:
             try:
                 cities = CacheCities.model_validate_json(from_cache).cities
-                bot_logger.debug(f'Get cached cities for {callback_query.message.message_id} of'
-                                 f' {user_id}-{callback_query.from_user.username}')
+                bot_logger.debug('Get cached cities for %s of %s-%s', callback_query.message.message_id, user_id,
+                                 callback_query.from_user.username)
                 is_got_info_from_cache = True
             except Exception as e:
-                bot_logger.warning(f'Caching error for {callback_query.message.message_id} of'
-                                   f' {user_id}-{callback_query.from_user.username}. {str(e)}')
+                bot_logger.warning('Caching error for %s of %s-%s. %s', callback_query.message.message_id, user_id,
+                                   callback_query.from_user.username, e)
 
         if not is_got_info_from_cache:
             cities = await agent.get_user_cities(user_id)
-            bot_logger.info(f'Got cities:{cities} for {callback_query.message.message_id} of'
-                            f' {user_id}-{callback_query.from_user.username}')
+            bot_logger.info('Got cities:%s for %s of %s-%s', cities, callback_query.message.message_id, user_id,
+                            callback_query.from_user.username)
 
             try:
                 json_str = json.dumps({'cities': cities})
                 await redis_storage.set(name=f'{user_id}:cities', value=json_str, ex=120)
-                bot_logger.debug(f'Put cities:{cities} in cache for {callback_query.message.message_id} of'
-                                 f' {user_id}-{callback_query.from_user.username}')
+                bot_logger.debug('Put cities:%s in cache for %s of %s-%s', cities, callback_query.message.message_id,
+                                 user_id, callback_query.from_user.username)
             except Exception as e:
-                bot_logger.warning(f'Put cities in cache error for {callback_query.message.message_id} of'
-                                   f' {user_id}-{callback_query.from_user.username}. {str(e)}')
+                bot_logger.warning('Put cities in cache error for %s of %s-%s. %s', callback_query.message.message_id,
+                                   user_id, callback_query.from_user.username, e)
 
         if len(cities) == 0:
             with suppress(TelegramBadRequest):
@@ -365,8 +360,8 @@ async def show_cities_as_inline_keyboard(callback_query: CallbackQuery, state: F
                                                        reply_markup=keyboards.get_inline_keyboard_with_back(cities))
         await state.set_state(ChangeDataStates.REMOVE_CITY)
     except Exception as e:
-        bot_logger.warning(f'On {callback_query.message.message_id}'
-                           f' for {user_id}-{callback_query.from_user.username}: {str(e)}')
+        bot_logger.warning('On %s for %s-%s: %s', callback_query.message.message_id, user_id,
+                           callback_query.from_user.username, e)
         with suppress(TelegramBadRequest):
             await callback_query.message.edit_text(text=INTERNAL_ERROR_DEFAULT_TEXT,
                                                    reply_markup=keyboards.get_back_keyboard())
@@ -374,7 +369,7 @@ async def show_cities_as_inline_keyboard(callback_query: CallbackQuery, state: F
 
 
 @change_data_router.callback_query(ChangeDataStates.REMOVE_CITY, F.data == KeyboardCallbackData.BACK)
-async def return_from_remove(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def return_from_remove(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str]) -> None:
     if not isinstance(callback_query.message, Message):
         return
     if callback_query.from_user is None:
@@ -382,9 +377,8 @@ async def return_from_remove(callback_query: CallbackQuery, state: FSMContext) -
     user_id = callback_query.from_user.id
     if user_id is None:
         return
-    bot_logger.info(
-        f'Got message {callback_query.message.message_id} from {user_id}-{callback_query.from_user.username}'
-        f' on state:{await state.get_state()} for return_from_remove')
+    bot_logger.info('Got message %s from %s-%s on state:%s for return_from_remove', callback_query.message.message_id,
+                    user_id, callback_query.from_user.username, raw_state)
     with suppress(TelegramBadRequest):
         await callback_query.message.edit_text(text=CHOOSE_ACTION_TEXT,
                                                reply_markup=keyboards.get_change_data_keyboard())
@@ -392,8 +386,8 @@ async def return_from_remove(callback_query: CallbackQuery, state: FSMContext) -
 
 
 @change_data_router.callback_query(ChangeDataStates.REMOVE_CITY, F.data != KeyboardCallbackData.BACK)
-async def remove_city(callback_query: CallbackQuery, state: FSMContext, agent: UserServiceAgent,
-                      redis_storage: Redis) -> None:
+async def remove_city(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str],
+                      agent: UserServiceAgent, redis_storage: Redis) -> None:
     if not isinstance(callback_query.message, Message):
         return
     if callback_query.from_user is None:
@@ -405,9 +399,8 @@ async def remove_city(callback_query: CallbackQuery, state: FSMContext, agent: U
     if city is None:
         return
 
-    bot_logger.info(
-        f'Got message {callback_query.message.message_id} from {user_id}-{callback_query.from_user.username}'
-        f' on state:{await state.get_state()} for remove_city. Remove city: {city}')
+    bot_logger.info('Got message %s from %s-%s on state:%s for remove_city. Remove city: %s',
+                    callback_query.message.message_id, user_id, callback_query.from_user.username, raw_state, city)
 
     bot = callback_query.bot
     if bot is None or callback_query.message is None:
@@ -415,8 +408,8 @@ async def remove_city(callback_query: CallbackQuery, state: FSMContext, agent: U
 
     try:
         await agent.delete_user_city(user_id, city)
-        bot_logger.info(f'Successfully removed city:{city} for {callback_query.message.message_id} of'
-                        f' {user_id}-{callback_query.from_user.username}')
+        bot_logger.info('Successfully removed city:%s for %s of %s-%s', city, callback_query.message.message_id,
+                        user_id, callback_query.from_user.username)
 
         cities: str = await redis_storage.get(f'{user_id}:cities')
         if cities is not None:
@@ -425,11 +418,11 @@ async def remove_city(callback_query: CallbackQuery, state: FSMContext, agent: U
                 cities_parsed.cities.remove(city)
                 json_str = json.dumps({'cities': cities_parsed.cities})
                 await redis_storage.set(name=f'{user_id}:cities', value=json_str, ex=120)
-                bot_logger.debug(f'Update cache for {callback_query.message.message_id} of'
-                                 f' {user_id}-{callback_query.from_user.username}')
+                bot_logger.debug('Update cache for %s of %s-%s', callback_query.message.message_id, user_id,
+                                 callback_query.from_user.username)
             except Exception as e:
-                bot_logger.warning(f'Caching error for {callback_query.message.message_id} of'
-                                   f' {user_id}-{callback_query.from_user.username}. {str(e)}')
+                bot_logger.warning('Caching error for %s of %s-%s. %s', callback_query.message.message_id, user_id,
+                                   callback_query.from_user.username, e)
 
         with suppress(TelegramBadRequest):
             await bot.edit_message_text(chat_id=callback_query.message.chat.id,
@@ -441,8 +434,8 @@ async def remove_city(callback_query: CallbackQuery, state: FSMContext, agent: U
         await set_last_keyboard_id(msg.message_id, state)
         await state.set_state(MenuStates.CHANGE_DATA)
     except Exception as e:
-        bot_logger.warning(f'On {callback_query.message.message_id}'
-                           f' for {user_id}-{callback_query.from_user.username}: {str(e)}')
+        bot_logger.warning('On %s for %s-%s: %s', callback_query.message.message_id, user_id,
+                           callback_query.from_user.username, e)
 
         with suppress(TelegramBadRequest):
             await bot.edit_message_text(chat_id=callback_query.message.chat.id,
@@ -456,7 +449,7 @@ async def remove_city(callback_query: CallbackQuery, state: FSMContext, agent: U
 
 
 @change_data_router.callback_query(MenuStates.CHANGE_DATA, F.data == KeyboardCallbackData.ADD_LINK)
-async def add_one_playlist_show_msg(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def add_one_playlist_show_msg(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str]) -> None:
     bot = callback_query.bot
     if bot is None or callback_query is None or callback_query.message is None:
         return
@@ -465,9 +458,8 @@ async def add_one_playlist_show_msg(callback_query: CallbackQuery, state: FSMCon
     user_id = callback_query.from_user
     if user_id is None:
         return
-    bot_logger.info(
-        f'Got message {callback_query.message.message_id} from {user_id}-{callback_query.from_user.username}'
-        f' on state:{await state.get_state()} for add_one_playlist_show_msg')
+    bot_logger.info('Got message %s from %s-%s on state:%s for add_one_playlist_show_msg',
+                    callback_query.message.message_id, user_id, callback_query.from_user.username, raw_state)
 
     await state.set_state(ChangeDataStates.ENTER_NEW_PLAYLIST)
     with suppress(TelegramBadRequest):
@@ -478,7 +470,8 @@ async def add_one_playlist_show_msg(callback_query: CallbackQuery, state: FSMCon
 
 
 @change_data_router.message(ChangeDataStates.ENTER_NEW_PLAYLIST, TEXT_WITHOUT_COMMANDS_FILTER)
-async def add_one_playlist(message: Message, state: FSMContext, agent: UserServiceAgent, redis_storage: Redis) -> None:
+async def add_one_playlist(message: Message, state: FSMContext, raw_state: Optional[str], agent: UserServiceAgent,
+                           redis_storage: Redis) -> None:
     bot = message.bot
     if bot is None:
         return
@@ -489,20 +482,20 @@ async def add_one_playlist(message: Message, state: FSMContext, agent: UserServi
     user_id = message.from_user.id
     if user_id is None:
         return
-    bot_logger.info(f'Got message {message.message_id} from {user_id}-{message.from_user.username}'
-                    f' on state:{await state.get_state()} for add_one_playlist. Link: {link}')
+    bot_logger.info('Got message %s from %s-%s on state:%s for add_one_playlist. Link: %s', message.message_id, user_id,
+                    message.from_user.username, raw_state, link)
     if link is None:
         await message.answer(text='Неверный формат текста')
-        bot_logger.debug(f'Incorrect text format for {message.message_id} of'
-                         f' {user_id}-{message.from_user.username}')
+        bot_logger.debug('Incorrect text format for %s of %s-%s', message.message_id, user_id,
+                         message.from_user.username)
         return
     with suppress(TelegramBadRequest):
         await bot.delete_message(chat_id=message.chat.id, message_id=get_last_keyboard_id(user_data))
     await state.set_state(MenuStates.WAITING)
+    await flush_state(state)
     if len(link) > MAXIMUM_LINK_LEN:
         await message.answer(text='Слишком длинная ссылка')
-        bot_logger.debug(f'Too long link for {message.message_id} of'
-                         f' {user_id}-{message.from_user.username}')
+        bot_logger.debug('Too long link for %s of %s-%s', message.message_id, user_id, message.from_user.username)
         msg = await message.answer(text=CHOOSE_ACTION_TEXT, reply_markup=keyboards.get_change_data_keyboard())
         await set_last_keyboard_id(msg.message_id, state)
         await state.set_state(MenuStates.CHANGE_DATA)
@@ -510,8 +503,8 @@ async def add_one_playlist(message: Message, state: FSMContext, agent: UserServi
 
     try:
         track_list = await agent.add_user_track_list(user_id, link)
-        bot_logger.debug(f'Successfully added track-list:{track_list} for {message.message_id} of'
-                         f' {user_id}-{message.from_user.username}')
+        bot_logger.debug('Successfully added track-list:%s for %s of %s-%s', track_list, message.message_id, user_id,
+                         message.from_user.username)
 
         track_lists: str = await redis_storage.get(f'{user_id}:track-lists')
         if track_lists is not None:
@@ -524,31 +517,30 @@ async def add_one_playlist(message: Message, state: FSMContext, agent: UserServi
                 track_lists_parsed.track_lists.append(track_list_parsed)
                 json_str = CachePlaylists(track_lists=track_lists_parsed.track_lists).model_dump_json()
                 await redis_storage.set(name=f'{user_id}:track-lists', value=json_str, ex=120)
-                bot_logger.debug(f'Update cache for {message.message_id} of'
-                                 f' {user_id}-{message.from_user.username}')
+                bot_logger.debug('Update cache for %s of %s-%s', message.message_id, user_id,
+                                 message.from_user.username)
             except Exception as e:
-                bot_logger.warning(f'Caching error for {message.message_id} of'
-                                   f' {user_id}-{message.from_user.username}. {str(e)}')
+                bot_logger.warning('Caching error for %s of %s-%s. %s', message.message_id, user_id,
+                                   message.from_user.username, e)
 
         try:
             await redis_storage.delete(f'{user_id}:concerts')
-            bot_logger.debug(f'Removed concerts cache for {message.message_id} of'
-                             f' {user_id}-{message.from_user.username}')
+            bot_logger.debug('Removed concerts cache for %s of %s-%s', message.message_id, user_id,
+                             message.from_user.username)
         except Exception as ex:
-            bot_logger.debug(f'Failed to remove concerts cache for {message.message_id} of'
-                             f' {user_id}-{message.from_user.username}. {str(ex)}')
+            bot_logger.debug('Failed to remove concerts cache for %s of %s-%s. %s', message.message_id, user_id,
+                             message.from_user.username, ex)
 
         await message.answer(text=f'Трек-лист {track_list.title} успешно добавлен')
     except TrackListAlreadyAddedException:
         await message.answer(text='Трек-лист уже был добавлен')
-        bot_logger.debug(f'Track-list already added for {message.message_id} of'
-                         f' {user_id}-{message.from_user.username}')
+        bot_logger.debug('Track-list already added for %s of %s-%s', message.message_id, user_id,
+                         message.from_user.username)
     except InvalidTrackListException:
         await message.answer(text='Ссылка недействительна')
-        bot_logger.debug(f'Invalid track-list for {message.message_id} of'
-                         f' {user_id}-{message.from_user.username}')
+        bot_logger.debug('Invalid track-list for %s of %s-%s', message.message_id, user_id, message.from_user.username)
     except Exception as e:
-        bot_logger.warning(f'On {message.message_id} for {user_id}-{message.from_user.username}: {str(e)}')
+        bot_logger.warning('On %s for %s-%s: %s', message.message_id, user_id, message.from_user.username, e)
         await message.answer(text=INTERNAL_ERROR_DEFAULT_TEXT)
 
     msg = await message.answer(text=CHOOSE_ACTION_TEXT, reply_markup=keyboards.get_change_data_keyboard())
@@ -557,7 +549,7 @@ async def add_one_playlist(message: Message, state: FSMContext, agent: UserServi
 
 
 @change_data_router.callback_query(ChangeDataStates.ENTER_NEW_PLAYLIST, F.data == KeyboardCallbackData.CANCEL)
-async def return_from_add_playlist(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def return_from_add_playlist(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str]) -> None:
     if not isinstance(callback_query.message, Message):
         return
     if callback_query.from_user is None:
@@ -565,9 +557,8 @@ async def return_from_add_playlist(callback_query: CallbackQuery, state: FSMCont
     user_id = callback_query.from_user.id
     if user_id is None:
         return
-    bot_logger.info(
-        f'Got message {callback_query.message.message_id} from {user_id}-{callback_query.from_user.username}'
-        f' on state:{await state.get_state()} for return_from_add_playlist')
+    bot_logger.info('Got message %s from %s-%s on state:%s for return_from_add_playlist',
+                    callback_query.message.message_id, user_id, callback_query.from_user.username, raw_state)
     await state.set_state(MenuStates.CHANGE_DATA)
     with suppress(TelegramBadRequest):
         await callback_query.message.edit_text(text=CHOOSE_ACTION_TEXT,
@@ -575,7 +566,7 @@ async def return_from_add_playlist(callback_query: CallbackQuery, state: FSMCont
 
 
 @change_data_router.callback_query(MenuStates.CHANGE_DATA, F.data == KeyboardCallbackData.REMOVE_LINK)
-async def show_playlists_as_inline_keyboard(callback_query: CallbackQuery, state: FSMContext,
+async def show_playlists_as_inline_keyboard(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str],
                                             agent: UserServiceAgent, redis_storage: Redis) -> None:
     if not isinstance(callback_query.message, Message):
         return
@@ -589,11 +580,11 @@ async def show_playlists_as_inline_keyboard(callback_query: CallbackQuery, state
     if user_id is None:
         return
 
-    bot_logger.info(
-        f'Got message {callback_query.message.message_id} from {user_id}-{callback_query.from_user.username}'
-        f' on state:{await state.get_state()} for show_playlists_as_inline_keyboard')
+    bot_logger.info('Got message %s from %s-%s on state:%s for show_playlists_as_inline_keyboard',
+                    callback_query.message.message_id, user_id, callback_query.from_user.username, raw_state)
 
     await state.set_state(MenuStates.WAITING)
+    await flush_state(state)
 
     try:
 
@@ -603,21 +594,21 @@ async def show_playlists_as_inline_keyboard(callback_query: CallbackQuery, state
         if from_cache is not None:
             try:
                 playlists = CachePlaylists.model_validate_json(from_cache).track_lists
-                bot_logger.debug(f'Got playlists:{playlists} from cache for {callback_query.message.message_id} of'
-                                 f' {user_id}-{callback_query.from_user.username}')
+                bot_logger.debug('Got playlists:%s from cache for %s of %s-%s', playlists,
+                                 callback_query.message.message_id, user_id, callback_query.from_user.username)
                 is_got_info_from_cache = True
             except Exception as ex:
-                bot_logger.warning(f'On {callback_query.message.message_id}'
-                                   f' for {user_id}-{callback_query.from_user.username}: {str(ex)}')
+                bot_logger.warning('On %s for %s-%s: %s', callback_query.message.message_id, user_id,
+                                   callback_query.from_user.username, ex)
         if not is_got_info_from_cache:
             playlists = await agent.get_user_track_lists(user_id)
             json_str = CachePlaylists(track_lists=playlists).model_dump_json()
             await redis_storage.set(name=f'{user_id}:track-lists', value=json_str, ex=120)
-            bot_logger.debug(f'Put playlists:{playlists} on cache for {callback_query.message.message_id} of'
-                             f' {user_id}-{callback_query.from_user.username}')
+            bot_logger.debug('Put playlists:%s on cache for %s of %s-%s', playlists, callback_query.message.message_id,
+                             user_id, callback_query.from_user.username)
 
-        bot_logger.debug(f'Got track-lists:{playlists} for {callback_query.message.message_id} of'
-                         f' {user_id}-{callback_query.from_user.username}')
+        bot_logger.debug('Got track-lists:%s for %s of %s-%s', playlists, callback_query.message.message_id, user_id,
+                         callback_query.from_user.username)
         if len(playlists) == 0:
             with suppress(TelegramBadRequest):
                 await callback_query.message.edit_text(text='У вас не указан ни один трек-лист',
@@ -640,8 +631,8 @@ async def show_playlists_as_inline_keyboard(callback_query: CallbackQuery, state
             await state.update_data(playlists=CachePlaylists(track_lists=playlists).model_dump_json())
         await state.set_state(ChangeDataStates.REMOVE_PLAYLIST)
     except Exception as e:
-        bot_logger.warning(f'On {callback_query.message.message_id}'
-                           f' for {user_id}-{callback_query.from_user.username}: {str(e)}')
+        bot_logger.warning('On %s for %s-%s: %s', callback_query.message.message_id, user_id,
+                           callback_query.from_user.username, e)
         with suppress(TelegramBadRequest):
             await callback_query.message.edit_text(text=INTERNAL_ERROR_DEFAULT_TEXT,
                                                    reply_markup=keyboards.get_back_keyboard())
@@ -649,7 +640,8 @@ async def show_playlists_as_inline_keyboard(callback_query: CallbackQuery, state
 
 
 @change_data_router.callback_query(ChangeDataStates.REMOVE_PLAYLIST, F.data == KeyboardCallbackData.BACK)
-async def return_from_remove_playlist(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def return_from_remove_playlist(callback_query: CallbackQuery, state: FSMContext,
+                                      raw_state: Optional[str]) -> None:
     if not isinstance(callback_query.message, Message):
         return
     if callback_query.from_user is None:
@@ -657,9 +649,8 @@ async def return_from_remove_playlist(callback_query: CallbackQuery, state: FSMC
     user_id = callback_query.from_user.id
     if user_id is None:
         return
-    bot_logger.info(
-        f'Got message {callback_query.message.message_id} from {user_id}-{callback_query.from_user.username}'
-        f' on state:{await state.get_state()} for return_from_remove_playlist')
+    bot_logger.info('Got message %s from %s-%s on state:%s for return_from_remove_playlist',
+                    callback_query.message.message_id, user_id, callback_query.from_user.username, raw_state)
     await state.set_state(MenuStates.CHANGE_DATA)
     with suppress(TelegramBadRequest):
         await callback_query.message.edit_text(text=CHOOSE_ACTION_TEXT,
@@ -667,8 +658,8 @@ async def return_from_remove_playlist(callback_query: CallbackQuery, state: FSMC
 
 
 @change_data_router.callback_query(ChangeDataStates.REMOVE_PLAYLIST, F.data != KeyboardCallbackData.BACK)
-async def remove_playlist(callback_query: CallbackQuery, state: FSMContext, agent: UserServiceAgent,
-                          redis_storage: Redis) -> None:
+async def remove_playlist(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str],
+                          agent: UserServiceAgent, redis_storage: Redis) -> None:
     playlist = callback_query.data
     if playlist is None:
         return
@@ -681,19 +672,19 @@ async def remove_playlist(callback_query: CallbackQuery, state: FSMContext, agen
     if user_id is None:
         return
 
-    bot_logger.info(
-        f'Got message {callback_query.message.message_id} from {user_id}-{callback_query.from_user.username}'
-        f' on state:{await state.get_state()} for remove_playlist. Playlist:{playlist}')
+    bot_logger.info('Got message %s from %s-%s on state:%s for remove_playlist. Playlist:%s',
+                    callback_query.message.message_id, user_id, callback_query.from_user.username, raw_state, playlist)
 
     await state.set_state(MenuStates.WAITING)
+    await flush_state(state)
     try:
         user_data = await state.get_data()
         playlist_pos = int(playlist)
         playlists = CachePlaylists.model_validate_json(user_data['playlists']).track_lists
         url = playlists[playlist_pos].url
         await agent.delete_user_track_list(user_id, url)
-        bot_logger.debug(f'Successfully removed track-list:{playlist} for {callback_query.message.message_id} of'
-                         f' {user_id}-{callback_query.from_user.username}')
+        bot_logger.debug('Successfully removed track-list:%s for %s of %s-%s', playlist,
+                         callback_query.message.message_id, user_id, callback_query.from_user.username)
 
         track_lists: str = await redis_storage.get(f'{user_id}:track-lists')
         if track_lists is not None:
@@ -705,11 +696,11 @@ async def remove_playlist(callback_query: CallbackQuery, state: FSMContext, agen
 
                 json_str = CachePlaylists(track_lists=track_lists_parsed.track_lists).model_dump_json()
                 await redis_storage.set(name=f'{user_id}:track-lists', value=json_str, ex=120)
-                bot_logger.debug(f'Update cache for {callback_query.message.message_id} of'
-                                 f' {user_id}-{callback_query.from_user.username}')
+                bot_logger.debug('Update cache for %s of %s-%s', callback_query.message.message_id, user_id,
+                                 callback_query.from_user.username)
             except Exception as e:
-                bot_logger.warning(f'Caching error for {callback_query.message.message_id} of'
-                                   f' {user_id}-{callback_query.from_user.username}. {str(e)}')
+                bot_logger.warning('Caching error for %s of %s-%s. %s', callback_query.message.message_id, user_id,
+                                   callback_query.from_user.username, e)
 
         with suppress(TelegramBadRequest):
             await bot.edit_message_text(chat_id=callback_query.message.chat.id,
@@ -726,8 +717,8 @@ async def remove_playlist(callback_query: CallbackQuery, state: FSMContext, agen
 
         await state.set_state(MenuStates.CHANGE_DATA)
     except Exception as e:
-        bot_logger.warning(f'On {callback_query.message.message_id}'
-                           f' for {user_id}-{callback_query.from_user.username}: {str(e)}')
+        bot_logger.warning('On %s for %s-%s: %s', callback_query.message.message_id, user_id,
+                           callback_query.from_user.username, e)
 
         with suppress(TelegramBadRequest):
             await bot.edit_message_text(chat_id=callback_query.message.chat.id,
@@ -1,4 +1,5 @@
 import logging
+from typing import Optional
 
 from aiogram import Router
 from aiogram.filters import CommandStart, Command
@@ -7,6 +8,7 @@ from aiogram.types import Message, ReplyKeyboardRemove
 
 from bot.keyboards import get_location_keyboard_markup, get_main_menu_keyboard
 from bot.states import RegistrationStates, MenuStates
+from notifications import BlockedUsers
 from services.user_service import UserServiceAgent, UserAlreadyExistsException
 from .constants import INTERNAL_ERROR_DEFAULT_TEXT, CHOOSE_ACTION_TEXT
 from .user_data_manager import get_last_keyboard_id, set_last_keyboard_id
@@ -17,22 +19,24 @@ bot_logger = logging.getLogger('bot')
 
 
 @common_router.message(CommandStart())
-async def command_start(message: Message, state: FSMContext, agent: UserServiceAgent) -> None:
+async def command_start(message: Message, state: FSMContext, raw_state: Optional[str], agent: UserServiceAgent,
+                        blocked_users: BlockedUsers) -> None:
 
 
     if message.from_user is None:
         return
     user_id = message.from_user.id
+    await blocked_users.unblock(user_id)
 
-    bot_logger.info(f'Got message {message.message_id} from {user_id}-{message.from_user.username}'
-                    f' on state:{await state.get_state()} for command_start')
+    bot_logger.info('Got message %s from %s-%s on state:%s for command_start', message.message_id, user_id,
+                    message.from_user.username, raw_state)
 
-    if await state.get_state() in RegistrationStates:
-        bot_logger.info(f'Get command start on registration: recreation for {user_id}-{message.from_user.username}')
+    if raw_state in RegistrationStates:
+        bot_logger.info('Get command start on registration: recreation for %s-%s', user_id, message.from_user.username)
         try:
             await agent.delete_user(user_id)
         except Exception as ex:
-            bot_logger.warning(f'On {message.message_id} for {user_id}-{message.from_user.username}: {str(ex)}')
+            bot_logger.warning('On %s for %s-%s: %s', message.message_id, user_id, message.from_user.username, ex)
             await message.answer(text=INTERNAL_ERROR_DEFAULT_TEXT)
             return
 
@@ -47,8 +51,8 @@ async def command_start(message: Message, state: FSMContext, agent: UserServiceA
         await state.update_data(is_first_city=True)
         await set_last_keyboard_id(-1, state)
         await state.set_state(RegistrationStates.ADD_FIRST_CITY)
-        bot_logger.info(f'Get command start {message.message_id} on registration for'
-                        f' {user_id}-{message.from_user.username}')
+        bot_logger.info('Get command start %s on registration for %s-%s', message.message_id, user_id,
+                        message.from_user.username)
     except UserAlreadyExistsException:
         await message.answer(text=f'Привет, {message.from_user.username},'
                                   f' мы вас помним, вы уже регистрировались',
@@ -64,11 +68,12 @@ async def command_start(message: Message, state: FSMContext, agent: UserServiceA
                 logging.log(level=logging.ERROR, msg=str(ex))
 
         msg = await message.answer(CHOOSE_ACTION_TEXT, reply_markup=get_main_menu_keyboard())
-        bot_logger.info(f'Get command {message.message_id} start on menu for {user_id}-{message.from_user.username}')
+        bot_logger.info('Get command %s start on menu for %s-%s', message.message_id, user_id,
+                        message.from_user.username)
         await set_last_keyboard_id(msg.message_id, state)
 
     except Exception as e:
-        bot_logger.warning(f'On {message.message_id} for {user_id}-{message.from_user.username}: {str(e)}')
+        bot_logger.warning('On %s for %s-%s: %s', message.message_id, user_id, message.from_user.username, e)
         await message.answer(text=INTERNAL_ERROR_DEFAULT_TEXT)
 
 
@@ -0,0 +1,82 @@
+import uuid
+from typing import Optional
+
+from redis.asyncio import Redis
+
+CONCERTS_PAGE_SIZE = 5
+
+
+class ConcertPages:
+    """
+    Rendered concerts shown to a user page by page, stored in a redis list of the user for a while.
+    Every list has its own generation id, so a page of a replaced list is never shown.
+    FSM of the user keeps only the generation id, pages are turned by buttons encoding the page and the generation.
+    """
+
+    __redis: Redis
+    __ttl: int
+    __page_size: int
+
+    def __init__(self, redis: Redis, ttl: int = 60 * 60, page_size: int = CONCERTS_PAGE_SIZE) -> None:
+        """
+        :param redis: redis client of the bot
+        :param ttl: seconds to keep the list of concerts
+        :param page_size: count of concerts on a page
+        """
+
+        self.__redis = redis
+        self.__ttl = ttl
+        self.__page_size = page_size
+
+    async def save(self, user_id: int, concerts: list[str], previous_generation: Optional[str] = None) -> str:
+        """
+        Stores the list of rendered concerts of the user.
+
+        :param user_id: telegram id of the user
+        :param concerts: rendered concerts
+        :param previous_generation: generation id of the list shown before, it is removed
+        :return: generation id of the list
+        """
+
+        generation = uuid.uuid4().hex[:12]
+        key = self.__get_key(user_id, generation)
+        async with self.__redis.pipeline(transaction=True) as pipe:
+            if previous_generation is not None:
+                pipe.delete(self.__get_key(user_id, previous_generation))
+            if len(concerts) != 0:
+                pipe.rpush(key, *concerts)
+                pipe.expire(key, self.__ttl)
+            await pipe.execute()
+        return generation
+
+    async def get_page(self, user_id: int, generation: str, page: int) -> list[str]:
+        """
+        :return: rendered concerts of the page, empty if the list expired
+        """
+
+        start = page * self.__page_size
+        concerts = await self.__redis.lrange(self.__get_key(user_id, generation), start, start + self.__page_size - 1)
+        return [concert.decode() if isinstance(concert, bytes) else concert for concert in concerts]
+
+    async def remove(self, user_id: int, generation: str) -> None:
+        await self.__redis.delete(self.__get_key(user_id, generation))
+
+    def get_pages_count(self, concerts_count: int) -> int:
+        return max(1, (concerts_count + self.__page_size - 1) // self.__page_size)
+
+    def render_page(self, concerts: list[str], page: int, pages_count: int) -> str:
+        """
+        :param concerts: rendered concerts of the page
+        :param page: index of the page from 0
+        :param pages_count: count of pages of the list
+        """
+
+        page_txt = ''
+        for i, concert in enumerate(concerts, start=page * self.__page_size):
+            page_txt += f'{i + 1}\n{concert}\n\n'
+        page_txt += f'Страница {page + 1} из {pages_count}'
+        return page_txt
+
+    @staticmethod
+    def __get_key(user_id: int, generation: str) -> str:
+        return f'{user_id}:concert-pages:{generation}'
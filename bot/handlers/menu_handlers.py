@@ -1,31 +1,33 @@
 import json
 import logging
 from contextlib import suppress
-from typing import List
+from typing import List, Optional
 
 from aiogram import Router, F
 from aiogram.enums import ParseMode
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
-from aiogram.types import CallbackQuery, Message
+from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup
 from redis.asyncio import Redis
 
 from bot import keyboards
-from bot.keyboards import KeyboardCallbackData
+from bot.keyboards import KeyboardCallbackData, ConcertsPageCallbackData
 from bot.states import MenuStates
 from concert_message_builder import get_date_time
+from model import NotificationsMode, DEFAULT_NOTIFICATIONS_MODE
 from services.user_service import UserServiceAgent
 from .cache_models import CachePlaylists, CacheCities, CacheConcerts
+from .concert_pages import ConcertPages, CONCERTS_PAGE_SIZE
 from .constants import INTERNAL_ERROR_DEFAULT_TEXT, CHOOSE_ACTION_TEXT, ABOUT_TEXT, FAQ_TEXT, DEV_COMM_TEXT, \
     INSTRUCTION_PHOTO_LINK
-from .user_data_manager import set_last_keyboard_id, get_last_keyboard_id
+from .user_data_manager import set_last_keyboard_id, get_last_keyboard_id, flush_state, get_stored_state
 
 menu_router = Router()
 
 bot_logger = logging.getLogger('bot')
 
 
-async def __check_user_and_logging(callback_query: CallbackQuery, func_name: str, state: FSMContext) -> bool:
+async def __check_user_and_logging(callback_query: CallbackQuery, func_name: str, raw_state: Optional[str]) -> bool:
     if not isinstance(callback_query.message, Message):
         return False
     if callback_query.from_user is None:
@@ -34,17 +36,16 @@ async def __check_user_and_logging(callback_query: CallbackQuery, func_name: str
     if user_id is None:
         return False
 
-    bot_logger.info(
-        f'Got message {callback_query.message.message_id} from {user_id}-{callback_query.from_user.username}'
-        f' on state:{await state.get_state()} for {func_name}')
+    bot_logger.info('Got message %s from %s-%s on state:%s for %s', callback_query.message.message_id, user_id,
+                    callback_query.from_user.username, raw_state, func_name)
     return True
 
 
 @menu_router.callback_query(MenuStates.MAIN_MENU, F.data == KeyboardCallbackData.CHANGE_DATA)
-async def show_change_data_variants(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def show_change_data_variants(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str]) -> None:
     if not isinstance(callback_query.message, Message):
         return
-    if not await __check_user_and_logging(callback_query, 'show_change_data_variants', state):
+    if not await __check_user_and_logging(callback_query, 'show_change_data_variants', raw_state):
         return
 
     await state.set_state(MenuStates.CHANGE_DATA)
@@ -54,11 +55,11 @@ async def show_change_data_variants(callback_query: CallbackQuery, state: FSMCon
 
 
 @menu_router.callback_query(MenuStates.MAIN_MENU, F.data == KeyboardCallbackData.HELP)
-async def show_help_variants(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def show_help_variants(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str]) -> None:
     if not isinstance(callback_query.message, Message):
         return
 
-    if not await __check_user_and_logging(callback_query, 'show_help_variants', state):
+    if not await __check_user_and_logging(callback_query, 'show_help_variants', raw_state):
         return
     await state.set_state(MenuStates.HELP)
     with suppress(TelegramBadRequest):
@@ -66,11 +67,11 @@ async def show_help_variants(callback_query: CallbackQuery, state: FSMContext) -
 
 
 @menu_router.callback_query(MenuStates.HELP, F.data == KeyboardCallbackData.MAIN_INFO)
-async def show_main_info(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def show_main_info(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str]) -> None:
     if not isinstance(callback_query.message, Message):
         return
 
-    if not await __check_user_and_logging(callback_query, 'show_main_info', state):
+    if not await __check_user_and_logging(callback_query, 'show_main_info', raw_state):
         return
 
     await state.set_state(MenuStates.HELP_DEAD_END)
@@ -80,11 +81,11 @@ async def show_main_info(callback_query: CallbackQuery, state: FSMContext) -> No
 
 
 @menu_router.callback_query(MenuStates.HELP, F.data == KeyboardCallbackData.DEVELOPMENT_COMMUNICATION)
-async def show_dev_info(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def show_dev_info(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str]) -> None:
     if not isinstance(callback_query.message, Message):
         return
 
-    if not await __check_user_and_logging(callback_query, 'show_dev_info', state):
+    if not await __check_user_and_logging(callback_query, 'show_dev_info', raw_state):
         return
 
     await state.set_state(MenuStates.HELP_DEAD_END)
@@ -96,11 +97,11 @@ async def show_dev_info(callback_query: CallbackQuery, state: FSMContext) -> Non
 
 
 @menu_router.callback_query(MenuStates.HELP, F.data == KeyboardCallbackData.FAQ)
-async def show_faq_info(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def show_faq_info(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str]) -> None:
     if not isinstance(callback_query.message, Message):
         return
 
-    if not await __check_user_and_logging(callback_query, 'show_faq_info', state):
+    if not await __check_user_and_logging(callback_query, 'show_faq_info', raw_state):
         return
     bot = callback_query.bot
     if bot is None:
@@ -116,9 +117,8 @@ async def show_faq_info(callback_query: CallbackQuery, state: FSMContext) -> Non
                              photo=INSTRUCTION_PHOTO_LINK,
                              caption='Инструкция как получить ссылку на альбом/плейлист')
     except Exception as e:
-        bot_logger.warning(f'Failed to send photo from'
-                           f' {callback_query.from_user.id}-{callback_query.from_user.username}'
-                           f' on state:{await state.get_state()}. {str(e)}')
+        bot_logger.warning('Failed to send photo from %s-%s on state:%s. %s', callback_query.from_user.id,
+                           callback_query.from_user.username, raw_state, e)
 
     msg = await bot.send_message(chat_id=callback_query.message.chat.id,
                                  text=FAQ_TEXT,
@@ -128,10 +128,10 @@ async def show_faq_info(callback_query: CallbackQuery, state: FSMContext) -> Non
 
 
 @menu_router.callback_query(MenuStates.HELP, F.data == KeyboardCallbackData.BACK)
-async def go_to_menu(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def go_to_menu(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str]) -> None:
     if not isinstance(callback_query.message, Message):
         return
-    if not await __check_user_and_logging(callback_query, 'go_to_menu', state):
+    if not await __check_user_and_logging(callback_query, 'go_to_menu', raw_state):
         return
     await state.set_state(MenuStates.MAIN_MENU)
     with suppress(TelegramBadRequest):
@@ -139,11 +139,11 @@ async def go_to_menu(callback_query: CallbackQuery, state: FSMContext) -> None:
 
 
 @menu_router.callback_query(MenuStates.HELP_DEAD_END, F.data == KeyboardCallbackData.BACK)
-async def go_to_faq(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def go_to_faq(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str]) -> None:
     if not isinstance(callback_query.message, Message):
         return
 
-    if not await __check_user_and_logging(callback_query, 'go_to_faq', state):
+    if not await __check_user_and_logging(callback_query, 'go_to_faq', raw_state):
         return
 
     await state.set_state(MenuStates.HELP)
@@ -152,10 +152,10 @@ async def go_to_faq(callback_query: CallbackQuery, state: FSMContext) -> None:
 
 
 @menu_router.callback_query(MenuStates.MAIN_MENU, F.data == KeyboardCallbackData.USER_INFO)
-async def show_user_info_variants(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def show_user_info_variants(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str]) -> None:
     if not isinstance(callback_query.message, Message):
         return
-    if not await __check_user_and_logging(callback_query, 'show_user_info_variants', state):
+    if not await __check_user_and_logging(callback_query, 'show_user_info_variants', raw_state):
         return
     await state.set_state(MenuStates.USER_INFO)
     with suppress(TelegramBadRequest):
@@ -163,8 +163,8 @@ async def show_user_info_variants(callback_query: CallbackQuery, state: FSMConte
 
 
 @menu_router.callback_query(MenuStates.USER_INFO, F.data == KeyboardCallbackData.CITIES)
-async def show_cities(callback_query: CallbackQuery, state: FSMContext, agent: UserServiceAgent,
-                      redis_storage: Redis) -> None:
+async def show_cities(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str],
+                      agent: UserServiceAgent, redis_storage: Redis) -> None:
     if not isinstance(callback_query.message, Message):
         return
     if callback_query.from_user is None:
@@ -173,18 +173,18 @@ async def show_cities(callback_query: CallbackQuery, state: FSMContext, agent: U
     if user_id is None:
         return
 
-    bot_logger.info(
-        f'Got message {callback_query.message.message_id} from {user_id}-{callback_query.from_user.username}'
-        f' on state:{await state.get_state()} for show_cities')
+    bot_logger.info('Got message %s from %s-%s on state:%s for show_cities', callback_query.message.message_id, user_id,
+                    callback_query.from_user.username, raw_state)
 
     await state.set_state(MenuStates.WAITING)
+    await flush_state(state)
     await callback_query.answer()
     from_cache = await redis_storage.get(name=f'{user_id}:cities')
     if from_cache is not None:
         try:
             cities = CacheCities.model_validate_json(from_cache).cities
-            bot_logger.debug(f'Got cities:{cities} from cache for {callback_query.message.message_id} of'
-                             f' {user_id}-{callback_query.from_user.username}')
+            bot_logger.debug('Got cities:%s from cache for %s of %s-%s', cities, callback_query.message.message_id,
+                             user_id, callback_query.from_user.username)
             if len(cities) == 0:
                 with suppress(TelegramBadRequest):
                     await callback_query.message.edit_text(text='У вас не указан ни один город',
@@ -200,19 +200,19 @@ async def show_cities(callback_query: CallbackQuery, state: FSMContext, agent: U
             await state.set_state(MenuStates.USER_INFO_DEAD_END)
             return
         except Exception as e:
-            bot_logger.debug(f'Caching cities (no data) error for {callback_query.message.message_id} of'
-                             f' {user_id}-{callback_query.from_user.username}. {str(e)}')
+            bot_logger.debug('Caching cities (no data) error for %s of %s-%s. %s', callback_query.message.message_id,
+                             user_id, callback_query.from_user.username, e)
 
     try:
         cities = await agent.get_user_cities(user_id)
 
         json_str = json.dumps({'cities': cities})
         await redis_storage.set(name=f'{user_id}:cities', value=json_str, ex=120)
-        bot_logger.debug(f'Set cities cache for {callback_query.message.message_id} of'
-                         f' {user_id}-{callback_query.from_user.username}')
+        bot_logger.debug('Set cities cache for %s of %s-%s', callback_query.message.message_id, user_id,
+                         callback_query.from_user.username)
 
-        bot_logger.info(f'Got cities:{cities} for {callback_query.message.message_id} of'
-                        f' {user_id}-{callback_query.from_user.username}')
+        bot_logger.info('Got cities:%s for %s of %s-%s', cities, callback_query.message.message_id, user_id,
+                        callback_query.from_user.username)
         if len(cities) == 0:
             with suppress(TelegramBadRequest):
                 await callback_query.message.edit_text(text='У вас не указан ни один город',
@@ -226,8 +226,8 @@ async def show_cities(callback_query: CallbackQuery, state: FSMContext, agent: U
                 await callback_query.message.edit_text(text=txt, reply_markup=keyboards.get_back_keyboard())
 
     except Exception as e:
-        bot_logger.warning(f'On {callback_query.message.message_id}'
-                           f' for {user_id}-{callback_query.from_user.username}: {str(e)}')
+        bot_logger.warning('On %s for %s-%s: %s', callback_query.message.message_id, user_id,
+                           callback_query.from_user.username, e)
         with suppress(TelegramBadRequest):
             await callback_query.message.edit_text(text=INTERNAL_ERROR_DEFAULT_TEXT,
                                                    reply_markup=keyboards.get_back_keyboard())
@@ -236,8 +236,8 @@ async def show_cities(callback_query: CallbackQuery, state: FSMContext, agent: U
 
 
 @menu_router.callback_query(MenuStates.USER_INFO, F.data == KeyboardCallbackData.LINKS)
-async def show_all_links(callback_query: CallbackQuery, state: FSMContext, agent: UserServiceAgent,
-                         redis_storage: Redis) -> None:
+async def show_all_links(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str],
+                         agent: UserServiceAgent, redis_storage: Redis) -> None:
     if not isinstance(callback_query.message, Message):
         return
     if callback_query.from_user is None:
@@ -246,19 +246,19 @@ async def show_all_links(callback_query: CallbackQuery, state: FSMContext, agent
     if user_id is None:
         return
 
-    bot_logger.info(
-        f'Got message {callback_query.message.message_id} from {user_id}-{callback_query.from_user.username}'
-        f' on state:{await state.get_state()} for show_all_links')
+    bot_logger.info('Got message %s from %s-%s on state:%s for show_all_links', callback_query.message.message_id,
+                    user_id, callback_query.from_user.username, raw_state)
 
     await state.set_state(MenuStates.WAITING)
+    await flush_state(state)
     await callback_query.answer()
     from_cache = await redis_storage.get(name=f'{user_id}:track-lists')
     if from_cache is not None:
         try:
             playlists = CachePlaylists.model_validate_json(from_cache).track_lists
 
-            bot_logger.debug(f'Got playlists:{playlists} from cache for {callback_query.message.message_id} of'
-                             f' {user_id}-{callback_query.from_user.username}')
+            bot_logger.debug('Got playlists:%s from cache for %s of %s-%s', playlists,
+                             callback_query.message.message_id, user_id, callback_query.from_user.username)
             if len(playlists) == 0:
                 with suppress(TelegramBadRequest):
                     await callback_query.message.edit_text(text='У вас не указан ни один трек-лист',
@@ -275,18 +275,18 @@ async def show_all_links(callback_query: CallbackQuery, state: FSMContext, agent
             await state.set_state(MenuStates.USER_INFO_DEAD_END)
             return
         except Exception as e:
-            bot_logger.debug(f'Caching track-lists (no data) error for {callback_query.message.message_id} of'
-                             f' {user_id}-{callback_query.from_user.username}. {str(e)}')
+            bot_logger.debug('Caching track-lists (no data) error for %s of %s-%s. %s',
+                             callback_query.message.message_id, user_id, callback_query.from_user.username, e)
 
     try:
         playlists = await agent.get_user_track_lists(user_id)
-        bot_logger.info(f'Got links:{playlists} on {callback_query.message.message_id}'
-                        f' for {user_id}-{callback_query.from_user.username}')
+        bot_logger.info('Got links:%s on %s for %s-%s', playlists, callback_query.message.message_id, user_id,
+                        callback_query.from_user.username)
         to_json_model = CachePlaylists(track_lists=playlists)
         json_str = to_json_model.model_dump_json()
         await redis_storage.set(name=f'{user_id}:track-lists', value=json_str, ex=120)
-        bot_logger.debug(f'Set playlists cache for {callback_query.message.message_id} of'
-                         f' {user_id}-{callback_query.from_user.username}')
+        bot_logger.debug('Set playlists cache for %s of %s-%s', callback_query.message.message_id, user_id,
+                         callback_query.from_user.username)
 
         if len(playlists) == 0:
             with suppress(TelegramBadRequest):
@@ -301,8 +301,8 @@ async def show_all_links(callback_query: CallbackQuery, state: FSMContext, agent
                                                        disable_web_page_preview=True,
                                                        parse_mode=ParseMode.HTML)
     except Exception as e:
-        bot_logger.warning(f'On {callback_query.message.message_id}'
-                           f' for {user_id}-{callback_query.from_user.username}: {str(e)}')
+        bot_logger.warning('On %s for %s-%s: %s', callback_query.message.message_id, user_id,
+                           callback_query.from_user.username, e)
         with suppress(TelegramBadRequest):
             await callback_query.message.edit_text(text=INTERNAL_ERROR_DEFAULT_TEXT,
                                                    reply_markup=keyboards.get_back_keyboard())
@@ -310,11 +310,33 @@ async def show_all_links(callback_query: CallbackQuery, state: FSMContext, agent
     await state.set_state(MenuStates.USER_INFO_DEAD_END)
 
 
+@menu_router.callback_query(MenuStates.USER_INFO, F.data == KeyboardCallbackData.NOTIFICATIONS_MODE)
+async def switch_notifications_mode(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str]) -> None:
+    if not isinstance(callback_query.message, Message):
+        return
+    if not await __check_user_and_logging(callback_query, 'switch_notifications_mode', raw_state):
+        return
+
+    user_data = await state.get_data()
+    notifications_mode = NotificationsMode(user_data.get('notifications_mode', DEFAULT_NOTIFICATIONS_MODE))
+    if notifications_mode == NotificationsMode.DIGEST:
+        notifications_mode = NotificationsMode.FULL
+        txt = 'Теперь каждый концерт будет приходить отдельным сообщением'
+    else:
+        notifications_mode = NotificationsMode.DIGEST
+        txt = 'Теперь концерты будут приходить одной сводкой'
+
+    await state.update_data(notifications_mode=notifications_mode)
+    bot_logger.info('Notifications mode switched to %s for %s from %s-%s', notifications_mode,
+                    callback_query.message.message_id, callback_query.from_user.id, callback_query.from_user.username)
+    await callback_query.answer(text=txt, show_alert=True)
+
+
 @menu_router.callback_query(MenuStates.USER_INFO_DEAD_END, F.data == KeyboardCallbackData.BACK)
-async def go_to_faq_info(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def go_to_faq_info(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str]) -> None:
     if not isinstance(callback_query.message, Message):
         return
-    if not await __check_user_and_logging(callback_query, 'go_to_faq_info', state):
+    if not await __check_user_and_logging(callback_query, 'go_to_faq_info', raw_state):
         return
     await state.set_state(MenuStates.USER_INFO)
     with suppress(TelegramBadRequest):
@@ -322,10 +344,11 @@ async def go_to_faq_info(callback_query: CallbackQuery, state: FSMContext) -> No
 
 
 @menu_router.callback_query(MenuStates.USER_INFO, F.data == KeyboardCallbackData.BACK)
-async def show_change_data_variants_info(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def show_change_data_variants_info(callback_query: CallbackQuery, state: FSMContext,
+                                         raw_state: Optional[str]) -> None:
     if not isinstance(callback_query.message, Message):
         return
-    if not await __check_user_and_logging(callback_query, 'show_change_data_variants_info', state):
+    if not await __check_user_and_logging(callback_query, 'show_change_data_variants_info', raw_state):
         return
     await state.set_state(MenuStates.MAIN_MENU)
     with suppress(TelegramBadRequest):
@@ -333,19 +356,35 @@ async def show_change_data_variants_info(callback_query: CallbackQuery, state: F
 
 
 @menu_router.callback_query(MenuStates.MAIN_MENU, F.data == KeyboardCallbackData.TOOLS)
-async def show_tools(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def show_tools(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str]) -> None:
     if not isinstance(callback_query.message, Message):
         return
-    if not await __check_user_and_logging(callback_query, 'show_tools', state):
+    if not await __check_user_and_logging(callback_query, 'show_tools', raw_state):
         return
     await state.set_state(MenuStates.TOOLS)
     with suppress(TelegramBadRequest):
         await callback_query.message.edit_text(text=CHOOSE_ACTION_TEXT, reply_markup=keyboards.get_tools_keyboard())
 
 
+async def __save_concert_pages(user_id: int, concerts: List[str], state: FSMContext,
+                               concert_pages: ConcertPages) -> tuple[str, InlineKeyboardMarkup]:
+    """
+    Stores rendered concerts in redis, FSM keeps only the generation of the list.
+
+    :return: text and keyboard of the first page
+    """
+
+    user_data = await state.get_data()
+    generation = await concert_pages.save(user_id, concerts, user_data.get('concerts_generation'))
+    await state.update_data(concerts_generation=generation)
+    pages_count = concert_pages.get_pages_count(len(concerts))
+    return (concert_pages.render_page(concerts[:CONCERTS_PAGE_SIZE], 0, pages_count),
+            keyboards.get_show_concerts_keyboard(0, pages_count, generation))
+
+
 @menu_router.callback_query(MenuStates.MAIN_MENU, F.data == KeyboardCallbackData.SHOW_CONCERTS)
-async def show_all_concerts(callback_query: CallbackQuery, state: FSMContext, agent: UserServiceAgent,
-                            redis_storage: Redis) -> None:
+async def show_all_concerts(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str],
+                            agent: UserServiceAgent, redis_storage: Redis, concert_pages: ConcertPages) -> None:
     if not isinstance(callback_query.message, Message):
         return
     bot = callback_query.bot
@@ -357,13 +396,13 @@ async def show_all_concerts(callback_query: CallbackQuery, state: FSMContext, ag
     if user_id is None:
         return
 
-    bot_logger.info(
-        f'Got message {callback_query.message.message_id} from {user_id}-{callback_query.from_user.username}'
-        f' on state:{await state.get_state()} for show_all_concerts')
+    bot_logger.info('Got message %s from %s-%s on state:%s for show_all_concerts', callback_query.message.message_id,
+                    user_id, callback_query.from_user.username, raw_state)
 
     with suppress(TelegramBadRequest):
         await bot.delete_message(chat_id=callback_query.message.chat.id, message_id=callback_query.message.message_id)
     await state.set_state(MenuStates.WAITING)
+    await flush_state(state)
 
     concerts_list = []
 
@@ -380,38 +419,27 @@ async def show_all_concerts(callback_query: CallbackQuery, state: FSMContext, ag
                 await state.set_state(MenuStates.MAIN_MENU)
                 return
 
-            await state.update_data(concerts=concerts_list)
-            await state.update_data(current_page=0)
-
-            page_txt = ''
-            for i in range(0, 5):
-                if i == len(concerts_list):
-                    break
-                page_txt += f'{i + 1}\n{concerts_list[i]}\n\n'
-            all_pages = len(concerts_list) // 5
-            if len(concerts_list) % 5 != 0:
-                all_pages += 1
-            page_txt += f'Страница 1 из {all_pages}'
+            page_txt, page_markup = await __save_concert_pages(user_id, concerts_list, state, concert_pages)
             await state.set_state(MenuStates.CONCERTS_SHOW)
             msg = await bot.send_message(chat_id=callback_query.message.chat.id, text=page_txt,
-                                         reply_markup=keyboards.get_show_concerts_keyboard(),
+                                         reply_markup=page_markup,
                                          parse_mode=ParseMode.HTML,
                                          disable_web_page_preview=True)
             await set_last_keyboard_id(msg.message_id, state)
             return
         except Exception as e:
-            bot_logger.debug(f'Caching track-lists (no data) error for {callback_query.message.message_id} of'
-                             f' {user_id}-{callback_query.from_user.username}. {str(e)}')
+            bot_logger.debug('Caching track-lists (no data) error for %s of %s-%s. %s',
+                             callback_query.message.message_id, user_id, callback_query.from_user.username, e)
 
     try:
         await bot.send_chat_action(chat_id=callback_query.message.chat.id, action='typing')
         concerts = await agent.get_user_concerts(user_id)
 
-        if await state.get_state() != MenuStates.WAITING:
+        if await get_stored_state(state) != MenuStates.WAITING:
             return
 
-        bot_logger.debug(f'Got concerts for {callback_query.message.message_id} of'
-                         f' {user_id}-{callback_query.from_user.username}')
+        bot_logger.debug('Got concerts for %s of %s-%s', callback_query.message.message_id, user_id,
+                         callback_query.from_user.username)
 
         for pos, concert in enumerate(concerts):
             txt = ''
@@ -449,8 +477,8 @@ async def show_all_concerts(callback_query: CallbackQuery, state: FSMContext, ag
         json_model = CacheConcerts(concerts=concerts_list)
         json_str = json_model.model_dump_json()
         await redis_storage.set(name=f'{user_id}:concerts', value=json_str, ex=300)
-        bot_logger.debug(f'Cached concerts for {callback_query.message.message_id} of'
-                         f' {user_id}-{callback_query.from_user.username}')
+        bot_logger.debug('Cached concerts for %s of %s-%s', callback_query.message.message_id, user_id,
+                         callback_query.from_user.username)
 
         if len(concerts) == 0:
             await bot.send_message(chat_id=callback_query.message.chat.id, text='Концерты не обнаружены')
@@ -461,28 +489,17 @@ async def show_all_concerts(callback_query: CallbackQuery, state: FSMContext, ag
             await state.set_state(MenuStates.MAIN_MENU)
             return
 
-        await state.update_data(concerts=concerts_list)
-        await state.update_data(current_page=0)
-
-        page_txt = ''
-        for i in range(0, 5):
-            if i == len(concerts_list):
-                break
-            page_txt += f'{i + 1}\n{concerts_list[i]}\n\n'
-        all_pages = len(concerts_list) // 5
-        if len(concerts_list) % 5 != 0:
-            all_pages += 1
-        page_txt += f'Страница 1 из {all_pages}'
+        page_txt, page_markup = await __save_concert_pages(user_id, concerts_list, state, concert_pages)
         await state.set_state(MenuStates.CONCERTS_SHOW)
         msg = await bot.send_message(chat_id=callback_query.message.chat.id, text=page_txt,
-                                     reply_markup=keyboards.get_show_concerts_keyboard(),
+                                     reply_markup=page_markup,
                                      parse_mode=ParseMode.HTML,
                                      disable_web_page_preview=True)
         await set_last_keyboard_id(msg.message_id, state)
 
     except Exception as e:
-        bot_logger.warning(f'On {callback_query.message.message_id}'
-                           f' for {user_id}-{callback_query.from_user.username}: {str(e)}')
+        bot_logger.warning('On %s for %s-%s: %s', callback_query.message.message_id, user_id,
+                           callback_query.from_user.username, e)
         await bot.send_message(chat_id=callback_query.message.chat.id, text=INTERNAL_ERROR_DEFAULT_TEXT)
         msg = await bot.send_message(chat_id=callback_query.message.chat.id, text=CHOOSE_ACTION_TEXT,
                                      reply_markup=keyboards.get_main_menu_keyboard())
@@ -492,25 +509,37 @@ async def show_all_concerts(callback_query: CallbackQuery, state: FSMContext, ag
 
 
 @menu_router.callback_query(MenuStates.CONCERTS_SHOW, F.data == KeyboardCallbackData.BACK)
-async def return_from_show_concerts(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def return_from_show_concerts(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str],
+                                    concert_pages: ConcertPages) -> None:
     if not isinstance(callback_query.message, Message):
         return
-    if not await __check_user_and_logging(callback_query, 'return_from_show_concerts', state):
+    if not await __check_user_and_logging(callback_query, 'return_from_show_concerts', raw_state):
         return
     if callback_query.message is None:
         return
     await state.set_state(MenuStates.MAIN_MENU)
     user_data = await state.get_data()
-    user_data.pop('current_page')
-    user_data.pop('concerts')
+    # Concerts and pages were kept in FSM data by earlier versions of the bot.
+    user_data.pop('current_page', None)
+    user_data.pop('concerts_count', None)
+    user_data.pop('concerts', None)
+    generation = user_data.pop('concerts_generation', None)
+    if generation is not None:
+        await concert_pages.remove(callback_query.from_user.id, generation)
     await state.set_data(user_data)
     with suppress(TelegramBadRequest):
         await callback_query.message.edit_text(text=CHOOSE_ACTION_TEXT, reply_markup=keyboards.get_main_menu_keyboard())
 
 
-@menu_router.callback_query(MenuStates.CONCERTS_SHOW, F.data == KeyboardCallbackData.BACKWARD)
-@menu_router.callback_query(MenuStates.CONCERTS_SHOW, F.data == KeyboardCallbackData.FORWARD)
-async def show_concerts_page(callback_query: CallbackQuery, state: FSMContext) -> None:
+def __can_show_concerts(raw_state: Optional[str]) -> bool:
+    # Registration and data changes are not interrupted, waiting state belongs to a request being handled.
+    return raw_state in MenuStates and raw_state != MenuStates.WAITING.state
+
+
+# Keyboards of replaced or expired lists are handled by the empty page check.
+@menu_router.callback_query(ConcertsPageCallbackData.filter())
+async def show_concerts_page(callback_query: CallbackQuery, callback_data: ConcertsPageCallbackData,
+                             state: FSMContext, raw_state: Optional[str], concert_pages: ConcertPages) -> None:
     if not isinstance(callback_query.message, Message):
         return
     if callback_query.from_user is None:
@@ -519,53 +548,70 @@ async def show_concerts_page(callback_query: CallbackQuery, state: FSMContext) -
     if user_id is None:
         return
 
-    bot_logger.info(
-        f'Got message {callback_query.message.message_id} from {user_id}-{callback_query.from_user.username}'
-        f' on state:{await state.get_state()} for show_concert_page')
-    user_data = await state.get_data()
-    current_page = user_data['current_page']
-    concerts: List[str] = user_data['concerts']
-    if callback_query.data == KeyboardCallbackData.BACKWARD:
-        current_page -= 1
-    else:
-        current_page += 1
-
-    if current_page < 0:
-        current_page = len(concerts) // 5
-        if len(concerts) % 5 == 0 and current_page > 0:
-            current_page -= 1
-    elif current_page * 5 >= len(concerts):
-        current_page = 0
-
-    page_txt = ''
-    for i in range(current_page * 5, current_page * 5 + 5):
-        if i == len(concerts):
-            break
-        page_txt += f'{i + 1}\n{concerts[i]}\n\n'
-
-    all_pages = len(concerts) // 5
-    if len(concerts) % 5 != 0:
-        all_pages += 1
-    page_txt += f'Страница {current_page + 1} из {all_pages}'
-
-    bot_logger.debug(
-        f'Showing page {current_page + 1} of {all_pages} for {callback_query.message.message_id}'
-        f' from {user_id}-{callback_query.from_user.username}')
-
-    await state.update_data(current_page=current_page)
+    bot_logger.info('Got message %s from %s-%s on state:%s for show_concert_page', callback_query.message.message_id,
+                    user_id, callback_query.from_user.username, raw_state)
+
+    if not __can_show_concerts(raw_state):
+        await callback_query.answer()
+        return
+
+    # List of a replaced or expired version is removed from redis, so its keyboard gets an empty page.
+    current_page = max(min(callback_data.page, callback_data.pages - 1), 0)
+    concerts = await concert_pages.get_page(user_id, callback_data.version, current_page)
+    if len(concerts) == 0:
+        await __close_outdated_concerts(callback_query, state, raw_state)
+        return
+
+    page_txt = concert_pages.render_page(concerts, current_page, callback_data.pages)
+    # Back button of the list is handled in the state of the list.
+    if raw_state != MenuStates.CONCERTS_SHOW.state:
+        await state.set_state(MenuStates.CONCERTS_SHOW)
+    await set_last_keyboard_id(callback_query.message.message_id, state)
+
+    bot_logger.debug('Showing page %s of %s for %s from %s-%s', current_page + 1, callback_data.pages,
+                     callback_query.message.message_id, user_id, callback_query.from_user.username)
+
+    await callback_query.answer()
     with suppress(TelegramBadRequest):
-        await callback_query.message.edit_text(text=page_txt,
-                                               reply_markup=keyboards.get_show_concerts_keyboard(),
-                                               parse_mode=ParseMode.HTML,
-                                               disable_web_page_preview=True
-                                               )
+        await callback_query.message.edit_text(
+            text=page_txt,
+            reply_markup=keyboards.get_show_concerts_keyboard(current_page, callback_data.pages,
+                                                              callback_data.version),
+            parse_mode=ParseMode.HTML,
+            disable_web_page_preview=True
+        )
+
+
+@menu_router.callback_query(MenuStates.CONCERTS_SHOW, F.data == KeyboardCallbackData.BACKWARD)
+@menu_router.callback_query(MenuStates.CONCERTS_SHOW, F.data == KeyboardCallbackData.FORWARD)
+async def show_outdated_concerts_page(callback_query: CallbackQuery, state: FSMContext,
+                                      raw_state: Optional[str]) -> None:
+    if not await __check_user_and_logging(callback_query, 'show_outdated_concerts_page', raw_state):
+        return
+    await __close_outdated_concerts(callback_query, state, raw_state)
+
+
+async def __close_outdated_concerts(callback_query: CallbackQuery, state: FSMContext,
+                                    raw_state: Optional[str]) -> None:
+    if not isinstance(callback_query.message, Message):
+        return
+    bot_logger.info('Outdated concerts keyboard %s from %s-%s', callback_query.message.message_id,
+                    callback_query.from_user.id, callback_query.from_user.username)
+    await callback_query.answer(text='Список концертов устарел, откройте его заново', show_alert=True)
+    if not __can_show_concerts(raw_state):
+        return
+
+    await state.set_state(MenuStates.MAIN_MENU)
+    await set_last_keyboard_id(callback_query.message.message_id, state)
+    with suppress(TelegramBadRequest):
+        await callback_query.message.edit_text(text=CHOOSE_ACTION_TEXT, reply_markup=keyboards.get_main_menu_keyboard())
 
 
 @menu_router.callback_query(MenuStates.TOOLS, F.data == KeyboardCallbackData.BACK)
-async def go_to_menu_tools(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def go_to_menu_tools(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str]) -> None:
     if not isinstance(callback_query.message, Message):
         return
-    if not await __check_user_and_logging(callback_query, 'go_to_menu_tools', state):
+    if not await __check_user_and_logging(callback_query, 'go_to_menu_tools', raw_state):
         return
     await state.set_state(MenuStates.MAIN_MENU)
     with suppress(TelegramBadRequest):
@@ -573,10 +619,10 @@ async def go_to_menu_tools(callback_query: CallbackQuery, state: FSMContext) ->
 
 
 @menu_router.callback_query(MenuStates.TOOLS, F.data == KeyboardCallbackData.NOTICE_MANAGEMENT)
-async def show_variants(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def show_variants(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str]) -> None:
     if not isinstance(callback_query.message, Message):
         return
-    if not await __check_user_and_logging(callback_query, 'show_variants', state):
+    if not await __check_user_and_logging(callback_query, 'show_variants', raw_state):
         return
     user_data = await state.get_data()
     await state.set_state(MenuStates.MANAGING_NOTIFICATIONS)
@@ -587,10 +633,10 @@ async def show_variants(callback_query: CallbackQuery, state: FSMContext) -> Non
 
 
 @menu_router.callback_query(MenuStates.MANAGING_NOTIFICATIONS, F.data == KeyboardCallbackData.ENABLE)
-async def swap_notice_enable(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def swap_notice_enable(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str]) -> None:
     if not isinstance(callback_query.message, Message):
         return
-    if not await __check_user_and_logging(callback_query, 'swap_notice_enable', state):
+    if not await __check_user_and_logging(callback_query, 'swap_notice_enable', raw_state):
         return
     user_data = await state.get_data()
     user_data['notices_enabled'] = True
@@ -601,10 +647,11 @@ async def swap_notice_enable(callback_query: CallbackQuery, state: FSMContext) -
 
 
 @menu_router.callback_query(MenuStates.MANAGING_NOTIFICATIONS, F.data == KeyboardCallbackData.DISABLE)
-async def swap_notice_enable_disable(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def swap_notice_enable_disable(callback_query: CallbackQuery, state: FSMContext,
+                                     raw_state: Optional[str]) -> None:
     if not isinstance(callback_query.message, Message):
         return
-    if not await __check_user_and_logging(callback_query, 'show_notice_enable_disable', state):
+    if not await __check_user_and_logging(callback_query, 'show_notice_enable_disable', raw_state):
         return
     user_data = await state.get_data()
     user_data['notices_enabled'] = False
@@ -615,10 +662,10 @@ async def swap_notice_enable_disable(callback_query: CallbackQuery, state: FSMCo
 
 
 @menu_router.callback_query(MenuStates.MANAGING_NOTIFICATIONS, F.data == KeyboardCallbackData.BACK)
-async def go_to_tools(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def go_to_tools(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str]) -> None:
     if not isinstance(callback_query.message, Message):
         return
-    if not await __check_user_and_logging(callback_query, 'go_to_tools', state):
+    if not await __check_user_and_logging(callback_query, 'go_to_tools', raw_state):
         return
     await state.set_state(MenuStates.TOOLS)
     with suppress(TelegramBadRequest):
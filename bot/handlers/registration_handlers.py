@@ -1,5 +1,6 @@
 import logging
 from contextlib import suppress
+from typing import Optional
 
 from aiogram import F
 from aiogram import Router
@@ -42,109 +43,109 @@ async def __send_fuzz_variant_message(city: str, variant: str, message: Message,
 
 
 @registration_router.message(RegistrationStates.ADD_FIRST_CITY, F.content_type == ContentType.LOCATION)
-async def add_first_city_from_location(message: Message, state: FSMContext, agent: UserServiceAgent) -> None:
+async def add_first_city_from_location(message: Message, state: FSMContext, raw_state: Optional[str],
+                                       agent: UserServiceAgent) -> None:
     if message.from_user is None:
         return
     user_id = message.from_user.id
     if user_id is None:
         return
 
-    bot_logger.info(f'Got message {message.message_id} from {user_id}-{message.from_user.username}'
-                    f' on state:{await state.get_state()} for add_first_city_from_location')
+    bot_logger.info('Got message %s from %s-%s on state:%s for add_first_city_from_location', message.message_id,
+                    user_id, message.from_user.username, raw_state)
 
     if message.location is None or message.location.latitude is None or message.location.longitude is None:
         await message.answer('Некорректный формат координат, попробуйте еще раз')
-        bot_logger.debug(f'Get incorrect format of coordinates for {message.message_id}'
-                         f' of {user_id}-{message.from_user.username}')
+        bot_logger.debug('Get incorrect format of coordinates for %s of %s-%s', message.message_id, user_id,
+                         message.from_user.username)
         return
 
     try:
         city = await agent.add_user_city_by_coordinates(user_id, message.location.latitude, message.location.longitude)
         await message.answer(text=f'Город {city} добавлен успешно')
-        bot_logger.info(f'Successful add city by coordinates {city} for {message.message_id}'
-                        f' of {user_id}-{message.from_user.username}')
+        bot_logger.info('Successful add city by coordinates %s for %s of %s-%s', city, message.message_id, user_id,
+                        message.from_user.username)
         await state.update_data(is_first_city=False)
         await message.answer(text=__after_first_city_msg, reply_markup=keyboards.get_skip_add_cities_markup())
         await state.set_state(state=RegistrationStates.ADD_CITIES_IN_LOOP)
         return
     except InvalidCityException:
         await message.answer(text='Города не обнаружены')
-        bot_logger.debug(f'No city found by coordinates for {message.message_id} of'
-                         f' {user_id}-{message.from_user.username}')
+        bot_logger.debug('No city found by coordinates for %s of %s-%s', message.message_id, user_id,
+                         message.from_user.username)
     except InvalidCoordsException:
         await message.answer(text='Координаты не действительны')
-        bot_logger.debug(f'Invalid coordinates for {message.message_id} {user_id}-{message.from_user.username}')
+        bot_logger.debug('Invalid coordinates for %s %s-%s', message.message_id, user_id, message.from_user.username)
     except CityAlreadyAddedException:
         await message.answer(text='Город уже был добавлен')
-        bot_logger.debug(f'City already added by coordinates for {message.message_id} of'
-                         f' {user_id}-{message.from_user.username}')
+        bot_logger.debug('City already added by coordinates for %s of %s-%s', message.message_id, user_id,
+                         message.from_user.username)
     except Exception as e:
-        bot_logger.warning(f'On {message.message_id} for'
-                           f' {user_id}-{message.from_user.username}: {str(e)}')
+        bot_logger.warning('On %s for %s-%s: %s', message.message_id, user_id, message.from_user.username, e)
         await message.answer(text=INTERNAL_ERROR_DEFAULT_TEXT)
 
 
 @registration_router.message(RegistrationStates.ADD_FIRST_CITY, TEXT_WITHOUT_COMMANDS_FILTER)
-async def add_first_city_from_text(message: Message, state: FSMContext, agent: UserServiceAgent) -> None:
+async def add_first_city_from_text(message: Message, state: FSMContext, raw_state: Optional[str],
+                                   agent: UserServiceAgent) -> None:
     if message.from_user is None:
         return
     user_id = message.from_user.id
     if user_id is None:
         return
     city = message.text
-    bot_logger.info(f'Got message {message.message_id} from {user_id}-{message.from_user.username}'
-                    f' on state:{await state.get_state()} for add_first_city_from_text with text: {city}')
+    bot_logger.info('Got message %s from %s-%s on state:%s for add_first_city_from_text with text: %s',
+                    message.message_id, user_id, message.from_user.username, raw_state, city)
     if city is None:
         await message.answer(text='Неверный формат текста', reply_markup=keyboards.get_location_keyboard_markup())
-        bot_logger.debug(f'Get incorrect format of text for {message.message_id} of'
-                         f' {user_id}-{message.from_user.username}')
+        bot_logger.debug('Get incorrect format of text for %s of %s-%s', message.message_id, user_id,
+                         message.from_user.username)
         return
     if len(city) > MAXIMUM_CITY_LEN:
         await message.answer(text='Слишком длинное название города',
                              reply_markup=keyboards.get_location_keyboard_markup())
-        bot_logger.debug(f'Too long city for {message.message_id} {user_id}-{message.from_user.username}')
+        bot_logger.debug('Too long city for %s %s-%s', message.message_id, user_id, message.from_user.username)
         return
     try:
         await agent.add_user_city(user_id, city)
         await message.answer(text=__after_first_city_msg,
                              reply_markup=keyboards.get_skip_add_cities_markup())
-        bot_logger.info(f'Successfully add city for {message.message_id} {user_id}-{message.from_user.username}')
+        bot_logger.info('Successfully add city for %s %s-%s', message.message_id, user_id, message.from_user.username)
         await message.answer(text=f'Город {city} добавлен успешно.')
         await state.update_data(is_first_city=False)
         await state.set_state(state=RegistrationStates.ADD_CITIES_IN_LOOP)
     except InvalidCityException:
         await message.answer(text='Некорректно введен город или его не существует',
                              reply_markup=keyboards.get_location_keyboard_markup())
-        bot_logger.debug(f'Invalid city for {message.message_id} {user_id}-{message.from_user.username}')
+        bot_logger.debug('Invalid city for %s %s-%s', message.message_id, user_id, message.from_user.username)
     except FuzzyCityException as e:
         if e.variant is None:
             await message.answer(text=INTERNAL_ERROR_DEFAULT_TEXT,
                                  reply_markup=keyboards.get_location_keyboard_markup())
-            bot_logger.warning(f'No fuzzy variant for {message.message_id} {user_id}-{message.from_user.username}')
+            bot_logger.warning('No fuzzy variant for %s %s-%s', message.message_id, user_id, message.from_user.username)
             return
-        bot_logger.debug(f'City is fuzz variant:{e.variant}'
-                         f' for {message.message_id} {user_id}-{message.from_user.username}')
+        bot_logger.debug('City is fuzz variant:%s for %s %s-%s', e.variant, message.message_id, user_id,
+                         message.from_user.username)
         await __send_fuzz_variant_message(city, e.variant, message, state)
     except CityAlreadyAddedException:
         await message.answer('Город уже был добавлен')
-        bot_logger.debug(f'City already added for {message.message_id} {user_id}-{message.from_user.username}')
+        bot_logger.debug('City already added for %s %s-%s', message.message_id, user_id, message.from_user.username)
     except Exception as e:
-        bot_logger.warning(
-            f'On {message.message_id} for {user_id}-{message.from_user.username}: {str(e)}')
+        bot_logger.warning('On %s for %s-%s: %s', message.message_id, user_id, message.from_user.username, e)
         await message.answer(text=INTERNAL_ERROR_DEFAULT_TEXT)
 
 
 @registration_router.message(RegistrationStates.ADD_CITIES_IN_LOOP, F.text == keyboards.skip_add_cities_texts)
 @registration_router.message(RegistrationStates.ADD_CITIES_IN_LOOP, SKIP_COMMAND_FILTER)
-async def skip_add_cities(message: Message, state: FSMContext) -> None:
+async def skip_add_cities(message: Message, state: FSMContext, raw_state: Optional[str]) -> None:
     if message.from_user is None:
         return
     user_id = message.from_user.id
     if user_id is None:
         return
 
-    bot_logger.info(f'Got message {message.message_id} from {user_id}-{message.from_user.username}'
-                    f' on state:{await state.get_state()} for skip_add_cities')
+    bot_logger.info('Got message %s from %s-%s on state:%s for skip_add_cities', message.message_id, user_id,
+                    message.from_user.username, raw_state)
     await state.set_state(RegistrationStates.ADD_LINK)
 
     user_data = await state.get_data()
@@ -160,12 +161,13 @@ async def skip_add_cities(message: Message, state: FSMContext) -> None:
     try:
         await message.answer_photo(photo=INSTRUCTION_PHOTO_LINK)
     except Exception as e:
-        bot_logger.warning(f'Failed to send photo from {user_id}-{message.from_user.username}'
-                           f' on state:{await state.get_state()}. {str(e)}')
+        bot_logger.warning('Failed to send photo from %s-%s on state:%s. %s', user_id, message.from_user.username,
+                           raw_state, e)
 
 
 @registration_router.message(RegistrationStates.ADD_CITIES_IN_LOOP, TEXT_WITHOUT_COMMANDS_FILTER)
-async def add_city_in_loop(message: Message, state: FSMContext, agent: UserServiceAgent) -> None:
+async def add_city_in_loop(message: Message, state: FSMContext, raw_state: Optional[str],
+                           agent: UserServiceAgent) -> None:
     if message.from_user is None:
         return
     user_id = message.from_user.id
@@ -174,20 +176,19 @@ async def add_city_in_loop(message: Message, state: FSMContext, agent: UserServi
 
     city = message.text
 
-    bot_logger.info(f'Got message {message.message_id} from {user_id}-{message.from_user.username}'
-                    f' on state:{await state.get_state()} for add_city_in_loop with text: {city}')
+    bot_logger.info('Got message %s from %s-%s on state:%s for add_city_in_loop with text: %s', message.message_id,
+                    user_id, message.from_user.username, raw_state, city)
 
     if city is None:
         await message.answer(text='Неверный формат текста')
-        bot_logger.debug(f'Get incorrect format of text for {message.message_id} of'
-                         f' {user_id}-{message.from_user.username}')
+        bot_logger.debug('Get incorrect format of text for %s of %s-%s', message.message_id, user_id,
+                         message.from_user.username)
         return
 
     if len(city) > MAXIMUM_CITY_LEN:
         await message.answer(text='Слишком длинное название города',
                              reply_markup=keyboards.get_skip_add_cities_markup())
-        bot_logger.debug(f'Too long city for {message.message_id} of'
-                         f' {user_id}-{message.from_user.username}')
+        bot_logger.debug('Too long city for %s of %s-%s', message.message_id, user_id, message.from_user.username)
         return
 
     try:
@@ -196,35 +197,32 @@ async def add_city_in_loop(message: Message, state: FSMContext, agent: UserServi
         await message.answer(text=f'Город {city} добавлен успешно.\n'
                                   f'Напоминание: можно ввести /skip',
                              reply_markup=keyboards.get_skip_add_cities_markup())
-        bot_logger.info(f'Add city {city} for {message.message_id} of'
-                        f' {user_id}-{message.from_user.username}')
+        bot_logger.info('Add city %s for %s of %s-%s', city, message.message_id, user_id, message.from_user.username)
     except InvalidCityException:
         await message.answer(text='Некорректно введен город или его не существует',
                              reply_markup=keyboards.get_skip_add_cities_markup())
-        bot_logger.debug(f'Get incorrect city for {message.message_id} of'
-                         f' {user_id}-{message.from_user.username}')
+        bot_logger.debug('Get incorrect city for %s of %s-%s', message.message_id, user_id, message.from_user.username)
     except FuzzyCityException as e:
         if e.variant is None:
             await message.answer(text=INTERNAL_ERROR_DEFAULT_TEXT)
-            bot_logger.warning(f'Get fuzzy city without variant for {message.message_id} of'
-                               f' {user_id}-{message.from_user.username}')
+            bot_logger.warning('Get fuzzy city without variant for %s of %s-%s', message.message_id, user_id,
+                               message.from_user.username)
             return
-        bot_logger.debug(f'Get fuzzy city with variant:{e.variant} for {message.message_id} of'
-                         f' {user_id}-{message.from_user.username}')
+        bot_logger.debug('Get fuzzy city with variant:%s for %s of %s-%s', e.variant, message.message_id, user_id,
+                         message.from_user.username)
         await __send_fuzz_variant_message(city, e.variant, message, state)
     except CityAlreadyAddedException:
         await message.answer('Город уже был добавлен', reply_markup=keyboards.get_skip_add_cities_markup())
-        bot_logger.debug(f'City already added for {message.message_id} of'
-                         f' {user_id}-{message.from_user.username}')
+        bot_logger.debug('City already added for %s of %s-%s', message.message_id, user_id, message.from_user.username)
     except Exception as e:
         logging.log(level=logging.WARNING, msg=str(e))
-        bot_logger.warning(
-            f'On command {message.message_id} for {user_id}-{message.from_user.username}: {str(e)}')
+        bot_logger.warning('On command %s for %s-%s: %s', message.message_id, user_id, message.from_user.username, e)
         await message.answer(text=INTERNAL_ERROR_DEFAULT_TEXT)
 
 
 @registration_router.callback_query(RegistrationStates.ADD_CITY_CALLBACKS, F.data == KeyboardCallbackData.APPLY)
-async def apply_city_callback(callback_query: CallbackQuery, state: FSMContext, agent: UserServiceAgent) -> None:
+async def apply_city_callback(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str],
+                              agent: UserServiceAgent) -> None:
     if callback_query.from_user is None:
         return
     if callback_query.message is None:
@@ -236,9 +234,8 @@ async def apply_city_callback(callback_query: CallbackQuery, state: FSMContext,
     if bot is None:
         return
 
-    bot_logger.info(f'Got message {callback_query.message.message_id} '
-                    f'from {user_id}-{callback_query.from_user.username}'
-                    f' on state:{await state.get_state()} for apply_city_callback')
+    bot_logger.info('Got message %s from %s-%s on state:%s for apply_city_callback', callback_query.message.message_id,
+                    user_id, callback_query.from_user.username, raw_state)
 
     user_data = await state.get_data()
     city = user_data['variant']
@@ -266,8 +263,8 @@ async def apply_city_callback(callback_query: CallbackQuery, state: FSMContext,
 
         user_data.pop('variant')
         await state.set_data(user_data)
-        bot_logger.info(f'City {city} added for {callback_query.message.message_id} of'
-                        f' {user_id}-{callback_query.from_user.username}')
+        bot_logger.info('City %s added for %s of %s-%s', city, callback_query.message.message_id, user_id,
+                        callback_query.from_user.username)
         await state.set_state(RegistrationStates.ADD_CITIES_IN_LOOP)
 
     except CityAlreadyAddedException:
@@ -278,12 +275,11 @@ async def apply_city_callback(callback_query: CallbackQuery, state: FSMContext,
         await bot.send_message(chat_id=callback_query.message.chat.id,
                                text='Город уже был добавлен',
                                reply_markup=keyboards.get_skip_add_cities_markup())
-        bot_logger.debug(f'City already added for {callback_query.message.message_id} of'
-                         f' {user_id}-{callback_query.from_user.username}')
+        bot_logger.debug('City already added for %s of %s-%s', callback_query.message.message_id, user_id,
+                         callback_query.from_user.username)
     except Exception as e:
-        bot_logger.warning(
-            f'On command {callback_query.message.message_id} for {user_id}-{callback_query.from_user.username}:'
-            f' {str(e)}')
+        bot_logger.warning('On command %s for %s-%s: %s', callback_query.message.message_id, user_id,
+                           callback_query.from_user.username, e)
         with suppress(TelegramBadRequest):
             if isinstance(callback_query.message, Message):
                 await callback_query.message.edit_text(text=INTERNAL_ERROR_DEFAULT_TEXT,
@@ -291,7 +287,7 @@ async def apply_city_callback(callback_query: CallbackQuery, state: FSMContext,
 
 
 @registration_router.callback_query(RegistrationStates.ADD_CITY_CALLBACKS, F.data == KeyboardCallbackData.DENY)
-async def deny_city_variant(callback_query: CallbackQuery, state: FSMContext) -> None:
+async def deny_city_variant(callback_query: CallbackQuery, state: FSMContext, raw_state: Optional[str]) -> None:
     bot = callback_query.bot
     if bot is None or callback_query is None or callback_query.message is None:
         return
@@ -300,9 +296,8 @@ async def deny_city_variant(callback_query: CallbackQuery, state: FSMContext) ->
     user_id = callback_query.from_user.id
     if user_id is None:
         return
-    bot_logger.info(f'Got message {callback_query.message.message_id} '
-                    f'from {user_id}-{callback_query.from_user.username}'
-                    f' on state:{await state.get_state()} for deny_city_variant')
+    bot_logger.info('Got message %s from %s-%s on state:%s for deny_city_variant', callback_query.message.message_id,
+                    user_id, callback_query.from_user.username, raw_state)
     user_data = await state.get_data()
 
     with suppress(TelegramBadRequest):
@@ -325,7 +320,7 @@ async def deny_city_variant(callback_query: CallbackQuery, state: FSMContext) ->
 
 @registration_router.message(RegistrationStates.ADD_LINK, F.text == keyboards.skip_add_links_texts)
 @registration_router.message(RegistrationStates.ADD_LINK, SKIP_COMMAND_FILTER)
-async def skip_add_links(message: Message, state: FSMContext) -> None:
+async def skip_add_links(message: Message, state: FSMContext, raw_state: Optional[str]) -> None:
     if message.from_user is None:
         return
     user_id = message.from_user.id
@@ -335,8 +330,8 @@ async def skip_add_links(message: Message, state: FSMContext) -> None:
     if user_data['is_first_link']:
         return
 
-    bot_logger.info(f'Got message {message.message_id} from {user_id}-{message.from_user.username}'
-                    f' on state:{await state.get_state()} for skip_add_links')
+    bot_logger.info('Got message %s from %s-%s on state:%s for skip_add_links', message.message_id, user_id,
+                    message.from_user.username, raw_state)
     await state.set_state(MenuStates.MAIN_MENU)
 
     user_data = await state.get_data()
@@ -350,7 +345,7 @@ async def skip_add_links(message: Message, state: FSMContext) -> None:
 
 @registration_router.message(RegistrationStates.ADD_LINK, TEXT_WITHOUT_COMMANDS_FILTER
                              and F.text != keyboards.skip_add_cities_texts)
-async def add_link(message: Message, state: FSMContext, agent: UserServiceAgent) -> None:
+async def add_link(message: Message, state: FSMContext, raw_state: Optional[str], agent: UserServiceAgent) -> None:
     if message.from_user is None:
         return
     user_id = message.from_user.id
@@ -358,19 +353,18 @@ async def add_link(message: Message, state: FSMContext, agent: UserServiceAgent)
         return
     link = message.text
 
-    bot_logger.info(f'Got message {message.message_id} from {user_id}-{message.from_user.username}'
-                    f' on state:{await state.get_state()} for add_link. Link: {link}')
+    bot_logger.info('Got message %s from %s-%s on state:%s for add_link. Link: %s', message.message_id, user_id,
+                    message.from_user.username, raw_state, link)
 
     if link is None:
         await message.answer(text='Неверный формат текста')
-        bot_logger.debug(f'Get incorrect format of text for {message.message_id} of'
-                         f' {user_id}-{message.from_user.username}')
+        bot_logger.debug('Get incorrect format of text for %s of %s-%s', message.message_id, user_id,
+                         message.from_user.username)
         return
 
     if len(link) > MAXIMUM_LINK_LEN:
         await message.answer(text='Слишком длинная ссылка', reply_markup=keyboards.get_skip_add_links_markup())
-        bot_logger.debug(f'Too long link {message.message_id} of'
-                         f' {user_id}-{message.from_user.username}')
+        bot_logger.debug('Too long link %s of %s-%s', message.message_id, user_id, message.from_user.username)
         return
 
     try:
@@ -383,17 +377,15 @@ async def add_link(message: Message, state: FSMContext, agent: UserServiceAgent)
         else:
             await message.answer(f'Трек-лист {track_list.title} успешно добавлен.\n'
                                  f'Напоминание: можно ввести /skip', reply_markup=keyboards.get_skip_add_links_markup())
-        bot_logger.info(f'Successfully added link for {message.message_id} of'
-                        f' {user_id}-{message.from_user.username}')
+        bot_logger.info('Successfully added link for %s of %s-%s', message.message_id, user_id,
+                        message.from_user.username)
     except InvalidTrackListException:
         await message.answer(text='Ссылка недействительна')
-        bot_logger.debug(f'Get invalid link for {message.message_id} of'
-                         f' {user_id}-{message.from_user.username}')
+        bot_logger.debug('Get invalid link for %s of %s-%s', message.message_id, user_id, message.from_user.username)
     except TrackListAlreadyAddedException:
         await message.answer(text='Трек-лист уже был добавлен')
-        bot_logger.debug(f'Track-list already added for {message.message_id} of'
-                         f' {user_id}-{message.from_user.username}')
+        bot_logger.debug('Track-list already added for %s of %s-%s', message.message_id, user_id,
+                         message.from_user.username)
     except Exception as e:
-        bot_logger.warning(
-            f'On command {message.message_id} for {user_id}-{message.from_user.username}: {str(e)}')
+        bot_logger.warning('On command %s for %s-%s: %s', message.message_id, user_id, message.from_user.username, e)
         await message.answer(text=INTERNAL_ERROR_DEFAULT_TEXT)
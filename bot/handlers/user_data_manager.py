@@ -1,11 +1,39 @@
-from typing import Any
+from typing import Any, Optional
 
 from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.redis import RedisStorage
+
+from bot.fsm_access import FSMAccess
+from bot.fsm_snapshot import SnapshotFSMContext
 
 
 async def set_last_keyboard_id(msg_id: int, state: FSMContext) -> None:
-    await state.update_data(last_keyboard_id=msg_id)
+    if isinstance(state, SnapshotFSMContext):
+        # Changed fields of the snapshot are written atomically on flush.
+        await state.update_data(last_keyboard_id=msg_id)
+    elif isinstance(state.storage, RedisStorage):
+        # Atomic update, so the broker listener replacing the keyboard at the same time is not overwritten.
+        await FSMAccess.from_storage(state.storage, state.key.bot_id).update(state.key, last_keyboard_id=msg_id)
+    else:
+        await state.update_data(last_keyboard_id=msg_id)
 
 
 def get_last_keyboard_id(user_data: dict[str, Any]) -> Any:
     return user_data['last_keyboard_id']
+
+
+async def flush_state(state: FSMContext) -> None:
+    """
+    Makes changes of FSM visible to other updates before the handler finishes.
+    """
+
+    if isinstance(state, SnapshotFSMContext):
+        await state.flush()
+
+
+async def get_stored_state(state: FSMContext) -> Optional[str]:
+    """
+    Reads state from storage, it may be changed by another update while the handler waits.
+    """
+
+    return await state.storage.get_state(key=state.key)
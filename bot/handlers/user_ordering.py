@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Optional
+
+from aiogram.fsm.storage.base import BaseEventIsolation, StorageKey
+from pydantic import BaseModel
+from redis.asyncio import Redis
+
+root_logger = logging.getLogger('root')
+
+
+class UserLockStatistics(BaseModel):
+    acquired_count: int
+    average_wait_time: float
+    max_wait_time: float
+    locked_users_count: int
+
+
+class UserEventIsolation(BaseEventIsolation):
+    """
+    Events isolation of the dispatcher that handles updates of one user one by one in order of arrival,
+    while updates of different users are handled concurrently. FSM middleware takes the lock before it reads
+    the state, so an update is routed by the state left by the previous update of the user.
+    Within the process updates wait for a lock of the user, which wakes waiters in FIFO order.
+    Across replicas the lock is a redis lease, which is extended while the update is handled
+    and expires if the replica is stopped.
+    """
+
+    __redis: Optional[Redis]
+    __lease: float
+    __retry_interval: float
+    __key_prefix: str
+    __locks: dict[int, asyncio.Lock]
+    __waiters_counts: dict[int, int]
+
+    __acquired_count: int
+    __total_wait_time: float
+    __max_wait_time: float
+
+    # KEYS[1] is lease key, ARGV[1] is token of the owner. Lease is deleted only by its owner.
+    __RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+    # KEYS[1] is lease key, ARGV[1] is token of the owner, ARGV[2] is lease in milliseconds.
+    __EXTEND_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+    def __init__(
+            self,
+            redis: Optional[Redis] = None,
+            lease: float = 30,
+            retry_interval: float = 0.05,
+            key_prefix: str = 'user-lock'
+    ) -> None:
+        """
+        :param redis: redis client shared by replicas of the bot, updates are ordered only within the process if None
+        :param lease: seconds the redis lock is held by a replica that stopped without releasing it
+        :param retry_interval: seconds between tries to take the redis lock held by another replica
+        :param key_prefix: prefix of lock keys in redis
+        """
+
+        self.__redis = redis
+        self.__lease = lease
+        self.__retry_interval = retry_interval
+        self.__key_prefix = key_prefix
+        self.__locks = {}
+        self.__waiters_counts = {}
+
+        self.__acquired_count = 0
+        self.__total_wait_time = 0.0
+        self.__max_wait_time = 0.0
+
+        if redis is not None:
+            self.__release_script = redis.register_script(self.__RELEASE_SCRIPT)
+            self.__extend_script = redis.register_script(self.__EXTEND_SCRIPT)
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey) -> AsyncGenerator[None, None]:
+        user_id = key.user_id
+        started_at = time.perf_counter()
+        lock = self.__locks.setdefault(user_id, asyncio.Lock())
+        self.__waiters_counts[user_id] = self.__waiters_counts.get(user_id, 0) + 1
+        try:
+            async with lock:
+                if self.__redis is None:
+                    self.__register_wait_time(time.perf_counter() - started_at)
+                    yield
+                    return
+
+                token = await self.__acquire_lease(user_id)
+                self.__register_wait_time(time.perf_counter() - started_at)
+                if token is None:
+                    yield
+                    return
+
+                extending = asyncio.create_task(self.__extend_lease(user_id, token))
+                try:
+                    yield
+                finally:
+                    extending.cancel()
+                    await self.__release_lease(user_id, token)
+        finally:
+            self.__waiters_counts[user_id] -= 1
+            if self.__waiters_counts[user_id] == 0:
+                del self.__waiters_counts[user_id]
+                del self.__locks[user_id]
+
+    async def close(self) -> None:
+        # Redis client is shared with FSM storage and is closed with it.
+        pass
+
+    def get_statistics(self) -> UserLockStatistics:
+        average_wait_time = 0.0
+        if self.__acquired_count != 0:
+            average_wait_time = self.__total_wait_time / self.__acquired_count
+
+        return UserLockStatistics(
+            acquired_count=self.__acquired_count,
+            average_wait_time=average_wait_time,
+            max_wait_time=self.__max_wait_time,
+            locked_users_count=len(self.__locks),
+        )
+
+    async def __acquire_lease(self, user_id: int) -> Optional[str]:
+        """
+        :return: token of the lease, None if redis is unavailable and the update is ordered only within the process
+        """
+
+        token = uuid.uuid4().hex
+        try:
+            while not await self.__redis.set(self.__get_key(user_id), token, nx=True, px=int(self.__lease * 1000)):
+                await asyncio.sleep(self.__retry_interval)
+        except Exception as e:
+            root_logger.warning('Failed to take lock of user %s: %s', user_id, e)
+            return None
+        return token
+
+    async def __extend_lease(self, user_id: int, token: str) -> None:
+        while True:
+            await asyncio.sleep(self.__lease / 3)
+            try:
+                await self.__extend_script(keys=[self.__get_key(user_id)], args=[token, int(self.__lease * 1000)])
+            except Exception as e:
+                root_logger.warning('Failed to extend lock of user %s: %s', user_id, e)
+
+    async def __release_lease(self, user_id: int, token: str) -> None:
+        try:
+            await self.__release_script(keys=[self.__get_key(user_id)], args=[token])
+        except Exception as e:
+            # Lock is released by expiration of the lease.
+            root_logger.warning('Failed to release lock of user %s: %s', user_id, e)
+
+    def __register_wait_time(self, wait_time: float) -> None:
+        self.__acquired_count += 1
+        self.__total_wait_time += wait_time
+        self.__max_wait_time = max(self.__max_wait_time, wait_time)
+
+    def __get_key(self, user_id: int) -> str:
+        return f'{self.__key_prefix}:{user_id}'
+
+
+async def log_user_lock_statistics(isolation: UserEventIsolation, interval: float, logger: logging.Logger) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        statistics = isolation.get_statistics()
+        logger.info(f'User lock statistics: acquired {statistics.acquired_count},'
+                    f' average wait {statistics.average_wait_time * 1000:.2f}ms,'
+                    f' max wait {statistics.max_wait_time * 1000:.2f}ms,'
+                    f' locked users {statistics.locked_users_count}')
@@ -0,0 +1,260 @@
+import asyncio
+import logging
+from typing import Callable, Dict, Any, Awaitable, Coroutine, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.middlewares.user_context import UserContextMiddleware
+from aiogram.types import Update
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from services.broker import get_shard
+
+root_logger = logging.getLogger('root')
+
+
+class UpdateQueue:
+    """
+    Queue of raw updates between the receiver of updates and worker processes running handlers.
+    Updates are partitioned by chat into redis streams, every partition is consumed by one worker at a time,
+    so updates of a chat are handled in order of receiving. Update ids are remembered for a while,
+    so an update received twice is queued once.
+    """
+
+    __redis: Redis
+    __partitions_count: int
+    __key_prefix: str
+    __group_name: str
+    __dedup_ttl: int
+    __max_length: int
+    __read_timeout: float
+    __read_count: int
+
+    # KEYS[1] is update id key, KEYS[2] is partition stream, ARGV[1] is ttl of update id,
+    # ARGV[2] is approximate maximum length of stream, ARGV[3] is update.
+    # Returns 0 if the update was already queued.
+    __PUBLISH_SCRIPT = """
+if not redis.call('SET', KEYS[1], 1, 'NX', 'EX', ARGV[1]) then
+    return 0
+end
+redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[2], '*', 'update', ARGV[3])
+return 1
+"""
+
+    def __init__(
+            self,
+            redis: Redis,
+            partitions_count: int,
+            dedup_ttl: int = 24 * 60 * 60,
+            max_length: int = 100_000,
+            read_timeout: float = 1,
+            read_count: int = 100,
+            key_prefix: str = 'bot-updates',
+            group_name: str = 'bot-workers'
+    ) -> None:
+        """
+        :param redis: redis client shared by the receiver and workers
+        :param partitions_count: count of partitions of updates, not less than count of workers
+        :param dedup_ttl: seconds to remember update ids
+        :param max_length: approximate maximum count of updates kept in a partition
+        :param read_timeout: seconds to wait for new updates in one read
+        :param read_count: maximum count of updates of a partition taken in one read
+        :param key_prefix: prefix of queue keys in redis
+        :param group_name: name of consumer group of workers
+        """
+
+        if partitions_count <= 0:
+            raise ValueError(f'Partitions count must be positive, got {partitions_count}')
+
+        self.__redis = redis
+        self.__partitions_count = partitions_count
+        self.__dedup_ttl = dedup_ttl
+        self.__max_length = max_length
+        self.__read_timeout = read_timeout
+        self.__read_count = read_count
+        self.__key_prefix = key_prefix
+        self.__group_name = group_name
+        self.__publish_script = redis.register_script(self.__PUBLISH_SCRIPT)
+
+    async def publish(self, update: Update) -> bool:
+        """
+        :return: False if the update was already queued
+        """
+
+        context = UserContextMiddleware.resolve_event_context(event=update)
+        if context.chat is not None:
+            partition_key = context.chat.id
+        elif context.user is not None:
+            partition_key = context.user.id
+        else:
+            partition_key = update.update_id
+        stream_key = self.__get_stream_key(get_shard(partition_key, self.__partitions_count))
+        published = await self.__publish_script(
+            keys=[f'{self.__key_prefix}:seen:{update.update_id}', stream_key],
+            args=[self.__dedup_ttl, self.__max_length, update.model_dump_json(exclude_unset=True)],
+        )
+        return bool(published)
+
+    async def consume(
+            self,
+            worker_index: int,
+            workers_count: int,
+            on_update_callback: Callable[[Update], Coroutine[Any, Any, None]],
+            stopped: asyncio.Event
+    ) -> None:
+        """
+        Handles updates of partitions of the worker until stop. All partitions of the worker are read
+        by one blocking read, so the worker holds one redis connection while waiting for updates.
+        Updates of a partition are handled one by one, partitions are handled concurrently. An update being handled
+        when the worker stops is handled again after restart of the worker.
+        Partitions are assigned to workers statically, partitions of a stopped worker wait until it is restarted.
+
+        :param worker_index: index of the worker, from 0 to workers count
+        :param workers_count: count of all workers, on all machines
+        :param on_update_callback: coroutine that handles an update
+        :param stopped: event that stops consuming after updates being handled
+        """
+
+        stream_keys = [self.__get_stream_key(partition)
+                       for partition in range(worker_index, self.__partitions_count, workers_count)]
+        for stream_key in stream_keys:
+            try:
+                await self.__redis.xgroup_create(stream_key, self.__group_name, id='0', mkstream=True)
+            except ResponseError as e:
+                if 'BUSYGROUP' not in str(e):
+                    raise
+
+        # Read updates wait in memory for the handler of their partition, None stops the handler.
+        backlogs: dict[str, asyncio.Queue[Optional[tuple[Any, Optional[dict[Any, Any]]]]]] = {
+            stream_key: asyncio.Queue() for stream_key in stream_keys
+        }
+        handled = asyncio.Event()
+        reader = asyncio.create_task(self.__read(f'worker-{worker_index}', backlogs, handled, stopped))
+        handlers = [
+            asyncio.create_task(
+                self.__handle_partition(stream_key, backlog, handled, on_update_callback, stopped)
+            )
+            for stream_key, backlog in backlogs.items()
+        ]
+        root_logger.info(f'Worker {worker_index} consumes {len(handlers)} partitions of updates')
+        try:
+            done, _ = await asyncio.wait([reader, *handlers], return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+        finally:
+            for task in [reader, *handlers]:
+                task.cancel()
+            await asyncio.gather(reader, *handlers, return_exceptions=True)
+
+    async def __read(
+            self,
+            consumer_name: str,
+            backlogs: dict[str, asyncio.Queue[Optional[tuple[Any, Optional[dict[Any, Any]]]]]],
+            handled: asyncio.Event,
+            stopped: asyncio.Event
+    ) -> None:
+        # Updates taken before restart are handled first, they are read from the history of the consumer.
+        last_ids = {stream_key: '0' for stream_key in backlogs}
+        while len(last_ids) > 0 and not stopped.is_set():
+            response = await self.__redis.xreadgroup(self.__group_name, consumer_name, last_ids,
+                                                     count=self.__read_count)
+            read = self.__enqueue(response, backlogs)
+            for stream_key in list(last_ids):
+                entries = read.get(stream_key, [])
+                if len(entries) == 0:
+                    del last_ids[stream_key]
+                else:
+                    last_ids[stream_key] = entries[-1][0]
+
+        while not stopped.is_set():
+            # A partition is not read ahead of its handler more than by one read.
+            streams = {stream_key: '>' for stream_key, backlog in backlogs.items()
+                       if backlog.qsize() < self.__read_count}
+            if len(streams) == 0:
+                handled.clear()
+                try:
+                    await asyncio.wait_for(handled.wait(), timeout=self.__read_timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            response = await self.__redis.xreadgroup(self.__group_name, consumer_name, streams,
+                                                     count=self.__read_count,
+                                                     block=int(self.__read_timeout * 1000))
+            self.__enqueue(response, backlogs)
+
+        for backlog in backlogs.values():
+            backlog.put_nowait(None)
+
+    @staticmethod
+    def __enqueue(
+            response: Any,
+            backlogs: dict[str, asyncio.Queue[Optional[tuple[Any, Optional[dict[Any, Any]]]]]]
+    ) -> dict[str, list[tuple[Any, Optional[dict[Any, Any]]]]]:
+        read: dict[str, list[tuple[Any, Optional[dict[Any, Any]]]]] = {}
+        for stream_key, entries in response or []:
+            if isinstance(stream_key, bytes):
+                stream_key = stream_key.decode()
+            read[stream_key] = entries
+            for entry in entries:
+                backlogs[stream_key].put_nowait(entry)
+        return read
+
+    async def __handle_partition(
+            self,
+            stream_key: str,
+            backlog: asyncio.Queue[Optional[tuple[Any, Optional[dict[Any, Any]]]]],
+            handled: asyncio.Event,
+            on_update_callback: Callable[[Update], Coroutine[Any, Any, None]],
+            stopped: asyncio.Event
+    ) -> None:
+        while True:
+            entry = await backlog.get()
+            # Updates left in the backlog stay pending in redis and are handled after restart.
+            if entry is None or stopped.is_set():
+                return
+            entry_id, fields = entry
+            await self.__handle(stream_key, entry_id, fields, on_update_callback)
+            handled.set()
+
+    async def __handle(
+            self,
+            stream_key: str,
+            entry_id: Any,
+            fields: Optional[dict[Any, Any]],
+            on_update_callback: Callable[[Update], Coroutine[Any, Any, None]]
+    ) -> None:
+        if fields:
+            try:
+                update = Update.model_validate_json(fields.get(b'update', fields.get('update')))
+                await on_update_callback(update)
+            except Exception as e:
+                # Failed update is not handled again, as it would not be with polling.
+                root_logger.error(f'Update {entry_id} is not handled: {str(e)}')
+        async with self.__redis.pipeline(transaction=True) as pipe:
+            pipe.xack(stream_key, self.__group_name, entry_id)
+            pipe.xdel(stream_key, entry_id)
+            await pipe.execute()
+
+    def __get_stream_key(self, partition: int) -> str:
+        return f'{self.__key_prefix}:{partition}'
+
+
+class UpdatePublishMiddleware(BaseMiddleware):
+    """
+    Outer middleware of updates of the receiver, it queues updates for workers instead of handling them.
+    """
+
+    __update_queue: UpdateQueue
+
+    def __init__(self, update_queue: UpdateQueue) -> None:
+        self.__update_queue = update_queue
+
+    async def __call__(
+            self,
+            handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+            event: Update,
+            data: Dict[str, Any],
+    ) -> Any:
+        if not await self.__update_queue.publish(event):
+            root_logger.info(f'Update {event.update_id} is already queued')
@@ -15,9 +15,12 @@ __all__ = [
     'get_notify_management_keyboard',
     'get_inline_keyboard_for_playlists',
     'get_show_concerts_keyboard',
-    'KeyboardCallbackData'
+    'get_concert_map_keyboard',
+    'KeyboardCallbackData',
+    'ConcertsPageCallbackData',
 ]
 
 from .menu_keyboards import *
 from .registration_keyboards import *
 from .callback_data import *
+from .notification_keyboards import *
@@ -1,5 +1,7 @@
 from enum import StrEnum
 
+from aiogram.filters.callback_data import CallbackData
+
 
 class KeyboardCallbackData(StrEnum):
     CANCEL = 'cancel'
@@ -22,6 +24,19 @@ class KeyboardCallbackData(StrEnum):
     ENABLE = 'enable'
     DISABLE = 'disable'
     NOTICE_MANAGEMENT = 'notice_management'
+    # Buttons of concert pages before pages were encoded in ConcertsPageCallbackData.
     FORWARD = 'forward'
     BACKWARD = 'backward'
     FAQ = 'faq'
+    NOTIFICATIONS_MODE = 'notifications_mode'
+
+
+class ConcertsPageCallbackData(CallbackData, prefix='concerts'):
+    """
+    Button of a page of concerts. The page to show and count of pages are encoded in the button,
+    so pages are turned without FSM. Version is the generation of the list of concerts the keyboard was built for.
+    """
+
+    page: int
+    pages: int
+    version: str
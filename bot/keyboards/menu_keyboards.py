@@ -3,7 +3,7 @@ from aiogram.types import InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from model.playlist import Playlist
-from .callback_data import KeyboardCallbackData
+from .callback_data import KeyboardCallbackData, ConcertsPageCallbackData
 from .utils import create_resizable_inline_keyboard
 
 
@@ -134,6 +134,10 @@ def get_user_info_keyboard() -> InlineKeyboardMarkup:
         types.InlineKeyboardButton(
             text='Трек-листы', callback_data=KeyboardCallbackData.LINKS),
     )
+    builder.row(
+        types.InlineKeyboardButton(
+            text='Формат уведомлений', callback_data=KeyboardCallbackData.NOTIFICATIONS_MODE),
+    )
     builder.row(
         types.InlineKeyboardButton(
             text='Назад', callback_data=KeyboardCallbackData.BACK),
@@ -181,14 +185,35 @@ def get_notify_management_keyboard(is_enabled: bool) -> InlineKeyboardMarkup:
     return create_resizable_inline_keyboard(builder)
 
 
-def get_show_concerts_keyboard() -> InlineKeyboardMarkup:
+CONCERTS_PAGE_BUTTONS_COUNT = 5
+
+
+def get_show_concerts_keyboard(page: int, pages_count: int, version: str) -> InlineKeyboardMarkup:
+    """
+    :param page: index of the shown page from 0
+    :param pages_count: count of pages of the list
+    :param version: generation of the list of concerts
+    """
+
+    def page_button(text: str, to_page: int) -> types.InlineKeyboardButton:
+        return types.InlineKeyboardButton(
+            text=text, callback_data=ConcertsPageCallbackData(page=to_page, pages=pages_count, version=version).pack())
+
     builder = InlineKeyboardBuilder()
-    builder.row(
-        types.InlineKeyboardButton(
-            text='⬅️', callback_data=KeyboardCallbackData.BACKWARD),
-        types.InlineKeyboardButton(
-            text='➡️', callback_data=KeyboardCallbackData.FORWARD),
-    )
+    if pages_count > 1:
+        # Numbers of pages around the shown one.
+        first_page = max(0, min(page - CONCERTS_PAGE_BUTTONS_COUNT // 2, pages_count - CONCERTS_PAGE_BUTTONS_COUNT))
+        last_page = min(pages_count, first_page + CONCERTS_PAGE_BUTTONS_COUNT)
+        builder.row(*[
+            page_button(f'· {number + 1} ·' if number == page else str(number + 1), number)
+            for number in range(first_page, last_page)
+        ])
+        builder.row(
+            page_button('⏮', 0),
+            page_button('⬅️', (page - 1) % pages_count),
+            page_button('➡️', (page + 1) % pages_count),
+            page_button('⏭', pages_count - 1),
+        )
     builder.row(
         types.InlineKeyboardButton(
             text='Назад', callback_data=KeyboardCallbackData.BACK),
@@ -0,0 +1,15 @@
+from aiogram import types
+from aiogram.types import InlineKeyboardMarkup
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from .utils import create_resizable_inline_keyboard
+
+
+def get_concert_map_keyboard(map_url: str) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        types.InlineKeyboardButton(
+            text='Открыть на карте', url=map_url),
+    )
+
+    return create_resizable_inline_keyboard(builder)
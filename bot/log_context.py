@@ -0,0 +1,22 @@
+from typing import Callable, Dict, Any, Awaitable, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+
+from logging_pipeline import set_log_user
+
+
+class LogUserMiddleware(BaseMiddleware):
+    """
+    Outer middleware of updates that marks log records of the update with the user, for debug sampling.
+    """
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        user: Optional[User] = data.get('event_from_user')
+        set_log_user(user.id if user is not None else None)
+        return await handler(event, data)
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import signal
+from typing import Awaitable, Callable
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from settings import Settings
+
+root_logger = logging.getLogger('root')
+
+
+def create_webhook_app(dp: Dispatcher, bot: Bot, settings: Settings) -> web.Application:
+    """
+    Creates aiohttp application that passes updates received by webhook to the dispatcher.
+    Count of updates handled at once is limited, telegram waits for a response before it sends more.
+
+    :param dp: dispatcher with handlers of the bot
+    :param bot: bot whose updates are received
+    :param settings: settings of the webhook
+    """
+
+    semaphore = asyncio.Semaphore(settings.webhook_max_connections)
+
+    @web.middleware
+    async def limit_concurrency(
+            request: web.Request,
+            handler: Callable[[web.Request], Awaitable[web.StreamResponse]]
+    ) -> web.StreamResponse:
+        async with semaphore:
+            return await handler(request)
+
+    app = web.Application(middlewares=[limit_concurrency])
+    # Update is handled before response, so concurrency limit applies to handling and not only to receiving.
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=False,
+        secret_token=settings.webhook_secret or None,
+    ).register(app, path=settings.webhook_path)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, settings: Settings) -> None:
+    """
+    Serves webhook until SIGINT or SIGTERM. On stop new requests are refused
+    and updates being handled are finished within the shutdown timeout.
+
+    :param dp: dispatcher with handlers of the bot
+    :param bot: bot whose updates are received
+    :param settings: settings of the webhook
+    """
+
+    app = create_webhook_app(dp, bot, settings)
+    runner = web.AppRunner(app, shutdown_timeout=settings.webhook_shutdown_timeout)
+    await runner.setup()
+    site = web.TCPSite(runner, host=settings.webhook_host, port=settings.webhook_port)
+
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, stopped.set)
+
+    try:
+        await site.start()
+        # Replicas share one webhook, so it is only set by a process that knows the public url.
+        if settings.webhook_url:
+            await bot.set_webhook(
+                url=f'{settings.webhook_url.rstrip("/")}{settings.webhook_path}',
+                secret_token=settings.webhook_secret or None,
+                max_connections=settings.webhook_max_connections,
+                drop_pending_updates=False,
+            )
+        root_logger.info(f'Webhook is served on {settings.webhook_host}:{settings.webhook_port}'
+                         f'{settings.webhook_path}')
+        await stopped.wait()
+        root_logger.info('Webhook is stopping ...')
+    finally:
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(signal_number)
+        await runner.cleanup()
+        await bot.session.close()
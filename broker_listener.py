@@ -1,155 +1,483 @@
 import asyncio
-import json
 import logging
 import logging.config
-from asyncio import sleep
+import signal
+import socket
+from asyncio import Future, sleep
+from typing import Awaitable, Optional, Any
 
 from aiogram import Bot
 from aiogram.enums import ParseMode
-from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
-from redis import BusyLoadingError
+from aiogram.exceptions import (TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter, TelegramServerError,
+                                TelegramNetworkError)
+from redis import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
 from redis.asyncio import Redis
-from redis.asyncio.retry import Retry
-from redis.backoff import ExponentialBackoff
 
+from bot.fsm_access import FSMAccess
 from bot.handlers.constants import CHOOSE_ACTION_TEXT
-from bot.keyboards.menu_keyboards import get_main_menu_keyboard
+from bot.keyboards import get_main_menu_keyboard, get_concert_map_keyboard
 from bot.states.menu_states import MenuStates
-from concert_message_builder import get_date_time, get_lon_lat_from_yandex_map_link
-from model import TelegramUserData
-from services.broker import Broker, BrokerEvent
+from concert_message_builder import (configure_render_cache, get_render_cache_statistics, get_rendered_concert,
+                                     get_concerts_digest_messages)
+from logging_pipeline import set_log_user
+from model import Concert, TelegramUserData, NotificationsMode, DEFAULT_NOTIFICATIONS_MODE
+from notifications import (coalesce_events, BlockedUsers, DeliveryDedup, DeliveryDedupMode, DeliveryJob, DeliveryOutbox,
+                           DeliveryQueue, DeliveryScheduler, OutgoingMessage)
+from redis_connection import get_redis, log_redis_pool_statistics
+from services.broker import Broker, BrokerEvent, BroadcastEvent, BrokerRetryableException
 from services.broker.impl.rabbitmq_broker import RabbitMQBroker
+from services.user_service import UserServiceAgent
+from services.user_service.impl.agent_impl import UserServiceAgentImpl
 from settings import settings
 from utils import create_bot
 
-bot: Bot = create_bot(settings)
+redis: Redis = get_redis(settings)
+bot: Bot = create_bot(settings, redis)
+fsm_access = FSMAccess(redis=redis, bot_id=bot.id)
+delivery_dedup = DeliveryDedup(
+    redis=redis,
+    mode=DeliveryDedupMode(settings.delivery_dedup_mode),
+    grace_period=settings.delivery_dedup_grace_period,
+    reservation_ttl=settings.delivery_dedup_reservation_ttl,
+    bloom_bits=settings.delivery_dedup_bloom_bits,
+    bloom_hashes=settings.delivery_dedup_bloom_hashes,
+)
+blocked_users = BlockedUsers(redis=redis)
+# Sends of all listener processes are spread over the window at the rate allowed by the send governor.
+delivery_scheduler = DeliveryScheduler(
+    redis=redis,
+    window=settings.delivery_schedule_window,
+    rate=settings.telegram_global_rate / settings.delivery_schedule_requests_per_job
+    / max(1, settings.broker_processes_count),
+    batch_size=settings.delivery_schedule_batch_size,
+    concurrency=settings.delivery_schedule_concurrency,
+    quiet_hours_start=settings.delivery_quiet_hours_start,
+    quiet_hours_end=settings.delivery_quiet_hours_end,
+    default_timezone=settings.delivery_default_timezone,
+    city_timezones=settings.delivery_city_timezones,
+    lease=settings.delivery_schedule_lease,
+)
+# Jobs of the outbox are partitioned by user like events of listener processes.
+delivery_outbox = DeliveryOutbox(
+    redis=redis,
+    partitions_count=max(1, settings.broker_processes_count),
+    max_length=settings.delivery_outbox_max_length,
+    batch_size=settings.delivery_outbox_batch_size,
+    concurrency=settings.delivery_outbox_concurrency,
+    claim_timeout=settings.delivery_outbox_claim_timeout,
+)
+configure_render_cache(maxsize=settings.render_cache_size, ttl=settings.render_cache_ttl)
 
-REQUESTS_COUNT = 100000
-RETRY = 3
-TIMEOUT = 2
 
+# Temporary failures of telegram or redis, the event is retried later by broker.
+RETRYABLE_EXCEPTIONS = (TelegramRetryAfter, TelegramServerError, TelegramNetworkError,
+                        RedisConnectionError, RedisTimeoutError)
 
-class Singleton:
-    _instance = None
 
-    @staticmethod
-    def get_connection():
-        if not Singleton._instance:
-            Singleton._instance = Redis(
-                host=settings.redis_host,
-                port=settings.redis_port,
-                password=settings.redis_password,
-                socket_timeout=TIMEOUT,
-                retry=Retry(ExponentialBackoff(), RETRY),
-                retry_on_error=[BusyLoadingError, ConnectionError, TimeoutError]
-            )
-        return Singleton._instance
+async def on_message(event: BrokerEvent) -> Optional[Awaitable[None]]:
+    set_log_user(event.user.telegram_id)
+    broker_logger.info(f'got info for {event.user.telegram_id}')
+    try:
+        if len(await blocked_users.get_blocked([event.user.telegram_id])) != 0:
+            broker_logger.info(f'on {event.user.telegram_id} skipped, user blocked the bot')
+            return None
+        users_data = await fsm_access.get_data_many([fsm_access.get_user_key(event.user.telegram_id)])
+        sending = await deliver(event.user.telegram_id, event.concerts, users_data[0])
+    except RETRYABLE_EXCEPTIONS as e:
+        broker_logger.warning(f'on {event.user.telegram_id} temporary failure: {str(e)}')
+        raise BrokerRetryableException(str(e)) from e
+    if sending is None:
+        return None
+    # The event is acknowledged when the notification is sent, events of other users are handled meanwhile.
+    return wait_sent(event.user.telegram_id, sending)
 
 
-async def on_message(event: BrokerEvent) -> None:
-    broker_logger.info(f'got info for {event.user.telegram_id}')
-    connection = Singleton.get_connection()
-    data = await connection.get(name=f'fsm:{event.user.telegram_id}:{event.user.telegram_id}:data')
-    if data is not None:
-        broker_logger.debug(f'got data from redis for {event.user.telegram_id}')
+async def wait_sent(telegram_id: int, sending: Awaitable[None]) -> None:
+    try:
+        await sending
+    except RETRYABLE_EXCEPTIONS as e:
+        broker_logger.warning(f'on {telegram_id} temporary failure: {str(e)}')
+        raise BrokerRetryableException(str(e)) from e
+
+
+async def on_batch(events: list[BrokerEvent]) -> None:
+    coalesced_events = coalesce_events(events)
+    broker_logger.info(f'got batch of {len(events)} events for {len(coalesced_events)} users')
+    try:
+        blocked_telegram_ids = await blocked_users.get_blocked([event.user.telegram_id for event in coalesced_events])
+        coalesced_events = [event for event in coalesced_events if event.user.telegram_id not in blocked_telegram_ids]
+        users_data = await fsm_access.get_data_many([fsm_access.get_user_key(event.user.telegram_id)
+                                                     for event in coalesced_events])
+
+        semaphore = asyncio.Semaphore(settings.broker_workers_count)
+
+        async def deliver_with_limit(event: BrokerEvent, data: Optional[dict[str, Any]]) -> Optional[Future[None]]:
+            async with semaphore:
+                return await deliver(event.user.telegram_id, event.concerts, data)
+
+        # All notifications of the batch are queued before waiting for them, so they are sent by priority.
+        sending = await asyncio.gather(*[deliver_with_limit(event, data)
+                                         for event, data in zip(coalesced_events, users_data)])
+    except RETRYABLE_EXCEPTIONS as e:
+        broker_logger.warning(f'on batch of {len(events)} events temporary failure: {str(e)}')
+        raise BrokerRetryableException(str(e)) from e
+    results = await asyncio.gather(*[future for future in sending if future is not None], return_exceptions=True)
+    raise_delivery_failures([result for result in results if isinstance(result, Exception)],
+                            f'batch of {len(events)} events')
+
+
+async def on_broadcast(event: BroadcastEvent) -> None:
+    broker_logger.info(f'got broadcast of {len(event.concerts)} concerts for {len(event.telegram_ids)} users')
+    semaphore = asyncio.Semaphore(settings.broker_workers_count)
+    failures: list[Exception] = []
+
+    async def deliver_with_limit(telegram_id: int, data: Optional[dict[str, Any]]) -> Optional[Future[None]]:
+        async with semaphore:
+            try:
+                return await deliver(telegram_id, event.concerts, data)
+            except Exception as e:
+                broker_logger.warning(f'on {telegram_id} broadcast delivery failure: {str(e)}')
+                failures.append(e)
+                return None
+
+    # Users that already got the concerts are skipped by delivery dedup when a failed broadcast is retried.
+    for start in range(0, len(event.telegram_ids), settings.broadcast_chunk_size):
+        telegram_ids = event.telegram_ids[start:start + settings.broadcast_chunk_size]
         try:
-            keyboard_id = TelegramUserData.model_validate_json(data).last_keyboard_id
-            await bot.edit_message_text(chat_id=event.user.telegram_id, message_id=keyboard_id, text='Удалено')
-        except Exception as ex:
-            broker_logger.warning(f'on {event.user.telegram_id} when tried to delete keyboard exception: {str(ex)}')
+            blocked_telegram_ids = await blocked_users.get_blocked(telegram_ids)
+            telegram_ids = [telegram_id for telegram_id in telegram_ids if telegram_id not in blocked_telegram_ids]
+            users_data = await fsm_access.get_data_many([fsm_access.get_user_key(telegram_id)
+                                                         for telegram_id in telegram_ids])
+        except RETRYABLE_EXCEPTIONS as e:
+            raise BrokerRetryableException(str(e)) from e
+        # Notifications of the chunk are queued at once, the queue pauses consuming when they fill it.
+        sending = await asyncio.gather(*[deliver_with_limit(telegram_id, data)
+                                         for telegram_id, data in zip(telegram_ids, users_data)])
+        queued = [(telegram_id, future) for telegram_id, future in zip(telegram_ids, sending) if future is not None]
+        results = await asyncio.gather(*[future for _, future in queued], return_exceptions=True)
+        for (telegram_id, _), result in zip(queued, results):
+            if isinstance(result, Exception):
+                broker_logger.warning(f'on {telegram_id} broadcast delivery failure: {str(result)}')
+                failures.append(result)
 
-    for pos, concert in enumerate(event.concerts):
-        txt = f'Скоро состоится <a href=\"{concert.afisha_url}\">концерт</a>!!!\n\n'
+    raise_delivery_failures(failures, 'broadcast delivery')
 
-        if len(concert.artists) != 1 or concert.artists[0].name != concert.title:
-            txt += f'Название: <i>{concert.title}</i>\n\n'
 
-        if len(concert.artists) == 1:
-            txt += 'Исполнитель:'
-        else:
-            txt += 'Исполнители:'
+def raise_delivery_failures(failures: list[Exception], description: str) -> None:
+    retryable_failures = [e for e in failures if isinstance(e, RETRYABLE_EXCEPTIONS)]
+    if len(retryable_failures) != 0:
+        message = f'{len(retryable_failures)} temporary failures of {description}'
+        raise BrokerRetryableException(message) from retryable_failures[0]
+    if len(failures) != 0:
+        raise failures[0]
 
-        for artist in concert.artists:
-            txt += f' {artist.name},'
-        txt = txt[:-1]
 
-        txt += f'\n\nМесто: город <b>{concert.city}</b>, адрес <b>{concert.address}</b>\n'
-        if concert.place is not None:
-            txt += f'в <i>{concert.place}</i>\n\n'
-        else:
-            txt += '\n'
+async def deliver(telegram_id: int, concerts: list[Concert], data: Optional[dict[str, Any]]) -> Optional[Future[None]]:
+    # Returns future of sending of the notification, None if nothing is sent now.
+    job = await render(telegram_id, concerts, data)
+    if job is None:
+        return None
+    if settings.delivery_schedule_window > 0:
+        # Cities of the user are not known to the listener, concerts are found in them.
+        await delivery_scheduler.schedule(job, cities=[concert.city for concert in job.concerts])
+        return None
+    return await dispatch(job)
+
+
+async def dispatch(job: DeliveryJob) -> Optional[Future[None]]:
+    # With the outbox the event is acknowledged as soon as the job is stored, the job is sent by the outbox.
+    if settings.delivery_outbox_enabled:
+        await delivery_outbox.add(job)
+        return None
+    return await enqueue(job)
+
+
+def get_priority(job: DeliveryJob) -> float:
+    # Notifications of the nearest concerts are sent first.
+    return min(concert.concert_datetime.timestamp() for concert in job.concerts)
+
+
+async def enqueue(job: DeliveryJob) -> Future[None]:
+    return await delivery_queue.submit(job, priority=get_priority(job))
+
+
+async def send_queued(job: DeliveryJob) -> None:
+    await delivery_queue.deliver(job, priority=get_priority(job))
+
+
+async def send_scheduled(job: DeliveryJob) -> None:
+    # The event may be redelivered and scheduled again before the first job is sent.
+    if len(await delivery_dedup.filter_delivered(job.telegram_id, job.concerts)) == 0:
+        broker_logger.info(f'on {job.telegram_id} scheduled concerts were already delivered')
+        return
+    # The user may have got another keyboard since the job was scheduled.
+    users_data = await fsm_access.get_data_many([fsm_access.get_user_key(job.telegram_id)])
+    user_data = read_user_data(job.telegram_id, users_data[0])
+    job = job.model_copy(update={'last_keyboard_id': user_data.last_keyboard_id if user_data is not None else None})
+    sending = await dispatch(job)
+    if sending is not None:
+        await sending
+
+
+def read_user_data(telegram_id: int, data: Optional[dict[str, Any]]) -> Optional[TelegramUserData]:
+    if data is None:
+        return None
+    broker_logger.debug('got data from redis for %s', telegram_id)
+    try:
+        return TelegramUserData.model_validate(data)
+    except Exception as ex:
+        broker_logger.warning(f'on {telegram_id} when tried to read user data exception: {str(ex)}')
+        return None
+
 
-        if concert.concert_datetime is not None:
-            txt += f'Время: {get_date_time(concert.concert_datetime, True)}\n\n'
-        if concert.min_price is not None:
-            txt += f'Минимальная цена билета: <b>{concert.min_price.price}</b> <b>{concert.min_price.currency}</b>'
+async def render(telegram_id: int, concerts: list[Concert], data: Optional[dict[str, Any]]) -> Optional[DeliveryJob]:
+    set_log_user(telegram_id)
+    concerts = await delivery_dedup.filter_delivered(telegram_id, concerts)
+    if len(concerts) == 0:
+        broker_logger.info(f'on {telegram_id} all concerts were already delivered')
+        return None
+
+    notifications_mode = DEFAULT_NOTIFICATIONS_MODE
+    last_keyboard_id: Optional[int] = None
+    user_data = read_user_data(telegram_id, data)
+    if user_data is not None:
+        notifications_mode = user_data.notifications_mode
+        last_keyboard_id = user_data.last_keyboard_id
+
+    messages: list[OutgoingMessage] = []
+    if notifications_mode == NotificationsMode.DIGEST:
+        first_index = 0
+        for txt, concerts_count in get_concerts_digest_messages(concerts):
+            messages.append(OutgoingMessage(text=txt,
+                                            concert_indexes=list(range(first_index, first_index + concerts_count))))
+            first_index += concerts_count
+    else:
+        for index, concert in enumerate(concerts):
+            rendered_concert = get_rendered_concert(concert)
+            reply_markup = None
+            if rendered_concert.map_url is not None:
+                reply_markup = get_concert_map_keyboard(rendered_concert.map_url)
+            messages.append(OutgoingMessage(text=rendered_concert.message, reply_markup=reply_markup,
+                                            concert_indexes=[index]))
+
+    return DeliveryJob(telegram_id=telegram_id, last_keyboard_id=last_keyboard_id, messages=messages,
+                       concerts=concerts)
+
+
+async def send(job: DeliveryJob) -> None:
+    telegram_id = job.telegram_id
+    set_log_user(telegram_id)
+    # Keyboard was already deleted if the job is resumed.
+    if job.last_keyboard_id is not None and job.sent_count == 0:
         try:
-            await bot.send_message(chat_id=event.user.telegram_id,
-                                   text=txt,
-                                   parse_mode=ParseMode.HTML,
-                                   disable_web_page_preview=True)
-        except TelegramForbiddenError as e:
-            broker_logger.warning(f'on {event.user.telegram_id} when tried to send concert exception: {str(e)}')
-            return
-
-        if concert.map_url is not None:
-            try:
-                lon, lat = get_lon_lat_from_yandex_map_link(concert.map_url)
-                await bot.send_location(chat_id=event.user.telegram_id,
-                                        longitude=lon, latitude=lat)
-            except ValueError as e:
-                broker_logger.warning(f'on {event.user.telegram_id} when tried to get location exception: {str(e)}')
-            except TelegramForbiddenError as e:
-                broker_logger.warning(f'on {event.user.telegram_id} when tried to send location exception: {str(e)}')
-                return
-
-        await sleep(1)
-
-    await connection.set(name=f'fsm:{event.user.telegram_id}:{event.user.telegram_id}:state',
-                         value=str(MenuStates.MAIN_MENU.state))
+            await bot.edit_message_text(chat_id=telegram_id, message_id=job.last_keyboard_id, text='Удалено')
+        except Exception as ex:
+            broker_logger.warning(f'on {telegram_id} when tried to delete keyboard exception: {str(ex)}')
+
     try:
+        for sent_count, message in enumerate(job.messages[job.sent_count:], start=job.sent_count + 1):
+            await send_message(job, message)
+            if job.outbox_id is not None:
+                await delivery_outbox.checkpoint(job, sent_count)
+    except TelegramForbiddenError as e:
+        broker_logger.warning(f'on {telegram_id} when tried to send concert exception: {str(e)}')
+        await blocked_users.block(telegram_id)
+        return
 
-        msg = await bot.send_message(chat_id=event.user.telegram_id, text=CHOOSE_ACTION_TEXT,
+    try:
+        msg = await bot.send_message(chat_id=telegram_id, text=CHOOSE_ACTION_TEXT,
                                      reply_markup=get_main_menu_keyboard())
-        json_data = json.loads(data)
-        json_data['last_keyboard_id'] = msg.message_id
-        await connection.set(f'fsm:{event.user.telegram_id}:{event.user.telegram_id}:data',
-                             value=json.dumps(json_data))
-
+        await fsm_access.update(fsm_access.get_user_key(telegram_id),
+                                state=MenuStates.MAIN_MENU,
+                                last_keyboard_id=msg.message_id)
     except TelegramForbiddenError as e:
-        broker_logger.warning(f'on {event.user.telegram_id} when tried to send keyboard exception: {str(e)}')
+        broker_logger.warning(f'on {telegram_id} when tried to send keyboard exception: {str(e)}')
+        await blocked_users.block(telegram_id)
+        return
+
+
+async def send_message(job: DeliveryJob, message: OutgoingMessage) -> None:
+    # Concerts are remembered as delivered message by message, so a retry after a failure sends only the rest.
+    concerts = [job.concerts[index] for index in message.concert_indexes]
+    reserved_concerts = await delivery_dedup.reserve(job.telegram_id, concerts)
+    if len(concerts) != 0 and len(reserved_concerts) == 0:
+        broker_logger.info('on %s concerts of a message are already delivered or being sent', job.telegram_id)
         return
+    try:
+        await bot.send_message(chat_id=job.telegram_id,
+                               text=message.text,
+                               parse_mode=ParseMode.HTML,
+                               disable_web_page_preview=True,
+                               reply_markup=message.reply_markup)
+    except BaseException:
+        await delivery_dedup.release(job.telegram_id, reserved_concerts)
+        raise
+    await delivery_dedup.mark_delivered(job.telegram_id, reserved_concerts)
+
+
+delivery_queue: DeliveryQueue[DeliveryJob] = DeliveryQueue(
+    send_callback=send,
+    senders_count=settings.delivery_senders_count,
+    maxsize=settings.delivery_queue_size,
+    high_watermark=settings.delivery_queue_high_watermark,
+    low_watermark=settings.delivery_queue_low_watermark,
+)
 
 
 async def on_error(exception: Exception) -> None:
     root_logger.error('An error with broker occurred: %s' % exception)
 
 
-async def main() -> None:
+async def log_statistics(broker: Broker) -> None:
+    while True:
+        await sleep(settings.broker_statistics_interval)
+        statistics = broker.get_statistics()
+        render_cache_statistics = get_render_cache_statistics()
+        delivery_queue_statistics = delivery_queue.get_statistics()
+        root_logger.info(f'Broker statistics: in flight {statistics.in_flight_count},'
+                         f' processed {statistics.processed_count},'
+                         f' retried {statistics.retried_count},'
+                         f' dead lettered {statistics.dead_lettered_count},'
+                         f' reconnects {statistics.reconnect_count},'
+                         f' total downtime {statistics.total_downtime:.1f}s,'
+                         f' average processing time {statistics.average_processing_time:.3f}s,'
+                         f' max processing time {statistics.max_processing_time:.3f}s,'
+                         f' saved duplicate sends {delivery_dedup.get_saved_count()},'
+                         f' render cache hits {render_cache_statistics.hits},'
+                         f' misses {render_cache_statistics.misses},'
+                         f' delivery queue depth {delivery_queue_statistics.depth}'
+                         f' (max {delivery_queue_statistics.max_depth}),'
+                         f' paused {delivery_queue_statistics.pause_count} times'
+                         f' for {delivery_queue_statistics.total_pause_time:.1f}s')
+
+
+async def report_blocked_users(agent: UserServiceAgent) -> None:
+    while True:
+        await sleep(settings.blocked_users_report_interval)
+        try:
+            while True:
+                blocked, unblocked = await blocked_users.pop_unreported(settings.blocked_users_report_batch_size)
+                if len(blocked) == 0 and len(unblocked) == 0:
+                    break
+                try:
+                    await agent.report_users_reachability(blocked, unblocked)
+                except Exception:
+                    await blocked_users.restore_unreported(blocked, unblocked)
+                    raise
+                root_logger.info(f'Reported {len(blocked)} blocked and {len(unblocked)} unblocked users')
+        except Exception as e:
+            root_logger.warning(f'Failed to report blocked users: {str(e)}')
+
+
+async def main(
+        queue_name: str = settings.rabbitmq_queue,
+        priority_queue_name: Optional[str] = settings.rabbitmq_priority_queue or None,
+        declare_queue: bool = False,
+        shard: int = 0
+) -> None:
+    """
+    :param queue_name: name of the queue to listen, the shard queue when listener is started by the launcher
+    :param priority_queue_name: name of the queue of urgent events, not listened if not given
+    :param declare_queue: declare the queue, shard queues are owned by the bot
+    :param shard: shard of the listener process, jobs of the outbox partition of the shard are sent by the process
+    """
+
     try:
-        rabbitmq_broker: Broker = RabbitMQBroker()
+        rabbitmq_broker: Broker = RabbitMQBroker(
+            prefetch_count=settings.rabbitmq_prefetch_count,
+            workers_count=settings.broker_workers_count,
+            max_retries=settings.broker_max_retries,
+            retry_base_delay=settings.broker_retry_base_delay,
+            robust=settings.rabbitmq_robust_connection,
+            reconnect_base_delay=settings.rabbitmq_reconnect_base_delay,
+            reconnect_max_delay=settings.rabbitmq_reconnect_max_delay,
+            declare_queue=declare_queue,
+        )
         await rabbitmq_broker.connect(
-            queue_name=settings.rabbitmq_queue,
+            queue_name=queue_name,
             user_name=settings.rabbitmq_user,
             password=settings.rabbitmq_password,
             host=settings.rabbitmq_host,
             port=settings.rabbitmq_port,
+            priority_queue_name=priority_queue_name,
         )
 
-        await Singleton.get_connection().ping()
+        await redis.ping()
         root_logger.info('Connection with redis on broker is OK')
 
-        root_logger.info('Starting listening broker ...')
-        await rabbitmq_broker.start_listening(
-            on_message_callback=on_message,
-            on_error_callback=on_error,
+        root_logger.info(f'Starting listening broker queue {queue_name} ...')
+        statistics_task = asyncio.create_task(log_statistics(rabbitmq_broker))
+        agent = UserServiceAgentImpl(
+            user_service_host=settings.user_service_host,
+            user_service_port=settings.user_service_port,
         )
+        report_task = asyncio.create_task(report_blocked_users(agent))
+        redis_statistics_task = asyncio.create_task(
+            log_redis_pool_statistics(redis, settings.redis_statistics_interval, root_logger)
+        )
+        delivery_queue.set_backpressure_callbacks(on_pause=rabbitmq_broker.pause_consuming,
+                                                  on_resume=rabbitmq_broker.resume_consuming)
+        delivery_queue.start()
+        outbox_task: Optional[asyncio.Task[None]] = None
+        if settings.delivery_outbox_enabled:
+            outbox_task = asyncio.create_task(delivery_outbox.run(
+                partition=shard,
+                consumer_name=f'{socket.gethostname()}:{queue_name}',
+                send_callback=send_queued,
+                retryable_exceptions=RETRYABLE_EXCEPTIONS,
+            ))
+        scheduler_task: Optional[asyncio.Task[None]] = None
+        if settings.delivery_schedule_window > 0:
+            scheduler_task = asyncio.create_task(delivery_scheduler.run(send_scheduled, RETRYABLE_EXCEPTIONS))
+        if settings.broker_batch_size > 1:
+            listening_task = asyncio.create_task(rabbitmq_broker.start_batch_listening(
+                on_batch_callback=on_batch,
+                on_error_callback=on_error,
+                batch_size=settings.broker_batch_size,
+                max_wait=settings.broker_batch_max_wait,
+                on_broadcast_callback=on_broadcast,
+            ))
+        else:
+            listening_task = asyncio.create_task(rabbitmq_broker.start_listening(
+                on_message_callback=on_message,
+                on_error_callback=on_error,
+                on_broadcast_callback=on_broadcast,
+            ))
+        # On SIGTERM consuming stops and events that are already being delivered are finished.
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, listening_task.cancel)
+        try:
+            await listening_task
+        except asyncio.CancelledError:
+            root_logger.info(f'Listening broker queue {queue_name} is stopped')
+        finally:
+            if scheduler_task is not None:
+                scheduler_task.cancel()
+                await asyncio.gather(scheduler_task, return_exceptions=True)
+            if outbox_task is not None:
+                outbox_task.cancel()
+                await asyncio.gather(outbox_task, return_exceptions=True)
+            await delivery_queue.stop()
+            statistics_task.cancel()
+            report_task.cancel()
+            redis_statistics_task.cancel()
+            await agent.terminate()
     except Exception as e:
         logging.warning(e)
 
 
-if __name__ == "__main__":
+def run_listener(
+        queue_name: str = settings.rabbitmq_queue,
+        priority_queue_name: Optional[str] = settings.rabbitmq_priority_queue or None,
+        declare_queue: bool = False,
+        shard: int = 0
+) -> None:
+    global root_logger, broker_logger
+
     logging.config.fileConfig(fname='broker_logging.ini')
     root_logger = logging.getLogger('root')
     broker_logger = logging.getLogger('broker')
-    asyncio.run(main())
+    asyncio.run(main(queue_name, priority_queue_name, declare_queue, shard))
+
+
+if __name__ == "__main__":
+    run_listener()
@@ -1,3 +1,19 @@
-__all__ = ['get_date_time', 'get_lon_lat_from_yandex_map_link']
+__all__ = [
+    'MAX_MESSAGE_LENGTH',
+    'RenderedConcert',
+    'RenderCacheStatistics',
+    'configure_render_cache',
+    'get_render_cache_statistics',
+    'get_rendered_concert',
+    'get_date_time',
+    'get_lon_lat_from_yandex_map_link',
+    'get_concert_map_url',
+    'get_concert_message',
+    'get_concert_digest_entry',
+    'get_concerts_digest_messages'
+]
 
-from .concert_message_builder import get_date_time, get_lon_lat_from_yandex_map_link
+from .concert_message_builder import (MAX_MESSAGE_LENGTH, RenderedConcert, RenderCacheStatistics,
+                                      configure_render_cache, get_render_cache_statistics, get_rendered_concert,
+                                      get_date_time, get_lon_lat_from_yandex_map_link, get_concert_map_url,
+                                      get_concert_message, get_concert_digest_entry, get_concerts_digest_messages)
@@ -1,6 +1,15 @@
 from datetime import datetime
+from html import escape
+from typing import Any, NamedTuple, Optional
 from urllib.parse import urlparse, parse_qs
 
+from cachetools import TTLCache
+from pydantic import BaseModel
+
+from model import Concert
+
+MAX_MESSAGE_LENGTH = 4096
+
 months = {
     1: 'января',
     2: 'февраля',
@@ -46,3 +55,173 @@ def get_lon_lat_from_yandex_map_link(map_url: str) -> tuple[float, float]:
         return float(lat_lon_parsed[0]), float(lat_lon_parsed[1])
     except ValueError as e:
         raise ValueError('Bad value of coordinates') from e
+
+
+class RenderedConcert(NamedTuple):
+    message: str
+    map_url: Optional[str]
+    digest_entry: str  # without position in the digest
+
+
+class RenderCacheStatistics(BaseModel):
+    hits: int
+    misses: int
+    size: int
+
+
+# The same concert is sent to many users, so it is rendered once per cache lifetime.
+_render_cache: TTLCache[tuple[Any, ...], RenderedConcert] = TTLCache(maxsize=10_000, ttl=60 * 60)
+_render_cache_hits = 0
+_render_cache_misses = 0
+
+
+def configure_render_cache(maxsize: int, ttl: float) -> None:
+    """
+    Replaces the cache of rendered concerts with empty one.
+
+    :param maxsize: maximum count of concerts, least recently used ones are evicted
+    :param ttl: seconds to keep a rendered concert
+    """
+
+    global _render_cache
+    _render_cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+
+def get_render_cache_statistics() -> RenderCacheStatistics:
+    return RenderCacheStatistics(hits=_render_cache_hits, misses=_render_cache_misses, size=len(_render_cache))
+
+
+def get_rendered_concert(concert: Concert) -> RenderedConcert:
+    """
+    Returns rendered concert from cache, concerts are identified by afisha url and the fields that are rendered.
+    """
+
+    global _render_cache_hits, _render_cache_misses
+
+    key = _get_render_key(concert)
+    rendered = _render_cache.get(key)
+    if rendered is not None:
+        _render_cache_hits += 1
+        return rendered
+
+    _render_cache_misses += 1
+    map_url = _build_concert_map_url(concert)
+    rendered = RenderedConcert(
+        message=_build_concert_message(concert),
+        map_url=map_url,
+        digest_entry=_build_concert_digest_entry(concert, map_url),
+    )
+    _render_cache[key] = rendered
+    return rendered
+
+
+def get_concert_map_url(concert: Concert) -> Optional[str]:
+    """
+    Returns link to the venue on the map with a pin on it, or the original map link if it has no coordinates.
+    """
+
+    return get_rendered_concert(concert).map_url
+
+
+def get_concert_message(concert: Concert) -> str:
+    """
+    Returns detailed HTML message about the concert, the map is expected to be attached as a button.
+    """
+
+    return get_rendered_concert(concert).message
+
+
+def get_concert_digest_entry(concert: Concert, pos: int) -> str:
+    """
+    Returns compact HTML description of the concert for a digest, the map is given as a link.
+    """
+
+    return f'{pos}. {get_rendered_concert(concert).digest_entry}'
+
+
+def _get_render_key(concert: Concert) -> tuple[Any, ...]:
+    # Hashing of a tuple of the fields is much cheaper than serialization of the whole concert.
+    min_price = (concert.min_price.price, concert.min_price.currency) if concert.min_price is not None else None
+    return (concert.afisha_url, concert.title, concert.city, concert.place, concert.address, concert.concert_datetime,
+            concert.map_url, min_price, tuple(artist.name for artist in concert.artists))
+
+
+def _build_concert_map_url(concert: Concert) -> Optional[str]:
+    if concert.map_url is None:
+        return None
+    try:
+        lon, lat = get_lon_lat_from_yandex_map_link(concert.map_url)
+        return f'https://yandex.ru/maps/?pt={lon},{lat}&z=16&l=map'
+    except ValueError:
+        return concert.map_url
+
+
+def _build_concert_message(concert: Concert) -> str:
+    parts = [f'Скоро состоится <a href="{escape(concert.afisha_url)}">концерт</a>!!!\n\n']
+
+    if len(concert.artists) != 1 or concert.artists[0].name != concert.title:
+        parts.append(f'Название: <i>{escape(concert.title, quote=False)}</i>\n\n')
+
+    parts.append('Исполнитель: ' if len(concert.artists) == 1 else 'Исполнители: ')
+    parts.append(', '.join(escape(artist.name, quote=False) for artist in concert.artists))
+
+    parts.append(f'\n\nМесто: город <b>{escape(concert.city, quote=False)}</b>,'
+                 f' адрес <b>{escape(concert.address, quote=False)}</b>\n')
+    if concert.place is not None:
+        parts.append(f'в <i>{escape(concert.place, quote=False)}</i>\n\n')
+    else:
+        parts.append('\n')
+
+    if concert.concert_datetime is not None:
+        parts.append(f'Время: {get_date_time(concert.concert_datetime, True)}\n\n')
+    if concert.min_price is not None:
+        parts.append(f'Минимальная цена билета: <b>{concert.min_price.price}</b>'
+                     f' <b>{escape(concert.min_price.currency, quote=False)}</b>')
+    return ''.join(parts)
+
+
+def _build_concert_digest_entry(concert: Concert, map_url: Optional[str]) -> str:
+    parts = [f'<a href="{escape(concert.afisha_url)}"><b>{escape(concert.title, quote=False)}</b></a>\n']
+
+    if len(concert.artists) != 1 or concert.artists[0].name != concert.title:
+        parts.append(', '.join(escape(artist.name, quote=False) for artist in concert.artists))
+        parts.append('\n')
+
+    parts.append(escape(concert.city, quote=False))
+    parts.append(', ')
+    parts.append(escape(concert.place if concert.place is not None else concert.address, quote=False))
+    if map_url is not None:
+        parts.append(f' (<a href="{escape(map_url)}">карта</a>)')
+    parts.append('\n')
+
+    if concert.concert_datetime is not None:
+        parts.append(get_date_time(concert.concert_datetime, True))
+    if concert.min_price is not None:
+        parts.append(f', от <b>{concert.min_price.price} {escape(concert.min_price.currency, quote=False)}</b>')
+    return ''.join(parts)
+
+
+def get_concerts_digest_messages(concerts: list[Concert]) -> list[tuple[str, int]]:
+    """
+    Packs descriptions of the concerts into as few HTML messages as Telegram message length limit allows.
+
+    :return: text of every message and count of concerts described by it, concerts keep their order
+    """
+
+    if len(concerts) == 0:
+        return []
+
+    messages: list[tuple[str, int]] = []
+    current = 'Скоро состоятся концерты!!!'
+    current_count = 0
+    for pos, concert in enumerate(concerts):
+        entry = get_concert_digest_entry(concert, pos + 1)
+        if len(current) + len(entry) + 2 > MAX_MESSAGE_LENGTH:
+            messages.append((current, current_count))
+            current = entry
+            current_count = 1
+        else:
+            current = f'{current}\n\n{entry}'
+            current_count += 1
+    messages.append((current, current_count))
+    return messages
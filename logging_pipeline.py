@@ -0,0 +1,95 @@
+import copy
+import json
+import logging
+import queue
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from settings import settings
+
+# Telegram id of the user whose update or notification is handled by the current task.
+log_user_id: ContextVar[Optional[int]] = ContextVar('log_user_id', default=None)
+
+
+def set_log_user(user_id: Optional[int]) -> None:
+    log_user_id.set(user_id)
+
+
+def is_user_sampled(user_id: Optional[int]) -> bool:
+    """
+    Returns whether debug records of the user are written. A user is sampled in all processes or in none.
+    """
+
+    rate = settings.log_debug_sample_rate
+    if rate >= 1 or user_id is None:
+        return True
+    # Multiplicative hash spreads sequential telegram ids uniformly.
+    return (user_id * 2654435761) % 2 ** 32 < rate * 2 ** 32
+
+
+class UserDebugSamplingFilter(logging.Filter):
+    """
+    Drops debug records of users that are not sampled and marks records with the current user.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        user_id = log_user_id.get()
+        record.user_id = user_id
+        return record.levelno > logging.DEBUG or is_user_sampled(user_id)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        user_id = getattr(record, 'user_id', None)
+        if user_id is not None:
+            entry['user_id'] = user_id
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class QueueFileHandler(QueueHandler):
+    """
+    File handler for logging configs, records are put into a queue on the event loop
+    and are formatted and written to the file by a thread. With LOG_JSON records are written as JSON lines.
+    """
+
+    __file_handler: logging.FileHandler
+    __listener: Optional[QueueListener]
+
+    def __init__(self, filename: str, mode: str = 'a', encoding: str = 'utf-8') -> None:
+        super().__init__(queue.SimpleQueue())
+        self.__file_handler = logging.FileHandler(filename, mode=mode, encoding=encoding)
+        if settings.log_json:
+            self.__file_handler.setFormatter(JsonFormatter())
+        self.addFilter(UserDebugSamplingFilter())
+        self.__listener = QueueListener(self.queue, self.__file_handler)
+        self.__listener.start()
+
+    def setFormatter(self, fmt: Optional[logging.Formatter]) -> None:
+        # Formatter of the config is applied in the thread writing the file.
+        if not settings.log_json:
+            self.__file_handler.setFormatter(fmt)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only arguments are merged here, as they may change later, the rest of formatting is done by the thread.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def close(self) -> None:
+        # Records already queued are written before the file is closed.
+        if self.__listener is not None:
+            self.__listener.stop()
+            self.__listener = None
+            self.__file_handler.close()
+        super().close()
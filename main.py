@@ -4,22 +4,69 @@ from logging import config
 
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.redis import RedisStorage
+from redis.asyncio import Redis
 
 from bot import handlers
+from bot.fsm_access import FSM_KEY_BUILDER
+from bot.fsm_snapshot import FSMSnapshotMiddleware
+from bot.handlers.concert_pages import ConcertPages
 from bot.handlers.throttling_protection import AntiFloodMiddleware, AntiFloodMiddlewareM
+from bot.handlers.user_ordering import UserEventIsolation, log_user_lock_statistics
+from bot.ingestion import UpdateQueue, UpdatePublishMiddleware
+from bot.log_context import LogUserMiddleware
+from bot.webhook import run_webhook
+from notifications import BlockedUsers
+from redis_connection import get_redis, log_redis_pool_statistics
 from services.user_service import UserServiceAgent
 from services.user_service.impl.agent_impl import UserServiceAgentImpl
 from settings import settings
 from utils import create_bot
 
 
+def create_dispatcher(storage: RedisStorage, agent: UserServiceAgent) -> Dispatcher:
+    # Handlers read and write FSM data of the user, so updates of one user must not be handled concurrently.
+    # The lock is taken by FSM middleware before the state of the user is read.
+    user_ordering = UserEventIsolation(
+        redis=storage.redis if settings.bot_user_lock_distributed else None,
+        lease=settings.bot_user_lock_lease,
+    )
+    dp = Dispatcher(storage=storage, events_isolation=user_ordering, disable_fsm=True)
+    dp.update.outer_middleware(LogUserMiddleware())
+    dp['agent'] = agent
+    dp['redis_storage'] = storage.redis
+    dp['blocked_users'] = BlockedUsers(redis=storage.redis)
+    dp['concert_pages'] = ConcertPages(redis=storage.redis, ttl=settings.concert_pages_ttl)
+    dp['user_ordering'] = user_ordering
+    # State and data are read once per update and changes are written back after the handler.
+    dp.fsm = FSMSnapshotMiddleware(storage=storage, events_isolation=user_ordering)
+    dp.update.outer_middleware(dp.fsm)
+
+    dp.include_router(handlers.common_router)
+    dp.callback_query.middleware(AntiFloodMiddleware())
+    dp.message.middleware(AntiFloodMiddlewareM())
+
+    dp.include_router(handlers.registration_router)
+    dp.include_router(handlers.menu_router)
+    dp.include_router(handlers.change_data_router)
+    return dp
+
+
+def create_update_queue(redis: Redis) -> UpdateQueue:
+    return UpdateQueue(
+        redis=redis,
+        partitions_count=settings.bot_ingestion_partitions,
+        dedup_ttl=settings.bot_ingestion_dedup_ttl,
+        max_length=settings.bot_ingestion_max_length,
+    )
+
+
 async def main() -> None:
     agent: UserServiceAgent = UserServiceAgentImpl(
         user_service_host=settings.user_service_host,
         user_service_port=settings.user_service_port,
     )
 
-    storage = RedisStorage.from_url(f'redis://:{settings.redis_password}@{settings.redis_host}:{settings.redis_port}')
+    storage = RedisStorage(redis=get_redis(settings), key_builder=FSM_KEY_BUILDER)
 
     try:
         await storage.redis.ping()
@@ -28,20 +75,31 @@ async def main() -> None:
         root_logger.error(msg=f'No connection with redis on bot. {str(e)}')
         return
 
-    bot: Bot = create_bot(settings)
-    dp = Dispatcher(storage=storage)
-    dp['agent'] = agent
-    dp['redis_storage'] = storage.redis
-
-    dp.include_router(handlers.common_router)
-    dp.callback_query.middleware(AntiFloodMiddleware())
-    dp.message.middleware(AntiFloodMiddlewareM())
-
-    dp.include_router(handlers.registration_router)
-    dp.include_router(handlers.menu_router)
-    dp.include_router(handlers.change_data_router)
-    await bot.delete_webhook(drop_pending_updates=True)
-    await dp.start_polling(bot)
+    bot: Bot = create_bot(settings, storage.redis)
+    if settings.bot_ingestion_enabled:
+        # Updates are only received here and handled by workers started with run_bot_workers.py.
+        dp = Dispatcher()
+        dp.update.outer_middleware(UpdatePublishMiddleware(create_update_queue(storage.redis)))
+        root_logger.info('Bot receives updates for workers')
+    else:
+        dp = create_dispatcher(storage, agent)
+    statistics_tasks = [asyncio.create_task(
+        log_redis_pool_statistics(storage.redis, settings.redis_statistics_interval, root_logger)
+    )]
+    if not settings.bot_ingestion_enabled:
+        statistics_tasks.append(asyncio.create_task(
+            log_user_lock_statistics(dp['user_ordering'], settings.bot_user_lock_statistics_interval, root_logger)
+        ))
+    try:
+        if settings.bot_mode == 'webhook':
+            await run_webhook(dp, bot, settings)
+        else:
+            await bot.delete_webhook(drop_pending_updates=True)
+            # Receiver queues updates one by one, so updates of a chat are queued in order.
+            await dp.start_polling(bot, handle_as_tasks=not settings.bot_ingestion_enabled)
+    finally:
+        for statistics_task in statistics_tasks:
+            statistics_task.cancel()
 
 
 if __name__ == "__main__":
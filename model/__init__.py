@@ -3,7 +3,9 @@ __all__ = [
     'Concert',
     'Price',
     'User',
-    'TelegramUserData'
+    'TelegramUserData',
+    'NotificationsMode',
+    'DEFAULT_NOTIFICATIONS_MODE'
 ]
 
 from .artist import Artist
@@ -11,3 +13,4 @@ from .concert import Concert
 from .price import Price
 from .user import User
 from .telegram_user_data import TelegramUserData
+from .notifications_mode import NotificationsMode, DEFAULT_NOTIFICATIONS_MODE
@@ -15,6 +15,5 @@ class Concert(BaseModel):
     address: str
     concert_datetime: datetime = Field(validation_alias='datetime')
     map_url: Optional[str]
-    images: list[str]
     min_price: Optional[Price]
     artists: list[Artist]
@@ -0,0 +1,10 @@
+from enum import StrEnum
+
+
+class NotificationsMode(StrEnum):
+    FULL = 'full'
+    DIGEST = 'digest'
+
+
+# Users who did not choose a mode get a message per concert, as before the digest mode appeared.
+DEFAULT_NOTIFICATIONS_MODE = NotificationsMode.FULL
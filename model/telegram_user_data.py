@@ -1,5 +1,8 @@
 from pydantic import BaseModel
 
+from .notifications_mode import NotificationsMode, DEFAULT_NOTIFICATIONS_MODE
+
 
 class TelegramUserData(BaseModel):
     last_keyboard_id: int
+    notifications_mode: NotificationsMode = DEFAULT_NOTIFICATIONS_MODE
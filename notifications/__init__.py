@@ -0,0 +1,20 @@
+__all__ = [
+    'BlockedUsers',
+    'coalesce_events',
+    'DeliveryDedup',
+    'DeliveryDedupMode',
+    'DeliveryJob',
+    'DeliveryOutbox',
+    'OutgoingMessage',
+    'DeliveryQueue',
+    'DeliveryQueueStatistics',
+    'DeliveryScheduler'
+]
+
+from .blocked_users import BlockedUsers
+from .coalescing import coalesce_events
+from .delivery_dedup import DeliveryDedup, DeliveryDedupMode
+from .delivery_job import DeliveryJob, OutgoingMessage
+from .delivery_outbox import DeliveryOutbox
+from .delivery_queue import DeliveryQueue, DeliveryQueueStatistics
+from .delivery_scheduler import DeliveryScheduler
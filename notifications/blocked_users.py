@@ -0,0 +1,82 @@
+from redis.asyncio import Redis
+
+
+class BlockedUsers:
+    """
+    Registry of users who blocked the bot, stored in redis and shared by the bot and the broker listener.
+    Changes of the registry are also queued until they are reported to the user service.
+    """
+
+    __redis: Redis
+    __blocked_key: str
+    __unreported_blocked_key: str
+    __unreported_unblocked_key: str
+
+    def __init__(self, redis: Redis, key_prefix: str = 'blocked-users') -> None:
+        """
+        :param redis: redis client shared by the bot and the broker listener
+        :param key_prefix: prefix of registry keys in redis
+        """
+
+        self.__redis = redis
+        self.__blocked_key = key_prefix
+        self.__unreported_blocked_key = f'{key_prefix}:unreported:blocked'
+        self.__unreported_unblocked_key = f'{key_prefix}:unreported:unblocked'
+
+    async def get_blocked(self, telegram_ids: list[int]) -> set[int]:
+        """
+        Checks many users with one request.
+
+        :param telegram_ids: telegram ids of users
+        :return: telegram ids of users who blocked the bot
+        """
+
+        if len(telegram_ids) == 0:
+            return set()
+        flags = await self.__redis.smismember(self.__blocked_key, telegram_ids)
+        return {telegram_id for telegram_id, is_blocked in zip(telegram_ids, flags) if is_blocked}
+
+    async def block(self, telegram_id: int) -> None:
+        async with self.__redis.pipeline(transaction=True) as pipe:
+            pipe.sadd(self.__blocked_key, telegram_id)
+            pipe.srem(self.__unreported_unblocked_key, telegram_id)
+            pipe.sadd(self.__unreported_blocked_key, telegram_id)
+            await pipe.execute()
+
+    async def unblock(self, telegram_id: int) -> None:
+        """
+        Removes the user from the registry, nothing is reported if the user was not blocked.
+        """
+
+        if await self.__redis.srem(self.__blocked_key, telegram_id) == 0:
+            return
+        async with self.__redis.pipeline(transaction=True) as pipe:
+            pipe.srem(self.__unreported_blocked_key, telegram_id)
+            pipe.sadd(self.__unreported_unblocked_key, telegram_id)
+            await pipe.execute()
+
+    async def pop_unreported(self, count: int) -> tuple[list[int], list[int]]:
+        """
+        Takes changes that are not reported to the user service yet.
+
+        :param count: maximum count of users of each kind
+        :return: telegram ids of blocked users and of unblocked users
+        """
+
+        async with self.__redis.pipeline(transaction=True) as pipe:
+            pipe.spop(self.__unreported_blocked_key, count)
+            pipe.spop(self.__unreported_unblocked_key, count)
+            blocked, unblocked = await pipe.execute()
+        return [int(telegram_id) for telegram_id in blocked], [int(telegram_id) for telegram_id in unblocked]
+
+    async def restore_unreported(self, blocked: list[int], unblocked: list[int]) -> None:
+        """
+        Returns changes taken by pop_unreported whose report failed.
+        """
+
+        async with self.__redis.pipeline(transaction=True) as pipe:
+            if len(blocked) != 0:
+                pipe.sadd(self.__unreported_blocked_key, *blocked)
+            if len(unblocked) != 0:
+                pipe.sadd(self.__unreported_unblocked_key, *unblocked)
+            await pipe.execute()
@@ -0,0 +1,28 @@
+from model import Concert
+from services.broker import BrokerEvent
+
+
+def coalesce_events(events: list[BrokerEvent]) -> list[BrokerEvent]:
+    """
+    Merges events of the same user into one event, so the user gets a single delivery.
+
+    :param events: events in order of arrival
+    :return: one event per user in order of the user's first event, concerts are deduplicated by afisha url
+    """
+
+    users_events: dict[int, BrokerEvent] = {}
+    users_afisha_urls: dict[int, set[str]] = {}
+    for event in events:
+        telegram_id = event.user.telegram_id
+        if telegram_id not in users_events:
+            users_events[telegram_id] = BrokerEvent(user=event.user, concerts=[])
+            users_afisha_urls[telegram_id] = set()
+
+        concerts: list[Concert] = users_events[telegram_id].concerts
+        afisha_urls = users_afisha_urls[telegram_id]
+        for concert in event.concerts:
+            if concert.afisha_url not in afisha_urls:
+                afisha_urls.add(concert.afisha_url)
+                concerts.append(concert)
+
+    return list(users_events.values())
@@ -0,0 +1,285 @@
+import hashlib
+import time
+from enum import StrEnum
+
+from redis.asyncio import Redis
+
+from model import Concert
+
+
+class DeliveryDedupMode(StrEnum):
+    OFF = 'off'
+    EXACT = 'exact'
+    BLOOM = 'bloom'
+
+
+class DeliveryDedup:
+    """
+    Remembers concerts delivered to users, so republished and redelivered events don't send them again.
+    A delivered concert is remembered until its datetime plus grace period.
+
+    In exact mode every pair of user and concert is a separate redis key. In bloom mode concerts of a user are
+    kept in one bloom filter of fixed size, so memory is bounded, but a new concert is dropped
+    with a small false positive probability.
+
+    A sender reserves concerts of a message right before sending it, the check and the reservation are one script,
+    so the same concert is not sent by two senders at once. The reservation is replaced by the delivered mark
+    after the message is sent, or is released if sending fails. A reservation of a crashed sender expires.
+    """
+
+    __redis: Redis
+    __mode: DeliveryDedupMode
+    __grace_period: int
+    __reservation_ttl: int
+    __bloom_bits: int
+    __bloom_hashes: int
+    __key_prefix: str
+    __saved_count: int
+
+    # KEYS[1] is bloom filter key, ARGV[1] is count of hashes, ARGV[2..] are bit offsets of concerts, k per concert.
+    # Returns 1 for every concert whose bits are all set.
+    __BLOOM_CHECK_SCRIPT = """
+local hashes = tonumber(ARGV[1])
+local result = {}
+for i = 2, #ARGV, hashes do
+    local found = 1
+    for j = i, i + hashes - 1 do
+        if redis.call('GETBIT', KEYS[1], ARGV[j]) == 0 then
+            found = 0
+            break
+        end
+    end
+    result[#result + 1] = found
+end
+return result
+"""
+
+    # KEYS are keys of concerts, ARGV[1] is seconds to keep the reservation.
+    # A key holds 0 while the concert is reserved and 1 once it is delivered.
+    # Returns 1 for every concert reserved by this call.
+    __EXACT_RESERVE_SCRIPT = """
+local result = {}
+for i = 1, #KEYS do
+    if redis.call('SET', KEYS[i], 0, 'NX', 'EX', ARGV[1]) then
+        result[i] = 1
+    else
+        result[i] = 0
+    end
+end
+return result
+"""
+
+    # KEYS are keys of concerts, only reservations are removed, delivered marks are kept.
+    __EXACT_RELEASE_SCRIPT = """
+for i = 1, #KEYS do
+    if redis.call('GET', KEYS[i]) == '0' then
+        redis.call('DEL', KEYS[i])
+    end
+end
+return 1
+"""
+
+    # KEYS[1] is bloom filter key, KEYS[2..] are reservation keys of concerts, ARGV[1] is count of hashes,
+    # ARGV[2] is seconds to keep the reservation, ARGV[3..] are bit offsets of concerts, k per concert.
+    # Returns 1 for every concert reserved by this call.
+    __BLOOM_RESERVE_SCRIPT = """
+local hashes = tonumber(ARGV[1])
+local result = {}
+for i = 2, #KEYS do
+    local first_offset = 3 + (i - 2) * hashes
+    local found = 1
+    for j = first_offset, first_offset + hashes - 1 do
+        if redis.call('GETBIT', KEYS[1], ARGV[j]) == 0 then
+            found = 0
+            break
+        end
+    end
+    if found == 0 and redis.call('SET', KEYS[i], 1, 'NX', 'EX', ARGV[2]) then
+        result[#result + 1] = 1
+    else
+        result[#result + 1] = 0
+    end
+end
+return result
+"""
+
+    # KEYS[1] is bloom filter key, KEYS[2..] are reservation keys of concerts to remove,
+    # ARGV[1] is unix time of expiration, ARGV[2] is current unix time, ARGV[3..] are bit offsets to set.
+    # Expiration of the filter is only extended, so concerts added earlier are kept.
+    # TTL is used instead of EXPIRETIME, which needs redis 7.
+    __BLOOM_ADD_SCRIPT = """
+for i = 3, #ARGV do
+    redis.call('SETBIT', KEYS[1], ARGV[i], 1)
+end
+for i = 2, #KEYS do
+    redis.call('DEL', KEYS[i])
+end
+local expire_at = tonumber(ARGV[1])
+local ttl = redis.call('TTL', KEYS[1])
+if ttl < 0 or tonumber(ARGV[2]) + ttl < expire_at then
+    redis.call('EXPIREAT', KEYS[1], expire_at)
+end
+return 1
+"""
+
+    def __init__(
+            self,
+            redis: Redis,
+            mode: DeliveryDedupMode = DeliveryDedupMode.EXACT,
+            grace_period: int = 24 * 60 * 60,
+            reservation_ttl: int = 5 * 60,
+            bloom_bits: int = 4096,
+            bloom_hashes: int = 4,
+            key_prefix: str = 'delivered'
+    ) -> None:
+        """
+        :param redis: redis client shared by all processes of the listener
+        :param mode: how delivered concerts are remembered
+        :param grace_period: seconds to remember a concert after its datetime
+        :param reservation_ttl: seconds to keep a reservation of a concert by a sender that may have crashed
+        :param bloom_bits: size of bloom filter of a user in bits
+        :param bloom_hashes: count of bits of bloom filter set for a concert
+        :param key_prefix: prefix of dedup keys in redis
+        """
+
+        if bloom_bits <= 0 or bloom_hashes <= 0:
+            raise ValueError(f'Bloom filter bits and hashes must be positive, got {bloom_bits} and {bloom_hashes}')
+
+        self.__redis = redis
+        self.__mode = mode
+        self.__grace_period = grace_period
+        self.__reservation_ttl = reservation_ttl
+        self.__bloom_bits = bloom_bits
+        self.__bloom_hashes = bloom_hashes
+        self.__key_prefix = key_prefix
+        self.__saved_count = 0
+        self.__bloom_check_script = redis.register_script(self.__BLOOM_CHECK_SCRIPT)
+        self.__exact_reserve_script = redis.register_script(self.__EXACT_RESERVE_SCRIPT)
+        self.__exact_release_script = redis.register_script(self.__EXACT_RELEASE_SCRIPT)
+        self.__bloom_reserve_script = redis.register_script(self.__BLOOM_RESERVE_SCRIPT)
+        self.__bloom_add_script = redis.register_script(self.__BLOOM_ADD_SCRIPT)
+
+    def get_saved_count(self) -> int:
+        """
+        Returns count of concerts that were not sent again since start.
+        """
+
+        return self.__saved_count
+
+    async def filter_delivered(self, telegram_id: int, concerts: list[Concert]) -> list[Concert]:
+        """
+        Drops concerts already delivered to the user, so they are not rendered.
+        Concerts being sent by another sender are kept, concerts are reserved right before sending.
+
+        :param telegram_id: telegram id of the user
+        :param concerts: concerts to deliver
+        :return: concerts that were not delivered, in the same order
+        """
+
+        if self.__mode == DeliveryDedupMode.OFF or len(concerts) == 0:
+            return concerts
+
+        if self.__mode == DeliveryDedupMode.BLOOM:
+            offsets = [offset for concert in concerts for offset in self.__get_bloom_offsets(concert)]
+            delivered = await self.__bloom_check_script(keys=[self.__get_bloom_key(telegram_id)],
+                                                        args=[self.__bloom_hashes, *offsets])
+        else:
+            marks = await self.__redis.mget([self.__get_concert_key(telegram_id, concert) for concert in concerts])
+            # Reserved concerts are marked with 0.
+            delivered = [mark is not None and int(mark) == 1 for mark in marks]
+
+        new_concerts = [concert for concert, is_delivered in zip(concerts, delivered) if not is_delivered]
+        self.__saved_count += len(concerts) - len(new_concerts)
+        return new_concerts
+
+    async def reserve(self, telegram_id: int, concerts: list[Concert]) -> list[Concert]:
+        """
+        Reserves concerts for sending to the user. Concerts that are delivered or reserved by another sender
+        are not reserved.
+
+        :param telegram_id: telegram id of the user
+        :param concerts: concerts of a message to send
+        :return: reserved concerts, in the same order
+        """
+
+        if self.__mode == DeliveryDedupMode.OFF or len(concerts) == 0:
+            return concerts
+
+        if self.__mode == DeliveryDedupMode.BLOOM:
+            offsets = [offset for concert in concerts for offset in self.__get_bloom_offsets(concert)]
+            keys = [self.__get_bloom_key(telegram_id),
+                    *[self.__get_reservation_key(telegram_id, concert) for concert in concerts]]
+            reserved = await self.__bloom_reserve_script(keys=keys,
+                                                         args=[self.__bloom_hashes, self.__reservation_ttl, *offsets])
+        else:
+            reserved = await self.__exact_reserve_script(
+                keys=[self.__get_concert_key(telegram_id, concert) for concert in concerts],
+                args=[self.__reservation_ttl]
+            )
+
+        reserved_concerts = [concert for concert, is_reserved in zip(concerts, reserved) if is_reserved]
+        self.__saved_count += len(concerts) - len(reserved_concerts)
+        return reserved_concerts
+
+    async def mark_delivered(self, telegram_id: int, concerts: list[Concert]) -> None:
+        """
+        Remembers reserved concerts as delivered to the user.
+
+        :param telegram_id: telegram id of the user
+        :param concerts: delivered concerts
+        """
+
+        if self.__mode == DeliveryDedupMode.OFF or len(concerts) == 0:
+            return
+
+        if self.__mode == DeliveryDedupMode.BLOOM:
+            expire_at = max(self.__get_expire_at(concert) for concert in concerts)
+            offsets = [offset for concert in concerts for offset in self.__get_bloom_offsets(concert)]
+            keys = [self.__get_bloom_key(telegram_id),
+                    *[self.__get_reservation_key(telegram_id, concert) for concert in concerts]]
+            await self.__bloom_add_script(keys=keys, args=[expire_at, int(time.time()), *offsets])
+        else:
+            async with self.__redis.pipeline(transaction=False) as pipe:
+                for concert in concerts:
+                    pipe.set(name=self.__get_concert_key(telegram_id, concert), value=1,
+                             exat=self.__get_expire_at(concert))
+                await pipe.execute()
+
+    async def release(self, telegram_id: int, concerts: list[Concert]) -> None:
+        """
+        Removes reservations of concerts that were not sent, so they are sent by a retry.
+
+        :param telegram_id: telegram id of the user
+        :param concerts: reserved concerts
+        """
+
+        if self.__mode == DeliveryDedupMode.OFF or len(concerts) == 0:
+            return
+
+        if self.__mode == DeliveryDedupMode.BLOOM:
+            await self.__redis.delete(*[self.__get_reservation_key(telegram_id, concert) for concert in concerts])
+        else:
+            await self.__exact_release_script(
+                keys=[self.__get_concert_key(telegram_id, concert) for concert in concerts]
+            )
+
+    def __get_expire_at(self, concert: Concert) -> int:
+        # Concerts that already took place are remembered for grace period from now.
+        return int(max(concert.concert_datetime.timestamp(), time.time())) + self.__grace_period
+
+    def __get_bloom_offsets(self, concert: Concert) -> list[int]:
+        # Double hashing: k offsets are derived from two independent halves of one digest.
+        digest = hashlib.blake2b(concert.afisha_url.encode(), digest_size=16).digest()
+        first_hash = int.from_bytes(digest[:8], 'big')
+        second_hash = int.from_bytes(digest[8:], 'big') | 1
+        return [(first_hash + i * second_hash) % self.__bloom_bits for i in range(self.__bloom_hashes)]
+
+    def __get_concert_key(self, telegram_id: int, concert: Concert) -> str:
+        afisha_url_hash = hashlib.blake2b(concert.afisha_url.encode(), digest_size=12).hexdigest()
+        return f'{self.__key_prefix}:{telegram_id}:{afisha_url_hash}'
+
+    def __get_bloom_key(self, telegram_id: int) -> str:
+        return f'{self.__key_prefix}:bloom:{telegram_id}'
+
+    def __get_reservation_key(self, telegram_id: int, concert: Concert) -> str:
+        return f'{self.__get_concert_key(telegram_id, concert)}:reserved'
@@ -0,0 +1,31 @@
+from typing import Optional
+
+from aiogram.types import InlineKeyboardMarkup
+from pydantic import BaseModel
+
+from model import Concert
+
+
+class OutgoingMessage(BaseModel):
+    """
+    Message of a notification with indexes of the job concerts it describes,
+    they are remembered as delivered once the message is sent.
+    """
+
+    text: str
+    reply_markup: Optional[InlineKeyboardMarkup] = None
+    concert_indexes: list[int] = []
+
+
+class DeliveryJob(BaseModel):
+    """
+    Rendered notification of a user that is ready to be sent. A job resumed from the outbox
+    has its outbox id and count of messages sent before.
+    """
+
+    telegram_id: int
+    last_keyboard_id: Optional[int]
+    messages: list[OutgoingMessage]
+    concerts: list[Concert]
+    outbox_id: Optional[str] = None
+    sent_count: int = 0
@@ -0,0 +1,258 @@
+import asyncio
+import functools
+import logging
+import time
+from typing import Callable, Coroutine, Any, Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from services.broker import get_shard
+from .delivery_job import DeliveryJob
+
+root_logger = logging.getLogger('root')
+
+
+class DeliveryOutbox:
+    """
+    Durable outbox of rendered notifications in redis streams read by consumer groups of listener processes.
+    Jobs are partitioned by user like events of listener processes, a partition is read by the process
+    that handles its users, and jobs of a user are sent one by one in order of adding.
+    A job is completed when all its messages are sent, count of sent messages is checkpointed after each message,
+    so a job of a stopped process is resumed from the first unsent message. Jobs that are not completed
+    for the claim timeout are taken by another consumer of the partition. Adding waits while the partition is full,
+    so the event is not acknowledged and consuming of new events stops until jobs are sent.
+    """
+
+    __redis: Redis
+    __partitions_count: int
+    __key_prefix: str
+    __group_name: str
+    __max_length: int
+    __batch_size: int
+    __concurrency: int
+    __claim_timeout: float
+    __read_timeout: float
+
+    def __init__(
+            self,
+            redis: Redis,
+            partitions_count: int = 1,
+            max_length: int = 5_000,
+            batch_size: int = 100,
+            concurrency: int = 100,
+            claim_timeout: float = 300,
+            read_timeout: float = 1,
+            key_prefix: str = 'delivery-outbox',
+            group_name: str = 'listeners'
+    ) -> None:
+        """
+        :param redis: redis client shared by all processes of the listener
+        :param partitions_count: count of partitions of jobs, equal to count of listener processes
+        :param max_length: count of jobs in a partition when adding waits for sending
+        :param batch_size: maximum count of jobs read at once
+        :param concurrency: maximum count of jobs sent concurrently by a consumer
+        :param claim_timeout: seconds after which a job that is not completed is taken by another consumer
+        :param read_timeout: seconds to wait for new jobs in one read
+        :param key_prefix: prefix of outbox keys in redis
+        :param group_name: name of consumer group of listener processes
+        """
+
+        if partitions_count <= 0 or max_length <= 0:
+            raise ValueError(f'Partitions count and maximum length must be positive,'
+                             f' got {partitions_count} and {max_length}')
+        if batch_size <= 0 or concurrency <= 0:
+            raise ValueError(f'Batch size and concurrency must be positive, got {batch_size} and {concurrency}')
+
+        self.__redis = redis
+        self.__partitions_count = partitions_count
+        self.__key_prefix = key_prefix
+        self.__group_name = group_name
+        self.__max_length = max_length
+        self.__batch_size = batch_size
+        self.__concurrency = concurrency
+        self.__claim_timeout = claim_timeout
+        self.__read_timeout = read_timeout
+
+    async def add(self, job: DeliveryJob) -> str:
+        """
+        Stores the job durably, the job is sent by a consumer of its partition. Waits while the partition is full.
+
+        :return: id of the job in the outbox
+        """
+
+        partition = get_shard(job.telegram_id, self.__partitions_count)
+        if await self.get_length(partition) >= self.__max_length:
+            root_logger.warning(f'Outbox partition {partition} is full, adding of jobs waits for sending')
+            while await self.get_length(partition) >= self.__max_length:
+                await asyncio.sleep(self.__read_timeout)
+
+        outbox_id = await self.__redis.xadd(self.__get_stream_key(partition), {'job': job.model_dump_json()})
+        return outbox_id.decode() if isinstance(outbox_id, bytes) else outbox_id
+
+    async def checkpoint(self, job: DeliveryJob, sent_count: int) -> None:
+        """
+        Remembers count of sent messages of the job from the outbox, they are skipped when the job is resumed.
+        """
+
+        partition = get_shard(job.telegram_id, self.__partitions_count)
+        await self.__redis.hset(self.__get_progress_key(partition), job.outbox_id, sent_count)
+
+    async def run(
+            self,
+            partition: int,
+            consumer_name: str,
+            send_callback: Callable[[DeliveryJob], Coroutine[Any, Any, None]],
+            retryable_exceptions: tuple[type[Exception], ...] = ()
+    ) -> None:
+        """
+        Sends jobs of the partition until cancelled. Jobs are passed to the callback with outbox id and count
+        of already sent messages set. A job of a user waits until the previous job of the user is sent,
+        if the previous job is retried later, the job is retried after it.
+
+        :param partition: partition of the outbox, from 0 to partitions count
+        :param consumer_name: name of the consumer, stable between restarts, so own unfinished jobs are resumed at once
+        :param send_callback: coroutine that sends a job
+        :param retryable_exceptions: failures after which the job is sent again after the claim timeout,
+            jobs failed with other exceptions are dropped
+        """
+
+        stream_key = self.__get_stream_key(partition)
+        await self.__create_group(stream_key)
+        semaphore = asyncio.Semaphore(self.__concurrency)
+        # Jobs being sent by outbox id, a job claimed while it is sent here is not sent twice.
+        sending: dict[str, asyncio.Task[bool]] = {}
+        # Last job being sent of every user.
+        users_sending: dict[int, asyncio.Task[bool]] = {}
+
+        def forget_sent(telegram_id: int, task: asyncio.Task[bool]) -> None:
+            if users_sending.get(telegram_id) is task:
+                del users_sending[telegram_id]
+
+        async def start_sending(entries: list[tuple[Any, Any]]) -> None:
+            for entry_id, fields in entries:
+                job = await self.__read_job(partition, entry_id, fields)
+                if job is None or job.outbox_id in sending:
+                    continue
+                await semaphore.acquire()
+                task = asyncio.create_task(self.__send(partition, job, users_sending.get(job.telegram_id),
+                                                       send_callback, retryable_exceptions))
+                sending[job.outbox_id] = task
+                users_sending[job.telegram_id] = task
+                task.add_done_callback(lambda _, outbox_id=job.outbox_id: sending.pop(outbox_id))
+                task.add_done_callback(lambda _: semaphore.release())
+                task.add_done_callback(functools.partial(forget_sent, job.telegram_id))
+
+        try:
+            # Jobs that were taken by this consumer before restart.
+            response = await self.__redis.xreadgroup(self.__group_name, consumer_name, {stream_key: '0'})
+            for _, entries in response:
+                await start_sending(entries)
+
+            claimed_at = time.monotonic()
+            while True:
+                if time.monotonic() - claimed_at >= self.__claim_timeout:
+                    claimed_at = time.monotonic()
+                    await start_sending(await self.__claim(stream_key, consumer_name))
+
+                response = await self.__redis.xreadgroup(self.__group_name, consumer_name, {stream_key: '>'},
+                                                         count=self.__batch_size,
+                                                         block=int(self.__read_timeout * 1000))
+                for _, entries in response:
+                    await start_sending(entries)
+        finally:
+            # Jobs that are not completed are resumed after restart or claimed by another consumer.
+            tasks = list(sending.values())
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def get_length(self, partition: int) -> int:
+        """
+        Returns count of jobs of the partition that are not completed.
+        """
+
+        return await self.__redis.xlen(self.__get_stream_key(partition))
+
+    async def __create_group(self, stream_key: str) -> None:
+        try:
+            await self.__redis.xgroup_create(stream_key, self.__group_name, id='0', mkstream=True)
+        except ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    async def __claim(self, stream_key: str, consumer_name: str) -> list[tuple[Any, Any]]:
+        entries: list[tuple[Any, Any]] = []
+        start_id = '0-0'
+        while True:
+            response = await self.__redis.xautoclaim(stream_key, self.__group_name, consumer_name,
+                                                     min_idle_time=int(self.__claim_timeout * 1000),
+                                                     start_id=start_id, count=self.__batch_size)
+            start_id, claimed_entries = response[0], response[1]
+            entries.extend(claimed_entries)
+            if start_id in (b'0-0', '0-0'):
+                return entries
+
+    async def __read_job(
+            self,
+            partition: int,
+            entry_id: Any,
+            fields: Optional[dict[Any, Any]]
+    ) -> Optional[DeliveryJob]:
+        outbox_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+        # Entry is missing if it was completed by another consumer after it was taken.
+        if not fields:
+            await self.__complete(partition, outbox_id)
+            return None
+
+        try:
+            job = DeliveryJob.model_validate_json(fields.get(b'job', fields.get('job')))
+        except ValueError as e:
+            root_logger.warning(f'Dropped outbox job {outbox_id} that can not be read: {str(e)}')
+            await self.__complete(partition, outbox_id)
+            return None
+
+        sent_count = await self.__redis.hget(self.__get_progress_key(partition), outbox_id)
+        return job.model_copy(update={'outbox_id': outbox_id, 'sent_count': int(sent_count or 0)})
+
+    async def __send(
+            self,
+            partition: int,
+            job: DeliveryJob,
+            previous: Optional[asyncio.Task[bool]],
+            send_callback: Callable[[DeliveryJob], Coroutine[Any, Any, None]],
+            retryable_exceptions: tuple[type[Exception], ...]
+    ) -> bool:
+        # Returns False if the job is left in the outbox to be retried later.
+        if previous is not None and not await asyncio.shield(previous):
+            root_logger.warning(f'Outbox job {job.outbox_id} of {job.telegram_id} is retried later'
+                                f' after the previous job of the user')
+            return False
+
+        if job.sent_count != 0:
+            root_logger.info(f'Resumed outbox job {job.outbox_id} of {job.telegram_id}'
+                             f' from message {job.sent_count + 1} of {len(job.messages)}')
+        try:
+            await send_callback(job)
+        except retryable_exceptions as e:
+            root_logger.warning(f'Outbox job {job.outbox_id} of {job.telegram_id} failed,'
+                                f' it is retried later: {str(e)}')
+            return False
+        except Exception as e:
+            root_logger.error(f'Outbox job {job.outbox_id} of {job.telegram_id} failed and is dropped: {str(e)}')
+        await self.__complete(partition, job.outbox_id)
+        return True
+
+    async def __complete(self, partition: int, outbox_id: str) -> None:
+        stream_key = self.__get_stream_key(partition)
+        async with self.__redis.pipeline(transaction=True) as pipe:
+            pipe.xack(stream_key, self.__group_name, outbox_id)
+            pipe.xdel(stream_key, outbox_id)
+            pipe.hdel(self.__get_progress_key(partition), outbox_id)
+            await pipe.execute()
+
+    def __get_stream_key(self, partition: int) -> str:
+        return f'{self.__key_prefix}:{partition}'
+
+    def __get_progress_key(self, partition: int) -> str:
+        return f'{self.__key_prefix}:{partition}:progress'
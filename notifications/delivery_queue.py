@@ -0,0 +1,162 @@
+import asyncio
+import itertools
+import time
+from typing import Callable, Coroutine, Any, Generic, Optional, TypeVar
+
+from pydantic import BaseModel
+
+Job = TypeVar('Job')
+
+
+class DeliveryQueueStatistics(BaseModel):
+    depth: int
+    max_depth: int
+    paused: bool
+    pause_count: int
+    total_pause_time: float
+
+
+class DeliveryQueue(Generic[Job]):
+    """
+    Bounded queue between rendering and sending of notifications. A producer gets a future of sending of its job,
+    so failures of sending are raised to the producer. Producers queue their jobs and wait for the futures later,
+    so depth of the queue is not limited by count of producers. When depth of the queue reaches high watermark,
+    pause callback is called to stop consuming of new events, resume callback is called when depth falls
+    to low watermark. Jobs with lower priority value are sent first, jobs of equal priority in order of queueing.
+    """
+
+    __send_callback: Callable[[Job], Coroutine[Any, Any, None]]
+    __senders_count: int
+    __queue: asyncio.PriorityQueue[tuple[float, int, Job, asyncio.Future[None]]]
+    __sequence: 'itertools.count[int]'
+    __high_watermark: int
+    __low_watermark: int
+    __on_pause: Optional[Callable[[], None]]
+    __on_resume: Optional[Callable[[], None]]
+    __senders: list[asyncio.Task[None]]
+
+    __max_depth: int
+    __paused_at: Optional[float]
+    __pause_count: int
+    __total_pause_time: float
+
+    def __init__(
+            self,
+            send_callback: Callable[[Job], Coroutine[Any, Any, None]],
+            senders_count: int,
+            maxsize: int,
+            high_watermark: int,
+            low_watermark: int
+    ) -> None:
+        """
+        :param send_callback: coroutine that sends a job
+        :param senders_count: count of jobs sent concurrently
+        :param maxsize: maximum count of jobs in the queue, producers wait when the queue is full
+        :param high_watermark: depth of the queue when consuming is paused
+        :param low_watermark: depth of the queue when consuming is resumed
+        """
+
+        if senders_count <= 0:
+            raise ValueError(f'Senders count must be positive, got {senders_count}')
+        if not 0 <= low_watermark < high_watermark <= maxsize:
+            raise ValueError(f'Watermarks must satisfy 0 <= low < high <= maxsize,'
+                             f' got {low_watermark}, {high_watermark} and {maxsize}')
+
+        self.__send_callback = send_callback
+        self.__senders_count = senders_count
+        self.__queue = asyncio.PriorityQueue(maxsize=maxsize)
+        self.__sequence = itertools.count()
+        self.__high_watermark = high_watermark
+        self.__low_watermark = low_watermark
+        self.__on_pause = None
+        self.__on_resume = None
+        self.__senders = []
+
+        self.__max_depth = 0
+        self.__paused_at = None
+        self.__pause_count = 0
+        self.__total_pause_time = 0.0
+
+    def set_backpressure_callbacks(self, on_pause: Callable[[], None], on_resume: Callable[[], None]) -> None:
+        self.__on_pause = on_pause
+        self.__on_resume = on_resume
+
+    def start(self) -> None:
+        self.__senders = [asyncio.create_task(self.__send_jobs()) for _ in range(self.__senders_count)]
+
+    async def stop(self) -> None:
+        """
+        Waits until queued jobs are sent and stops senders.
+        """
+
+        await self.__queue.join()
+        for sender in self.__senders:
+            sender.cancel()
+        await asyncio.gather(*self.__senders, return_exceptions=True)
+        self.__senders = []
+
+    async def deliver(self, job: Job, priority: float = 0.0) -> None:
+        """
+        Queues the job and waits until it is sent.
+
+        :param job: job to send
+        :param priority: jobs with lower value are sent first
+        :raises Exception: exception raised by send callback
+        """
+
+        await (await self.submit(job, priority))
+
+    async def submit(self, job: Job, priority: float = 0.0) -> asyncio.Future[None]:
+        """
+        Queues the job, waits only while the queue is full.
+
+        :param job: job to send
+        :param priority: jobs with lower value are sent first
+        :return: future that is done when the job is sent, with exception raised by send callback if it failed
+        """
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        # Sequence number keeps order of jobs with equal priority and prevents comparison of jobs.
+        await self.__queue.put((priority, next(self.__sequence), job, future))
+
+        depth = self.__queue.qsize()
+        self.__max_depth = max(self.__max_depth, depth)
+        if depth >= self.__high_watermark and self.__paused_at is None:
+            self.__paused_at = time.monotonic()
+            self.__pause_count += 1
+            if self.__on_pause is not None:
+                self.__on_pause()
+
+        return future
+
+    def get_statistics(self) -> DeliveryQueueStatistics:
+        total_pause_time = self.__total_pause_time
+        if self.__paused_at is not None:
+            total_pause_time += time.monotonic() - self.__paused_at
+
+        return DeliveryQueueStatistics(
+            depth=self.__queue.qsize(),
+            max_depth=self.__max_depth,
+            paused=self.__paused_at is not None,
+            pause_count=self.__pause_count,
+            total_pause_time=total_pause_time,
+        )
+
+    async def __send_jobs(self) -> None:
+        while True:
+            _, _, job, future = await self.__queue.get()
+            if self.__paused_at is not None and self.__queue.qsize() <= self.__low_watermark:
+                self.__total_pause_time += time.monotonic() - self.__paused_at
+                self.__paused_at = None
+                if self.__on_resume is not None:
+                    self.__on_resume()
+
+            try:
+                await self.__send_callback(job)
+                if not future.done():
+                    future.set_result(None)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self.__queue.task_done()
@@ -0,0 +1,259 @@
+import asyncio
+import functools
+import logging
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Coroutine, Any, Optional
+from zoneinfo import ZoneInfo
+
+from redis.asyncio import Redis
+
+from .delivery_job import DeliveryJob
+
+root_logger = logging.getLogger('root')
+
+
+class DeliveryScheduler:
+    """
+    Spreads sending of notifications in time. Jobs are stored in a redis sorted set by time of sending,
+    random within the window from now, and moved out of quiet hours of the user's cities.
+    Due jobs are taken in batches not faster than the given rate and not more than the concurrency is sent at once,
+    jobs of a user are sent one by one. A taken job is hidden for the lease time,
+    so jobs of a stopped process are sent again by another one.
+    """
+
+    __redis: Redis
+    __window: float
+    __quiet_hours_start: int
+    __quiet_hours_end: int
+    __default_timezone: ZoneInfo
+    __city_timezones: dict[str, ZoneInfo]
+    __rate: float
+    __batch_size: int
+    __concurrency: int
+    __lease: float
+    __poll_interval: float
+    __schedule_key: str
+    __jobs_key: str
+
+    # KEYS[1] is schedule, KEYS[2] is hash of jobs, ARGV[1] is now, ARGV[2] is count, ARGV[3] is end of lease.
+    # Returns flat list of ids and jobs, ids of jobs that are missing are removed.
+    __TAKE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+local result = {}
+for _, id in ipairs(due) do
+    local job = redis.call('HGET', KEYS[2], id)
+    if job then
+        redis.call('ZADD', KEYS[1], ARGV[3], id)
+        result[#result + 1] = id
+        result[#result + 1] = job
+    else
+        redis.call('ZREM', KEYS[1], id)
+    end
+end
+return result
+"""
+
+    def __init__(
+            self,
+            redis: Redis,
+            window: float,
+            rate: float,
+            batch_size: int = 100,
+            concurrency: int = 100,
+            quiet_hours_start: int = 0,
+            quiet_hours_end: int = 0,
+            default_timezone: str = 'Europe/Moscow',
+            city_timezones: Optional[dict[str, str]] = None,
+            lease: float = 300,
+            poll_interval: float = 1,
+            key_prefix: str = 'scheduled-deliveries'
+    ) -> None:
+        """
+        :param redis: redis client shared by all processes of the listener
+        :param window: seconds from now within which sending of a job is spread
+        :param rate: maximum count of jobs taken per second
+        :param batch_size: maximum count of jobs taken at once
+        :param concurrency: maximum count of jobs sent concurrently
+        :param quiet_hours_start: local hour since which nothing is sent
+        :param quiet_hours_end: local hour until which nothing is sent, quiet hours are off if it equals start
+        :param default_timezone: timezone of cities missing in city timezones
+        :param city_timezones: timezones of cities by names of cities
+        :param lease: seconds after which a taken job that is not completed is taken again
+        :param poll_interval: seconds to wait when there are no due jobs
+        :param key_prefix: prefix of scheduler keys in redis
+        """
+
+        if rate <= 0 or batch_size <= 0 or concurrency <= 0:
+            raise ValueError(f'Rate, batch size and concurrency must be positive,'
+                             f' got {rate}, {batch_size} and {concurrency}')
+        if not (0 <= quiet_hours_start < 24 and 0 <= quiet_hours_end < 24):
+            raise ValueError(f'Quiet hours must be within 0 and 23, got {quiet_hours_start} and {quiet_hours_end}')
+
+        self.__redis = redis
+        self.__window = window
+        self.__rate = rate
+        self.__batch_size = batch_size
+        self.__concurrency = concurrency
+        self.__quiet_hours_start = quiet_hours_start
+        self.__quiet_hours_end = quiet_hours_end
+        self.__default_timezone = ZoneInfo(default_timezone)
+        self.__city_timezones = {city: ZoneInfo(timezone) for city, timezone in (city_timezones or {}).items()}
+        self.__lease = lease
+        self.__poll_interval = poll_interval
+        self.__schedule_key = key_prefix
+        self.__jobs_key = f'{key_prefix}:jobs'
+        self.__take_script = redis.register_script(self.__TAKE_SCRIPT)
+
+    async def schedule(self, job: DeliveryJob, cities: Optional[list[str]] = None) -> float:
+        """
+        Stores the job until its time of sending.
+
+        :param job: rendered notification
+        :param cities: cities of the user, the job is sent out of quiet hours of every city
+        :return: unix time of sending
+        """
+
+        send_at = self.get_send_time(time.time(), cities)
+        job_id = uuid.uuid4().hex
+        async with self.__redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self.__jobs_key, job_id, job.model_dump_json())
+            pipe.zadd(self.__schedule_key, {job_id: send_at})
+            await pipe.execute()
+        return send_at
+
+    def get_send_time(self, now: float, cities: Optional[list[str]] = None) -> float:
+        """
+        :param now: unix time of scheduling
+        :param cities: cities of the user, default timezone is used if there are none
+        :return: random unix time within the window that is out of quiet hours of every city
+        """
+
+        send_at = now + random.uniform(0, self.__window)
+        if self.__quiet_hours_start == self.__quiet_hours_end:
+            return send_at
+
+        timezones = {self.__city_timezones.get(city, self.__default_timezone) for city in cities or []}
+        if len(timezones) == 0:
+            timezones.add(self.__default_timezone)
+        # Quiet hours of one city may end within quiet hours of another one, so the time is checked again.
+        for _ in range(len(timezones) + 1):
+            quiet_ends = [self.__get_quiet_end(datetime.fromtimestamp(send_at, tz=timezone)) for timezone in timezones]
+            quiet_ends_timestamps = [quiet_end.timestamp() for quiet_end in quiet_ends if quiet_end is not None]
+            if len(quiet_ends_timestamps) == 0:
+                return send_at
+            # Jobs postponed by quiet hours are spread again, so they are not sent all at once in the morning.
+            send_at = max(quiet_ends_timestamps) + random.uniform(0, self.__window)
+        return send_at
+
+    async def run(
+            self,
+            send_callback: Callable[[DeliveryJob], Coroutine[Any, Any, None]],
+            retryable_exceptions: tuple[type[Exception], ...] = ()
+    ) -> None:
+        """
+        Takes due jobs and sends them until cancelled. A job of a user waits until the previous job of the user
+        is sent, if the previous job is retried later, the job is retried after it.
+
+        :param send_callback: coroutine that sends a job
+        :param retryable_exceptions: failures after which the job is sent again when its lease ends,
+            jobs failed with other exceptions are dropped
+        """
+
+        sending: set[asyncio.Task[bool]] = set()
+        # Last job being sent of every user.
+        users_sending: dict[int, asyncio.Task[bool]] = {}
+
+        def forget_sent(telegram_id: int, task: asyncio.Task[bool]) -> None:
+            if users_sending.get(telegram_id) is task:
+                del users_sending[telegram_id]
+
+        try:
+            while True:
+                # Jobs are taken only for free senders, so leases of taken jobs do not end while they wait.
+                if len(sending) >= self.__concurrency:
+                    await asyncio.wait(sending, return_when=asyncio.FIRST_COMPLETED)
+                    continue
+
+                started_at = time.monotonic()
+                jobs = await self.__take(min(self.__batch_size, self.__concurrency - len(sending)))
+                if len(jobs) == 0:
+                    await asyncio.sleep(self.__poll_interval)
+                    continue
+
+                for job_id, job in jobs:
+                    task = asyncio.create_task(self.__send(job_id, job, users_sending.get(job.telegram_id),
+                                                           send_callback, retryable_exceptions))
+                    sending.add(task)
+                    users_sending[job.telegram_id] = task
+                    task.add_done_callback(sending.discard)
+                    task.add_done_callback(functools.partial(forget_sent, job.telegram_id))
+                await asyncio.sleep(max(0.0, len(jobs) / self.__rate - (time.monotonic() - started_at)))
+        finally:
+            # Jobs that are not sent yet are taken again when their lease ends.
+            for task in sending:
+                task.cancel()
+            await asyncio.gather(*sending, return_exceptions=True)
+
+    async def __take(self, count: int) -> list[tuple[str, DeliveryJob]]:
+        now = time.time()
+        result = await self.__take_script(keys=[self.__schedule_key, self.__jobs_key],
+                                          args=[now, count, now + self.__lease])
+        jobs: list[tuple[str, DeliveryJob]] = []
+        for i in range(0, len(result), 2):
+            job_id = result[i].decode() if isinstance(result[i], bytes) else result[i]
+            try:
+                jobs.append((job_id, DeliveryJob.model_validate_json(result[i + 1])))
+            except ValueError as e:
+                root_logger.warning(f'Dropped scheduled delivery {job_id} that can not be read: {str(e)}')
+                await self.__complete(job_id)
+        return jobs
+
+    async def __send(
+            self,
+            job_id: str,
+            job: DeliveryJob,
+            previous: Optional[asyncio.Task[bool]],
+            send_callback: Callable[[DeliveryJob], Coroutine[Any, Any, None]],
+            retryable_exceptions: tuple[type[Exception], ...]
+    ) -> bool:
+        # Returns False if the job is left to be retried when its lease ends.
+        if previous is not None and not await asyncio.shield(previous):
+            root_logger.warning(f'Scheduled delivery to {job.telegram_id} is retried later'
+                                f' after the previous delivery to the user')
+            return False
+
+        try:
+            await send_callback(job)
+        except retryable_exceptions as e:
+            root_logger.warning(f'Scheduled delivery to {job.telegram_id} failed, it is retried later: {str(e)}')
+            return False
+        except Exception as e:
+            root_logger.error(f'Scheduled delivery to {job.telegram_id} failed and is dropped: {str(e)}')
+        await self.__complete(job_id)
+        return True
+
+    async def __complete(self, job_id: str) -> None:
+        async with self.__redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(self.__schedule_key, job_id)
+            pipe.hdel(self.__jobs_key, job_id)
+            await pipe.execute()
+
+    def __get_quiet_end(self, local_time: datetime) -> Optional[datetime]:
+        """
+        :return: local time when quiet hours containing the given time end, None if it is out of quiet hours
+        """
+
+        start, end = self.__quiet_hours_start, self.__quiet_hours_end
+        hour = local_time.hour
+        # Quiet hours may pass midnight, e.g. from 23 to 9.
+        is_quiet = start <= hour < end if start < end else hour >= start or hour < end
+        if not is_quiet:
+            return None
+
+        quiet_end = local_time.replace(hour=end, minute=0, second=0, microsecond=0)
+        if quiet_end <= local_time:
+            quiet_end += timedelta(days=1)
+        return quiet_end
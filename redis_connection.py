@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import time
+from typing import Any, Optional
+
+from pydantic import BaseModel
+from redis import BusyLoadingError, ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+from redis.asyncio import Redis, BlockingConnectionPool
+from redis.asyncio.connection import AbstractConnection
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+
+from settings import Settings
+
+
+class RedisPoolStatistics(BaseModel):
+    max_connections: int
+    in_use_connections: int
+    max_in_use_connections: int
+    acquired_count: int
+    failed_count: int
+    average_wait_time: float
+    max_wait_time: float
+
+
+class InstrumentedConnectionPool(BlockingConnectionPool):
+    """
+    Pool of bounded size, that measures how long commands wait for a free connection.
+    Waits of acquires that failed to connect or timed out are measured too.
+    """
+
+    # Only connections handed out by the pool, the base pool releases a connection that failed to connect itself.
+    __in_use: set[AbstractConnection]
+    __max_in_use_count: int
+    __acquired_count: int
+    __failed_count: int
+    __total_wait_time: float
+    __max_wait_time: float
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.__in_use = set()
+        self.__max_in_use_count = 0
+        self.__acquired_count = 0
+        self.__failed_count = 0
+        self.__total_wait_time = 0.0
+        self.__max_wait_time = 0.0
+
+    async def get_connection(self, *args: Any, **kwargs: Any) -> AbstractConnection:
+        started_at = time.perf_counter()
+        try:
+            connection = await super().get_connection(*args, **kwargs)
+        except Exception:
+            self.__failed_count += 1
+            self.__add_wait_time(time.perf_counter() - started_at)
+            raise
+
+        self.__add_wait_time(time.perf_counter() - started_at)
+        self.__in_use.add(connection)
+        self.__max_in_use_count = max(self.__max_in_use_count, len(self.__in_use))
+        self.__acquired_count += 1
+        return connection
+
+    async def release(self, connection: AbstractConnection) -> None:
+        self.__in_use.discard(connection)
+        await super().release(connection)
+
+    def get_statistics(self) -> RedisPoolStatistics:
+        average_wait_time = 0.0
+        if self.__acquired_count + self.__failed_count != 0:
+            average_wait_time = self.__total_wait_time / (self.__acquired_count + self.__failed_count)
+
+        return RedisPoolStatistics(
+            max_connections=self.max_connections,
+            in_use_connections=len(self.__in_use),
+            max_in_use_connections=self.__max_in_use_count,
+            acquired_count=self.__acquired_count,
+            failed_count=self.__failed_count,
+            average_wait_time=average_wait_time,
+            max_wait_time=self.__max_wait_time,
+        )
+
+    def __add_wait_time(self, wait_time: float) -> None:
+        self.__total_wait_time += wait_time
+        self.__max_wait_time = max(self.__max_wait_time, wait_time)
+
+
+_redis: Optional[Redis] = None
+
+
+def get_redis(settings: Settings) -> Redis:
+    """
+    Returns redis client of the process, it is created on the first call with pool configured by settings.
+    """
+
+    global _redis
+
+    if _redis is None:
+        pool = InstrumentedConnectionPool(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            password=settings.redis_password,
+            max_connections=settings.redis_max_connections,
+            timeout=settings.redis_pool_timeout,
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_socket_connect_timeout,
+            socket_keepalive=settings.redis_socket_keepalive,
+            health_check_interval=settings.redis_health_check_interval,
+            retry=Retry(ExponentialBackoff(), settings.redis_retries),
+            retry_on_error=[BusyLoadingError, RedisConnectionError, RedisTimeoutError],
+        )
+        _redis = Redis(connection_pool=pool)
+    return _redis
+
+
+def get_redis_pool_statistics(redis: Redis) -> Optional[RedisPoolStatistics]:
+    """
+    Returns statistics of the pool of redis client, None if the pool is not created by get_redis.
+    """
+
+    pool = redis.connection_pool
+    if not isinstance(pool, InstrumentedConnectionPool):
+        return None
+    return pool.get_statistics()
+
+
+async def log_redis_pool_statistics(redis: Redis, interval: float, logger: logging.Logger) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        statistics = get_redis_pool_statistics(redis)
+        if statistics is None:
+            return
+        logger.info(f'Redis pool statistics: in use {statistics.in_use_connections}'
+                    f' of {statistics.max_connections} (max {statistics.max_in_use_connections}),'
+                    f' acquired {statistics.acquired_count}, failed {statistics.failed_count},'
+                    f' average wait {statistics.average_wait_time * 1000:.2f}ms,'
+                    f' max wait {statistics.max_wait_time * 1000:.2f}ms')
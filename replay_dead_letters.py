@@ -0,0 +1,50 @@
+import argparse
+import asyncio
+import logging
+import logging.config
+from typing import Optional
+
+from services.broker import Broker
+from services.broker.impl.rabbitmq_broker import RabbitMQBroker
+from settings import settings
+
+
+def positive_float(value: str) -> float:
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f'must be positive, got {value}')
+    return number
+
+
+async def main(queue_name: str, rate: float, limit: Optional[int]) -> None:
+    try:
+        rabbitmq_broker: Broker = RabbitMQBroker(
+            max_retries=settings.broker_max_retries,
+            retry_base_delay=settings.broker_retry_base_delay,
+        )
+        await rabbitmq_broker.connect(
+            queue_name=queue_name,
+            user_name=settings.rabbitmq_user,
+            password=settings.rabbitmq_password,
+            host=settings.rabbitmq_host,
+            port=settings.rabbitmq_port,
+        )
+
+        root_logger.info(f'Replaying dead letters with rate {rate} messages per second ...')
+        replayed_count = await rabbitmq_broker.replay_dead_letters(rate=rate, limit=limit)
+        root_logger.info(f'Replayed {replayed_count} dead letters')
+    except Exception as e:
+        logging.warning(e)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Moves dead letters back to the queue of new concerts')
+    parser.add_argument('--rate', type=positive_float, default=10, help='maximum count of messages moved per second')
+    parser.add_argument('--limit', type=int, default=None, help='maximum count of messages to move')
+    parser.add_argument('--queue', type=str, default=settings.rabbitmq_queue,
+                        help='queue whose dead letters are moved, e.g. a shard queue')
+    args = parser.parse_args()
+
+    logging.config.fileConfig(fname='broker_logging.ini')
+    root_logger = logging.getLogger('root')
+    asyncio.run(main(args.queue, args.rate, args.limit))
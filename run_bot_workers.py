@@ -0,0 +1,80 @@
+import argparse
+import asyncio
+import logging
+import logging.config
+import signal
+
+from aiogram.fsm.storage.redis import RedisStorage
+from aiogram.types import Update
+
+from bot.fsm_access import FSM_KEY_BUILDER
+from bot.handlers.user_ordering import log_user_lock_statistics
+from main import create_dispatcher, create_update_queue
+from redis_connection import get_redis
+from services.user_service.impl.agent_impl import UserServiceAgentImpl
+from settings import settings
+from utils import create_bot
+from worker_processes import start_workers, stop_workers
+
+
+async def work(worker_index: int) -> None:
+    agent = UserServiceAgentImpl(
+        user_service_host=settings.user_service_host,
+        user_service_port=settings.user_service_port,
+    )
+    storage = RedisStorage(redis=get_redis(settings), key_builder=FSM_KEY_BUILDER)
+    bot = create_bot(settings, storage.redis)
+    dp = create_dispatcher(storage, agent)
+    update_queue = create_update_queue(storage.redis)
+
+    async def on_update(update: Update) -> None:
+        await dp.feed_update(bot, update)
+
+    statistics_task = asyncio.create_task(
+        log_user_lock_statistics(dp['user_ordering'], settings.bot_user_lock_statistics_interval, root_logger)
+    )
+    stopped = asyncio.Event()
+    # Updates being handled are finished on SIGTERM, the rest stays in partitions of the worker.
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopped.set)
+    try:
+        await update_queue.consume(worker_index, settings.bot_workers_count, on_update, stopped)
+        root_logger.info(f'Worker {worker_index} is stopped')
+    except Exception as e:
+        root_logger.error(f'Worker {worker_index} failed: {str(e)}')
+    finally:
+        statistics_task.cancel()
+        await bot.session.close()
+        await agent.terminate()
+
+
+def run_worker(worker_index: int) -> None:
+    global root_logger
+
+    logging.config.fileConfig(fname='logging.ini')
+    root_logger = logging.getLogger('root')
+    asyncio.run(work(worker_index))
+
+
+def main(workers_indexes: list[int]) -> None:
+    workers = start_workers(run_worker, workers_indexes, 'bot-worker')
+    root_logger.info(f'Started {len(workers)} of {settings.bot_workers_count} bot workers')
+
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        root_logger.info('Bot workers are stopping ...')
+    finally:
+        stop_workers(workers, settings.webhook_shutdown_timeout)
+        root_logger.info('Bot workers are stopped')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Runs workers handling updates queued by the bot')
+    parser.add_argument('--worker', type=int, action='append', default=None,
+                        help='index of a worker to run on this machine, all workers are run if not given')
+    args = parser.parse_args()
+
+    logging.config.fileConfig(fname='logging.ini')
+    root_logger = logging.getLogger('root')
+    main(args.worker if args.worker is not None else list(range(settings.bot_workers_count)))
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import logging.config
+import signal
+
+import broker_listener
+from services.broker import Broker, get_shard_queue_name
+from services.broker.impl.rabbitmq_broker import RabbitMQBroker
+from settings import settings
+from worker_processes import start_workers, stop_workers
+
+
+def run_worker(shard: int) -> None:
+    priority_queue_name = None
+    if settings.rabbitmq_priority_queue:
+        priority_queue_name = get_shard_queue_name(settings.rabbitmq_priority_queue, shard)
+    broker_listener.run_listener(
+        queue_name=get_shard_queue_name(settings.rabbitmq_queue, shard),
+        priority_queue_name=priority_queue_name,
+        declare_queue=True,
+        shard=shard,
+    )
+
+
+async def on_error(exception: Exception) -> None:
+    root_logger.error(f'An error with broker router occurred: {str(exception)}')
+
+
+async def route(shards_count: int) -> None:
+    try:
+        rabbitmq_broker: Broker = RabbitMQBroker(
+            prefetch_count=settings.rabbitmq_prefetch_count,
+            max_retries=settings.broker_max_retries,
+            retry_base_delay=settings.broker_retry_base_delay,
+            robust=settings.rabbitmq_robust_connection,
+            reconnect_base_delay=settings.rabbitmq_reconnect_base_delay,
+            reconnect_max_delay=settings.rabbitmq_reconnect_max_delay,
+        )
+        await rabbitmq_broker.connect(
+            queue_name=settings.rabbitmq_queue,
+            user_name=settings.rabbitmq_user,
+            password=settings.rabbitmq_password,
+            host=settings.rabbitmq_host,
+            port=settings.rabbitmq_port,
+            priority_queue_name=settings.rabbitmq_priority_queue or None,
+        )
+
+        root_logger.info(f'Routing events to {shards_count} shards ...')
+        routing_task = asyncio.create_task(rabbitmq_broker.start_routing(shards_count, on_error))
+        loop = asyncio.get_running_loop()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signal_number, routing_task.cancel)
+        try:
+            await routing_task
+        except asyncio.CancelledError:
+            root_logger.info('Routing is stopped')
+    except Exception as e:
+        logging.warning(e)
+
+
+def main() -> None:
+    shards_count = settings.broker_processes_count
+    if shards_count <= 1:
+        broker_listener.run_listener()
+        return
+
+    workers = start_workers(run_worker, list(range(shards_count)), 'broker-listener')
+    root_logger.info(f'Started {shards_count} broker listener processes')
+
+    try:
+        asyncio.run(route(shards_count))
+    finally:
+        # Router is stopped first, then workers finish events being delivered, the rest stays in shard queues.
+        stop_workers(workers, settings.broker_drain_timeout)
+        root_logger.info('Broker listener processes are stopped')
+
+
+if __name__ == "__main__":
+    logging.config.fileConfig(fname='broker_logging.ini')
+    root_logger = logging.getLogger('root')
+    main()
@@ -1,9 +1,17 @@
 __all__ = [
     'Broker',
     'BrokerException',
-    'BrokerEvent'
+    'BrokerRetryableException',
+    'BrokerEvent',
+    'BroadcastEvent',
+    'BROADCAST_EVENT_TYPE',
+    'BrokerStatistics',
+    'get_shard',
+    'get_shard_queue_name'
 ]
 
 from .broker import Broker
-from .event import BrokerEvent
-from .exceptions import BrokerException
+from .event import BrokerEvent, BroadcastEvent, BROADCAST_EVENT_TYPE
+from .exceptions import BrokerException, BrokerRetryableException
+from .sharding import get_shard, get_shard_queue_name
+from .statistics import BrokerStatistics
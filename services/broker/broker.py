@@ -1,7 +1,8 @@
 from abc import ABC, abstractmethod
-from typing import Coroutine, Callable, Any
+from typing import Awaitable, Coroutine, Callable, Any, Optional
 
-from .event import BrokerEvent
+from .event import BrokerEvent, BroadcastEvent
+from .statistics import BrokerStatistics
 
 
 class Broker(ABC):
@@ -12,7 +13,8 @@ class Broker(ABC):
             user_name: str,
             password: str,
             host: str,
-            port: int
+            port: int,
+            priority_queue_name: Optional[str] = None
     ) -> None:
         """
         Connects to broker.
@@ -22,6 +24,8 @@ class Broker(ABC):
         :param password: password of broker user
         :param host: host of broker
         :param port: port of broker
+        :param priority_queue_name: name of broker's queue of urgent messages, they are consumed before
+            messages of the main queue. Not consumed if not given
         :raises BrokerException: if connection fails
         """
         pass
@@ -29,13 +33,99 @@ class Broker(ABC):
     @abstractmethod
     async def start_listening(
             self,
-            on_message_callback: Callable[[BrokerEvent], Coroutine[Any, Any, None]],
-            on_error_callback: Callable[[Exception], Coroutine[Any, Any, None]]
+            on_message_callback: Callable[[BrokerEvent], Coroutine[Any, Any, Optional[Awaitable[None]]]],
+            on_error_callback: Callable[[Exception], Coroutine[Any, Any, None]],
+            on_broadcast_callback: Optional[Callable[[BroadcastEvent], Coroutine[Any, Any, None]]] = None
     ) -> None:
         """
         Thread that calls it starts listening messages from broker.
+        Events of the same user are handled in order of arrival, events of different users may be handled
+        concurrently. A message whose callback raised BrokerRetryableException is delivered again later,
+        a message that can't be parsed or whose callback raised other exception is moved to dead letters.
+
+        The callback may return an awaitable of completion of the event, e.g. when the event is queued for sending.
+        Then the message is acknowledged, retried or moved to dead letters when the awaitable completes,
+        and messages of other users are handled meanwhile. The next event of the same user is handled
+        after the awaitable completes.
+
+        Broadcast events are handled one at a time apart from events of users, they are moved
+        to dead letters if on_broadcast_callback is not given.
 
         :param on_message_callback: coroutine that will be awaited when a message is received
         :param on_error_callback: coroutine that will be awaited when an error occurs
+        :param on_broadcast_callback: coroutine that will be awaited when a broadcast event is received
+        """
+        pass
+
+    @abstractmethod
+    async def start_batch_listening(
+            self,
+            on_batch_callback: Callable[[list[BrokerEvent]], Coroutine[Any, Any, None]],
+            on_error_callback: Callable[[Exception], Coroutine[Any, Any, None]],
+            batch_size: int,
+            max_wait: float,
+            on_broadcast_callback: Optional[Callable[[BroadcastEvent], Coroutine[Any, Any, None]]] = None
+    ) -> None:
+        """
+        Thread that calls it starts listening messages from broker and handles them by batches.
+        A batch is handed over when it is full or when max_wait seconds passed since its first message,
+        the next batch is collected only after the previous one is handled.
+        Failures are handled as in start_listening for every message of the failed batch.
+        Broadcast events are not batched, they are handled one by one as in start_listening.
+
+        :param on_batch_callback: coroutine that will be awaited with events of a batch in order of arrival
+        :param on_error_callback: coroutine that will be awaited when an error occurs
+        :param batch_size: maximum count of events in a batch
+        :param max_wait: maximum time in seconds to wait for a batch to fill
+        :param on_broadcast_callback: coroutine that will be awaited when a broadcast event is received
+        """
+        pass
+
+    @abstractmethod
+    async def start_routing(
+            self,
+            shards_count: int,
+            on_error_callback: Callable[[Exception], Coroutine[Any, Any, None]]
+    ) -> None:
+        """
+        Thread that calls it starts moving messages from the queue of messages to shard queues
+        named by get_shard_queue_name. Events of a user always go to the same shard in order of arrival,
+        so shards may be listened by separate processes. A broadcast event is split into one broadcast
+        event per shard with recipients of the shard.
+
+        :param shards_count: count of shard queues
+        :param on_error_callback: coroutine that will be awaited when an error occurs
+        """
+        pass
+
+    @abstractmethod
+    async def replay_dead_letters(self, rate: float, limit: Optional[int] = None) -> int:
+        """
+        Moves messages from dead letters back to the queue of messages.
+
+        :param rate: maximum count of messages moved per second
+        :param limit: maximum count of messages to move, all dead letters are moved if None
+        :return: count of moved messages
+        """
+        pass
+
+    @abstractmethod
+    def pause_consuming(self) -> None:
+        """
+        Stops taking new messages from broker, messages that are already taken are handled.
+        """
+        pass
+
+    @abstractmethod
+    def resume_consuming(self) -> None:
+        """
+        Resumes taking messages after pause_consuming.
+        """
+        pass
+
+    @abstractmethod
+    def get_statistics(self) -> BrokerStatistics:
+        """
+        Returns snapshot of messages processing statistics.
         """
         pass
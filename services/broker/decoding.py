@@ -0,0 +1,54 @@
+import json
+from typing import Any, Optional, TypeVar
+
+from pydantic import BaseModel
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_CONTENT_TYPES = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+
+EventModel = TypeVar('EventModel', bound=BaseModel)
+
+
+def decode_event(body: bytes, content_type: Optional[str], model: type[EventModel]) -> EventModel:
+    """
+    Validates the model directly from message body, fields that are not declared by the model are skipped.
+
+    :param body: body of message, JSON or MessagePack
+    :param content_type: content type of message, MessagePack is expected for MSGPACK_CONTENT_TYPES
+    :param model: model of event
+    :raises ValueError: if body can't be decoded or is not valid
+    """
+
+    if content_type in MSGPACK_CONTENT_TYPES:
+        if msgpack is None:
+            raise ValueError(f'Install msgpack to decode messages of {content_type} content type')
+        return model.model_validate(msgpack.unpackb(body, timestamp=3))
+    return model.model_validate_json(body)
+
+
+def decode_raw(body: bytes, content_type: Optional[str]) -> Any:
+    """
+    Decodes message body without validation.
+
+    :raises ValueError: if body can't be decoded
+    """
+
+    if content_type in MSGPACK_CONTENT_TYPES:
+        if msgpack is None:
+            raise ValueError(f'Install msgpack to decode messages of {content_type} content type')
+        return msgpack.unpackb(body)
+    return json.loads(body)
+
+
+def encode_raw(payload: Any, content_type: Optional[str]) -> bytes:
+    """
+    Encodes payload decoded by decode_raw back to message body of the same content type.
+    """
+
+    if content_type in MSGPACK_CONTENT_TYPES:
+        return msgpack.packb(payload)
+    return json.dumps(payload, ensure_ascii=False).encode()
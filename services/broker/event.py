@@ -2,7 +2,34 @@ from pydantic import BaseModel
 
 from model import Concert, User
 
+BROADCAST_EVENT_TYPE = 'broadcast'
+
 
 class BrokerEvent(BaseModel):
     user: User
     concerts: list[Concert]
+
+
+class BroadcastEvent(BaseModel):
+    """
+    The same concerts for many users, it is sent with BROADCAST_EVENT_TYPE as type of message.
+    """
+
+    telegram_ids: list[int]
+    concerts: list[Concert]
+
+
+class BroadcastEventRecipients(BaseModel):
+    """
+    Part of BroadcastEvent sufficient to route it, concerts are not validated.
+    """
+
+    telegram_ids: list[int]
+
+
+class BrokerEventRecipient(BaseModel):
+    """
+    Part of BrokerEvent sufficient to route it, concerts are not validated.
+    """
+
+    user: User
@@ -1,2 +1,9 @@
 class BrokerException(Exception):
     pass
+
+
+class BrokerRetryableException(BrokerException):
+    """
+    Raised by message callback when handling failed for a temporary reason and should be retried later.
+    """
+    pass
@@ -1,21 +1,110 @@
+import asyncio
+import itertools
 import logging
-from typing import Callable, Coroutine, Any
+import random
+import time
+from typing import Awaitable, Callable, Coroutine, Any, Optional
 
-from aio_pika.abc import AbstractChannel, AbstractQueue
+from aio_pika import Message, DeliveryMode
+from aio_pika.abc import AbstractChannel, AbstractQueue, AbstractIncomingMessage
 from aio_pika.connection import Connection
+from aiormq.exceptions import AMQPConnectionError, ChannelInvalidStateError
+from cachetools import TTLCache
 from yarl import URL
 
-from services.broker import Broker, BrokerEvent, BrokerException
+from services.broker import (Broker, BrokerEvent, BroadcastEvent, BROADCAST_EVENT_TYPE, BrokerException,
+                             BrokerRetryableException, BrokerStatistics, get_shard, get_shard_queue_name)
+from services.broker.decoding import decode_event, decode_raw, encode_raw
+from services.broker.event import BrokerEventRecipient, BroadcastEventRecipients
 
 root_logger = logging.getLogger('root')
 
 
 class RabbitMQBroker(Broker):
+    __url: URL
     __connection: Connection
+    __channel: AbstractChannel
     __queue_name: str
+    __priority_queue_name: Optional[str]
+    __prefetch_count: int
+    __workers_count: int
+    __max_retries: int
+    __retry_base_delay: float
+    __declare_queue: bool
+    __robust: bool
+    __reconnect_base_delay: float
+    __reconnect_max_delay: float
+    # Ids of messages handled while connection was lost, they are acknowledged on redelivery.
+    __pending_acks: TTLCache
+    # Cleared while consuming is paused, broker stops delivering when prefetch count of messages are not handled.
+    __consuming_allowed: asyncio.Event
 
-    def __init__(self) -> None:
-        pass
+    __in_flight_count: int
+    __processed_count: int
+    __retried_count: int
+    __dead_lettered_count: int
+    __total_processing_time: float
+    __last_processing_time: float
+    __max_processing_time: float
+    __reconnect_count: int
+    __total_downtime: float
+    __last_downtime: float
+
+    __RETRY_COUNT_HEADER = 'x-retry-count'
+    __ERROR_HEADER = 'x-error'
+    __ERROR_TYPE_HEADER = 'x-error-type'
+
+    def __init__(
+            self,
+            prefetch_count: int = 1,
+            workers_count: int = 1,
+            max_retries: int = 5,
+            retry_base_delay: float = 5,
+            declare_queue: bool = False,
+            robust: bool = False,
+            reconnect_base_delay: float = 1,
+            reconnect_max_delay: float = 30
+    ) -> None:
+        """
+        :param prefetch_count: maximum count of unacknowledged messages delivered by broker (channel QoS)
+        :param workers_count: count of workers handling messages concurrently
+        :param max_retries: count of retries of a message before it is moved to dead letters
+        :param retry_base_delay: delay in seconds before the first retry, every next delay is twice longer
+        :param declare_queue: declare the queue of messages as durable, e.g. for shard queues owned by the bot
+        :param robust: reconnect when connection is lost instead of stopping listening
+        :param reconnect_base_delay: delay in seconds before the first reconnection attempt
+        :param reconnect_max_delay: maximum delay in seconds between reconnection attempts
+        """
+
+        if prefetch_count < 1:
+            raise ValueError('Prefetch count must be positive')
+        if workers_count < 1:
+            raise ValueError('Workers count must be positive')
+        if max_retries < 0:
+            raise ValueError('Max retries must be non-negative')
+
+        self.__prefetch_count = prefetch_count
+        self.__workers_count = workers_count
+        self.__max_retries = max_retries
+        self.__retry_base_delay = retry_base_delay
+        self.__declare_queue = declare_queue
+        self.__robust = robust
+        self.__reconnect_base_delay = reconnect_base_delay
+        self.__reconnect_max_delay = reconnect_max_delay
+        self.__pending_acks = TTLCache(maxsize=100_000, ttl=3600)
+        self.__consuming_allowed = asyncio.Event()
+        self.__consuming_allowed.set()
+
+        self.__in_flight_count = 0
+        self.__processed_count = 0
+        self.__retried_count = 0
+        self.__dead_lettered_count = 0
+        self.__total_processing_time = 0.0
+        self.__last_processing_time = 0.0
+        self.__max_processing_time = 0.0
+        self.__reconnect_count = 0
+        self.__total_downtime = 0.0
+        self.__last_downtime = 0.0
 
     async def connect(
             self,
@@ -23,12 +112,14 @@ class RabbitMQBroker(Broker):
             user_name: str,
             password: str,
             host: str,
-            port: int
+            port: int,
+            priority_queue_name: Optional[str] = None
     ) -> None:
+        self.__priority_queue_name = priority_queue_name
         try:
-            url: URL = URL(f'amqp://{user_name}:{password}@{host}:{port}/')
+            self.__url = URL(f'amqp://{user_name}:{password}@{host}:{port}/')
             root_logger.debug(f'Trying to connect on amqp://{user_name}:**********@{host}:{port}/')
-            self.__connection = Connection(url=url)
+            self.__connection = Connection(url=self.__url)
         except Exception as e:
             root_logger.error(f'Failed to create connection: {str(e)}')
             raise BrokerException(f'Invalid connection params') from e
@@ -39,28 +130,594 @@ class RabbitMQBroker(Broker):
             self.__queue_name = queue_name
         except Exception as e:
             root_logger.error(f'Failed to connect: {str(e)}')
-            raise BrokerException(f'Cannot connect to {self.__connection}') from e
+            if not self.__robust:
+                raise BrokerException(f'Cannot connect to {self.__connection}') from e
+            self.__queue_name = queue_name
+            await self.__reconnect()
 
     async def start_listening(
             self,
-            on_message_callback: Callable[[BrokerEvent], Coroutine[Any, Any, None]],
+            on_message_callback: Callable[[BrokerEvent], Coroutine[Any, Any, Optional[Awaitable[None]]]],
+            on_error_callback: Callable[[Exception], Coroutine[Any, Any, None]],
+            on_broadcast_callback: Optional[Callable[[BroadcastEvent], Coroutine[Any, Any, None]]] = None
+    ) -> None:
+        await self.__run(lambda: self.__listen(on_message_callback, on_broadcast_callback), on_error_callback)
+
+    async def start_batch_listening(
+            self,
+            on_batch_callback: Callable[[list[BrokerEvent]], Coroutine[Any, Any, None]],
+            on_error_callback: Callable[[Exception], Coroutine[Any, Any, None]],
+            batch_size: int,
+            max_wait: float,
+            on_broadcast_callback: Optional[Callable[[BroadcastEvent], Coroutine[Any, Any, None]]] = None
+    ) -> None:
+        await self.__run(lambda: self.__listen_batches(on_batch_callback, on_broadcast_callback, batch_size, max_wait),
+                         on_error_callback)
+
+    async def start_routing(
+            self,
+            shards_count: int,
+            on_error_callback: Callable[[Exception], Coroutine[Any, Any, None]]
+    ) -> None:
+        if shards_count <= 0:
+            raise ValueError(f'Shards count must be positive, got {shards_count}')
+        await self.__run(lambda: self.__route(shards_count), on_error_callback)
+
+    async def replay_dead_letters(self, rate: float, limit: Optional[int] = None) -> int:
+        if rate <= 0:
+            raise ValueError(f'Rate must be positive, got {rate}')
+
+        replayed_count = 0
+        async with self.__connection as connection:
+            channel: AbstractChannel = await connection.channel()
+            dead_letter_queue = await channel.declare_queue(name=self.__get_dead_letter_queue_name(), durable=True)
+            while limit is None or replayed_count < limit:
+                message = await dead_letter_queue.get(fail=False)
+                if message is None:
+                    break
+                headers = {key: value for key, value in message.headers.items()
+                           if key not in (self.__RETRY_COUNT_HEADER, self.__ERROR_HEADER, self.__ERROR_TYPE_HEADER)}
+                await channel.default_exchange.publish(
+                    message=RabbitMQBroker.__copy_message(message, headers=headers),
+                    routing_key=self.__queue_name,
+                )
+                await message.ack()
+                replayed_count += 1
+                await asyncio.sleep(1 / rate)
+
+        return replayed_count
+
+    def pause_consuming(self) -> None:
+        if self.__consuming_allowed.is_set():
+            root_logger.info('Consuming is paused')
+            self.__consuming_allowed.clear()
+
+    def resume_consuming(self) -> None:
+        if not self.__consuming_allowed.is_set():
+            root_logger.info('Consuming is resumed')
+            self.__consuming_allowed.set()
+
+    def get_statistics(self) -> BrokerStatistics:
+        average_processing_time = 0.0
+        if self.__processed_count != 0:
+            average_processing_time = self.__total_processing_time / self.__processed_count
+
+        return BrokerStatistics(
+            in_flight_count=self.__in_flight_count,
+            processed_count=self.__processed_count,
+            retried_count=self.__retried_count,
+            dead_lettered_count=self.__dead_lettered_count,
+            reconnect_count=self.__reconnect_count,
+            total_downtime=self.__total_downtime,
+            last_downtime=self.__last_downtime,
+            last_processing_time=self.__last_processing_time,
+            average_processing_time=average_processing_time,
+            max_processing_time=self.__max_processing_time,
+        )
+
+    async def __run(
+            self,
+            listen: Callable[[], Coroutine[Any, Any, None]],
             on_error_callback: Callable[[Exception], Coroutine[Any, Any, None]]
     ) -> None:
         try:
-            async with self.__connection as connection:
-                root_logger.debug(f'Creating AMQP channel for connection')
-                channel: AbstractChannel = await connection.channel()
-                root_logger.debug(f'Channel created: {str(channel)}')
-                queue: AbstractQueue = await channel.get_queue(name=self.__queue_name)
-                root_logger.debug(f'Declare queue: {queue}')
-                async for message in queue:
-                    event: BrokerEvent = RabbitMQBroker.__parse_event(message.body)
-                    await on_message_callback(event)
-                    await message.ack()
+            while True:
+                try:
+                    await listen()
+                    if not self.__robust:
+                        return
+                    root_logger.warning('Consuming stopped by broker')
+                except Exception as e:
+                    if not self.__robust or not self.__is_connection_lost(e):
+                        raise
+                    root_logger.warning(f'Connection with broker lost: {str(e)}')
+                await self.__reconnect()
         except Exception as e:
             root_logger.error(f'{str(e)}')
             await on_error_callback(e)
+        finally:
+            await self.__connection.close()
+
+    async def __listen(
+            self,
+            on_message_callback: Callable[[BrokerEvent], Coroutine[Any, Any, Optional[Awaitable[None]]]],
+            on_broadcast_callback: Optional[Callable[[BroadcastEvent], Coroutine[Any, Any, None]]]
+    ) -> None:
+        queues = await self.__open_channel(self.__prefetch_count)
+
+        # Items are (rank, sequence number, message, event), messages of the priority queue have lower rank
+        # and are handled first, sequence number keeps order of arrival within a rank.
+        sequence = itertools.count()
+        workers_queues: list[asyncio.PriorityQueue[tuple[int, int, Any, Any]]] = [
+            asyncio.PriorityQueue() for _ in range(self.__workers_count)
+        ]
+        workers: list[asyncio.Task[None]] = [
+            asyncio.create_task(self.__work(worker_queue, on_message_callback, lambda event: event.user.telegram_id))
+            for worker_queue in workers_queues
+        ]
+        # Broadcast events are long, so they have own worker and don't hold events of users.
+        broadcast_queue: asyncio.PriorityQueue[tuple[int, int, Any, Any]] = asyncio.PriorityQueue()
+        if on_broadcast_callback is not None:
+            workers.append(asyncio.create_task(self.__work(broadcast_queue, on_broadcast_callback)))
+        consumers = [
+            asyncio.create_task(self.__consume(
+                queue, rank, sequence, workers_queues, broadcast_queue if on_broadcast_callback is not None else None
+            ))
+            for rank, queue in enumerate(queues)
+        ]
+        try:
+            done, _ = await asyncio.wait([*consumers, *workers], return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        finally:
+            for consumer in consumers:
+                consumer.cancel()
+            for worker_queue in [*workers_queues, broadcast_queue]:
+                # Messages that are not started yet will be redelivered, started ones are finished.
+                while not worker_queue.empty():
+                    worker_queue.get_nowait()
+                    self.__in_flight_count -= 1
+                worker_queue.put_nowait((len(queues), next(sequence), None, None))
+            await asyncio.gather(*consumers, *workers, return_exceptions=True)
+
+    async def __listen_batches(
+            self,
+            on_batch_callback: Callable[[list[BrokerEvent]], Coroutine[Any, Any, None]],
+            on_broadcast_callback: Optional[Callable[[BroadcastEvent], Coroutine[Any, Any, None]]],
+            batch_size: int,
+            max_wait: float
+    ) -> None:
+        # Whole batch must be delivered before it is acknowledged.
+        queues = await self.__open_channel(max(self.__prefetch_count, batch_size))
+
+        # Messages of all queues are buffered by rank, so messages of the priority queue get into batches first.
+        sequence = itertools.count()
+        buffer: asyncio.PriorityQueue[tuple[int, int, AbstractIncomingMessage]] = asyncio.PriorityQueue()
+        feeders = [asyncio.create_task(self.__feed(queue, rank, sequence, buffer)) for rank, queue in enumerate(queues)]
+        collector = asyncio.create_task(
+            self.__collect_batches(buffer, on_batch_callback, on_broadcast_callback, batch_size, max_wait)
+        )
+        try:
+            done, _ = await asyncio.wait([*feeders, collector], return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        finally:
+            for feeder in feeders:
+                feeder.cancel()
+            collector.cancel()
+            await asyncio.gather(*feeders, collector, return_exceptions=True)
+
+    @staticmethod
+    async def __feed(
+            queue: AbstractQueue,
+            rank: int,
+            sequence: 'itertools.count[int]',
+            buffer: asyncio.PriorityQueue[tuple[int, int, AbstractIncomingMessage]]
+    ) -> None:
+        async for message in queue:
+            await buffer.put((rank, next(sequence), message))
+
+    async def __collect_batches(
+            self,
+            buffer: asyncio.PriorityQueue[tuple[int, int, AbstractIncomingMessage]],
+            on_batch_callback: Callable[[list[BrokerEvent]], Coroutine[Any, Any, None]],
+            on_broadcast_callback: Optional[Callable[[BroadcastEvent], Coroutine[Any, Any, None]]],
+            batch_size: int,
+            max_wait: float
+    ) -> None:
+        while True:
+            await self.__consuming_allowed.wait()
+            messages: list[AbstractIncomingMessage] = [(await buffer.get())[2]]
+            deadline = time.monotonic() + max_wait
+            while len(messages) < batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    messages.append((await asyncio.wait_for(buffer.get(), timeout=timeout))[2])
+                except asyncio.TimeoutError:
+                    break
+
+            parsed_messages: list[AbstractIncomingMessage] = []
+            events: list[BrokerEvent] = []
+            for message in messages:
+                if await self.__ack_if_handled(message):
+                    continue
+                if message.type == BROADCAST_EVENT_TYPE:
+                    await self.__handle_broadcast(message, on_broadcast_callback)
+                    continue
+                try:
+                    events.append(decode_event(message.body, message.content_type, BrokerEvent))
+                    parsed_messages.append(message)
+                except ValueError as e:
+                    await self.__dead_letter(message, e)
+            if len(events) == 0:
+                continue
+
+            self.__in_flight_count += len(events)
+            started_at = time.perf_counter()
+            try:
+                await on_batch_callback(events)
+                await self.__ack(*parsed_messages)
+            except Exception as e:
+                for message in parsed_messages:
+                    await self.__handle_failure(message, e)
+            finally:
+                self.__in_flight_count -= len(events)
+                self.__register_processing_time(time.perf_counter() - started_at, len(events))
+
+    async def __route(self, shards_count: int) -> None:
+        queues = await self.__open_channel(self.__prefetch_count)
+        routers: list[asyncio.Task[None]] = []
+        for queue in queues:
+            shards_queues_names = [get_shard_queue_name(queue.name, shard) for shard in range(shards_count)]
+            for shard_queue_name in shards_queues_names:
+                await self.__channel.declare_queue(name=shard_queue_name, durable=True)
+            routers.append(asyncio.create_task(self.__route_queue(queue, shards_queues_names)))
+        try:
+            done, _ = await asyncio.wait(routers, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        finally:
+            for router in routers:
+                router.cancel()
+            await asyncio.gather(*routers, return_exceptions=True)
+
+    async def __route_queue(self, queue: AbstractQueue, shards_queues_names: list[str]) -> None:
+        shards_count = len(shards_queues_names)
+        # Messages are published one by one in order of arrival, so the order of events of a user is kept.
+        async for message in queue:
+            if await self.__ack_if_handled(message):
+                continue
+            started_at = time.perf_counter()
+            try:
+                if message.type == BROADCAST_EVENT_TYPE:
+                    shards_bodies = RabbitMQBroker.__split_broadcast(message, shards_count)
+                else:
+                    recipient = decode_event(message.body, message.content_type, BrokerEventRecipient)
+                    shards_bodies = {get_shard(recipient.user.telegram_id, shards_count): message.body}
+            except ValueError as e:
+                await self.__dead_letter(message, e)
+                continue
+            for shard, body in shards_bodies.items():
+                await self.__channel.default_exchange.publish(
+                    message=RabbitMQBroker.__copy_message(message, body=body),
+                    routing_key=shards_queues_names[shard],
+                )
+            await self.__ack(message)
+            self.__register_processing_time(time.perf_counter() - started_at)
+
+    async def __reconnect(self) -> None:
+        lost_at = time.monotonic()
+        attempt = 0
+        while True:
+            delay = min(self.__reconnect_max_delay, self.__reconnect_base_delay * 2 ** min(attempt, 16))
+            await asyncio.sleep(random.uniform(delay / 2, delay))
+            attempt += 1
+            try:
+                await self.__connection.close()
+            except Exception as e:
+                root_logger.debug(f'Failed to close lost connection: {str(e)}')
+            try:
+                self.__connection = Connection(url=self.__url)
+                await self.__connection.connect()
+                break
+            except Exception as e:
+                root_logger.warning(f'Reconnection attempt {attempt} failed: {str(e)}')
+
+        downtime = time.monotonic() - lost_at
+        self.__reconnect_count += 1
+        self.__last_downtime = downtime
+        self.__total_downtime += downtime
+        root_logger.info(f'Reconnected to broker after {attempt} attempt(s), downtime {downtime:.1f}s')
+
+    def __is_connection_lost(self, exception: Exception) -> bool:
+        if isinstance(exception, (AMQPConnectionError, ChannelInvalidStateError, ConnectionError)):
+            return True
+        return self.__connection.is_closed
+
+    async def __open_channel(self, prefetch_count: int) -> list[AbstractQueue]:
+        """
+        :return: queue of messages and the priority queue if it is given
+        """
+
+        root_logger.debug(f'Creating AMQP channel for connection')
+        self.__channel = await self.__connection.channel()
+        await self.__channel.set_qos(prefetch_count=prefetch_count)
+        root_logger.debug(f'Channel created: {str(self.__channel)} with prefetch count {prefetch_count}')
+
+        await self.__channel.declare_queue(name=self.__get_dead_letter_queue_name(), durable=True)
+        for attempt in range(self.__max_retries):
+            # Expired messages of retry queues return to the queue of messages.
+            await self.__channel.declare_queue(
+                name=self.__get_retry_queue_name(attempt),
+                durable=True,
+                arguments={
+                    'x-message-ttl': self.__get_retry_delay(attempt),
+                    'x-dead-letter-exchange': '',
+                    'x-dead-letter-routing-key': self.__queue_name,
+                },
+            )
+
+        if self.__declare_queue:
+            queue: AbstractQueue = await self.__channel.declare_queue(name=self.__queue_name, durable=True)
+        else:
+            queue = await self.__channel.get_queue(name=self.__queue_name)
+        root_logger.debug(f'Declare queue: {queue}')
+        if self.__priority_queue_name is None:
+            return [queue]
+
+        # Retried messages of the priority queue return to the queue of messages.
+        priority_queue = await self.__channel.declare_queue(name=self.__priority_queue_name, durable=True)
+        root_logger.debug(f'Declare priority queue: {priority_queue}')
+        return [priority_queue, queue]
+
+    async def __consume(
+            self,
+            queue: AbstractQueue,
+            rank: int,
+            sequence: 'itertools.count[int]',
+            workers_queues: list[asyncio.PriorityQueue[tuple[int, int, Any, Any]]],
+            broadcast_queue: Optional[asyncio.PriorityQueue[tuple[int, int, Any, Any]]]
+    ) -> None:
+        async for message in queue:
+            await self.__consuming_allowed.wait()
+            if await self.__ack_if_handled(message):
+                continue
+            if message.type == BROADCAST_EVENT_TYPE:
+                if broadcast_queue is None:
+                    await self.__dead_letter(message, ValueError('Broadcast events are not handled'))
+                    continue
+                try:
+                    broadcast_event = decode_event(message.body, message.content_type, BroadcastEvent)
+                except ValueError as e:
+                    await self.__dead_letter(message, e)
+                    continue
+                self.__in_flight_count += 1
+                await broadcast_queue.put((rank, next(sequence), message, broadcast_event))
+                continue
+            try:
+                event = decode_event(message.body, message.content_type, BrokerEvent)
+            except ValueError as e:
+                await self.__dead_letter(message, e)
+                continue
+            self.__in_flight_count += 1
+            # Events of one user always go to the same worker, so they are handled in order of arrival.
+            worker_queue = workers_queues[event.user.telegram_id % len(workers_queues)]
+            await worker_queue.put((rank, next(sequence), message, event))
+
+    async def __work(
+            self,
+            worker_queue: asyncio.PriorityQueue[tuple[int, int, Any, Any]],
+            on_message_callback: Callable[[Any], Coroutine[Any, Any, Optional[Awaitable[None]]]],
+            get_user_id: Optional[Callable[[Any], int]] = None
+    ) -> None:
+        """
+        :param get_user_id: returns user of the event, events whose completion is awaited later are ordered by it
+        """
+
+        # Last settling of messages whose events complete after the callback returned, or last handling of events
+        # waiting for it, by users.
+        settling: dict[int, asyncio.Task[None]] = {}
+
+        def track(user_id: int, task: asyncio.Task[None]) -> None:
+            settling[user_id] = task
+            task.add_done_callback(lambda _: settling.pop(user_id) if settling.get(user_id) is task else None)
+
+        try:
+            while True:
+                _, _, message, event = await worker_queue.get()
+                if message is None:
+                    return
+                user_id = get_user_id(event) if get_user_id is not None else None
+                if user_id is not None and user_id in settling:
+                    # The event waits for the previous event of its user, events of other users are taken meanwhile.
+                    track(user_id, asyncio.create_task(
+                        self.__handle_after(settling[user_id], message, event, on_message_callback)
+                    ))
+                    continue
+                started_at = time.perf_counter()
+                try:
+                    completion = await on_message_callback(event)
+                except Exception as e:
+                    try:
+                        await self.__handle_failure(message, e)
+                    finally:
+                        self.__finish_processing(started_at)
+                    continue
+                if completion is None or user_id is None:
+                    await self.__settle(message, completion, started_at)
+                    continue
+
+                track(user_id, asyncio.create_task(self.__settle(message, completion, started_at)))
+        finally:
+            # Events that are being completed are finished before the worker stops.
+            await asyncio.gather(*settling.values(), return_exceptions=True)
+
+    async def __handle_after(
+            self,
+            previous: asyncio.Task[None],
+            message: AbstractIncomingMessage,
+            event: Any,
+            on_message_callback: Callable[[Any], Coroutine[Any, Any, Optional[Awaitable[None]]]]
+    ) -> None:
+        # Waiting does not cancel the previous event if this one is cancelled.
+        await asyncio.wait([previous])
+        started_at = time.perf_counter()
+        try:
+            completion = await on_message_callback(event)
+        except Exception as e:
+            try:
+                await self.__handle_failure(message, e)
+            finally:
+                self.__finish_processing(started_at)
+            return
+        await self.__settle(message, completion, started_at)
+
+    async def __settle(
+            self,
+            message: AbstractIncomingMessage,
+            completion: Optional[Awaitable[None]],
+            started_at: float
+    ) -> None:
+        try:
+            if completion is not None:
+                await completion
+            await self.__ack(message)
+        except Exception as e:
+            await self.__handle_failure(message, e)
+        finally:
+            self.__finish_processing(started_at)
+
+    def __finish_processing(self, started_at: float) -> None:
+        self.__in_flight_count -= 1
+        self.__register_processing_time(time.perf_counter() - started_at)
+
+    async def __handle_broadcast(
+            self,
+            message: AbstractIncomingMessage,
+            on_broadcast_callback: Optional[Callable[[BroadcastEvent], Coroutine[Any, Any, None]]]
+    ) -> None:
+        if on_broadcast_callback is None:
+            await self.__dead_letter(message, ValueError('Broadcast events are not handled'))
+            return
+        try:
+            broadcast_event = decode_event(message.body, message.content_type, BroadcastEvent)
+        except ValueError as e:
+            await self.__dead_letter(message, e)
+            return
+
+        self.__in_flight_count += 1
+        started_at = time.perf_counter()
+        try:
+            await on_broadcast_callback(broadcast_event)
+            await self.__ack(message)
+        except Exception as e:
+            await self.__handle_failure(message, e)
+        finally:
+            self.__in_flight_count -= 1
+            self.__register_processing_time(time.perf_counter() - started_at)
+
+    async def __handle_failure(self, message: AbstractIncomingMessage, exception: Exception) -> None:
+        retry_count = message.headers.get(self.__RETRY_COUNT_HEADER, 0)
+        if not isinstance(retry_count, int):
+            retry_count = 0
+
+        if isinstance(exception, BrokerRetryableException) and retry_count < self.__max_retries:
+            await self.__retry(message, retry_count, exception)
+        else:
+            await self.__dead_letter(message, exception)
+
+    async def __retry(self, message: AbstractIncomingMessage, retry_count: int, exception: Exception) -> None:
+        root_logger.warning(f'Message will be retried (attempt {retry_count + 1}): {str(exception)}')
+        headers = dict(message.headers)
+        headers[self.__RETRY_COUNT_HEADER] = retry_count + 1
+        await self.__channel.default_exchange.publish(
+            message=RabbitMQBroker.__copy_message(message, headers=headers),
+            routing_key=self.__get_retry_queue_name(retry_count),
+        )
+        await self.__ack(message)
+        self.__retried_count += 1
+
+    async def __dead_letter(self, message: AbstractIncomingMessage, exception: Exception) -> None:
+        root_logger.error(f'Message is moved to dead letters: {type(exception).__name__}: {str(exception)}')
+        headers = dict(message.headers)
+        headers[self.__ERROR_HEADER] = str(exception)
+        headers[self.__ERROR_TYPE_HEADER] = type(exception).__name__
+        await self.__channel.default_exchange.publish(
+            message=RabbitMQBroker.__copy_message(message, headers=headers),
+            routing_key=self.__get_dead_letter_queue_name(),
+        )
+        await self.__ack(message)
+        self.__dead_lettered_count += 1
 
     @staticmethod
-    def __parse_event(bytez: bytes) -> BrokerEvent:
-        return BrokerEvent.model_validate_json(bytez.decode())
+    def __copy_message(
+            message: AbstractIncomingMessage,
+            body: Optional[bytes] = None,
+            headers: Optional[dict[str, Any]] = None
+    ) -> Message:
+        return Message(
+            body=body if body is not None else message.body,
+            headers=headers if headers is not None else dict(message.headers),
+            content_type=message.content_type,
+            type=message.type,
+            message_id=message.message_id,
+            delivery_mode=DeliveryMode.PERSISTENT,
+        )
+
+    @staticmethod
+    def __split_broadcast(message: AbstractIncomingMessage, shards_count: int) -> dict[int, bytes]:
+        recipients = decode_event(message.body, message.content_type, BroadcastEventRecipients)
+        shards_telegram_ids: dict[int, list[int]] = {}
+        for telegram_id in recipients.telegram_ids:
+            shards_telegram_ids.setdefault(get_shard(telegram_id, shards_count), []).append(telegram_id)
+
+        payload = decode_raw(message.body, message.content_type)
+        shards_bodies: dict[int, bytes] = {}
+        for shard, telegram_ids in shards_telegram_ids.items():
+            payload['telegram_ids'] = telegram_ids
+            shards_bodies[shard] = encode_raw(payload, message.content_type)
+        return shards_bodies
+
+    async def __ack(self, *messages: AbstractIncomingMessage) -> None:
+        # Messages of a batch are reordered by rank of their queues, so their delivery tags are not contiguous
+        # and every message is acknowledged on its own.
+        for i, message in enumerate(messages):
+            try:
+                await message.ack()
+            except Exception:
+                if not self.__channel.is_closed:
+                    raise
+                # Delivery tags are bound to the lost channel, messages are acknowledged when they are redelivered.
+                # Only id identifies a message, equal bodies of messages without id may be different events.
+                for lost_message in messages[i:]:
+                    if lost_message.message_id is not None:
+                        self.__pending_acks[lost_message.message_id] = None
+                return
+
+    async def __ack_if_handled(self, message: AbstractIncomingMessage) -> bool:
+        if not message.redelivered or message.message_id not in self.__pending_acks:
+            return False
+        del self.__pending_acks[message.message_id]
+        await self.__ack(message)
+        root_logger.debug('Redelivered message %s was already handled', message.message_id)
+        return True
+
+    def __get_retry_delay(self, attempt: int) -> int:
+        return int(self.__retry_base_delay * 2 ** attempt * 1000)
+
+    def __get_retry_queue_name(self, attempt: int) -> str:
+        # Delay is a part of the name, so a changed delay declares a new queue instead of failing on redeclaration.
+        return f'{self.__queue_name}.retry.{self.__get_retry_delay(attempt)}ms'
+
+    def __get_dead_letter_queue_name(self) -> str:
+        return f'{self.__queue_name}.dead-letter'
+
+    def __register_processing_time(self, processing_time: float, messages_count: int = 1) -> None:
+        self.__processed_count += messages_count
+        self.__total_processing_time += processing_time
+        self.__last_processing_time = processing_time / messages_count
+        self.__max_processing_time = max(self.__max_processing_time, self.__last_processing_time)
+        root_logger.debug(f'{messages_count} message(s) processed in {processing_time:.3f}s,'
+                          f' in flight: {self.__in_flight_count}')
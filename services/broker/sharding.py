@@ -0,0 +1,21 @@
+def get_shard(key: int, shards_count: int) -> int:
+    """
+    Jump consistent hash of the key: keys stay on their shard when shards are added,
+    except of the keys moved to the new shards.
+
+    :param key: non-negative key, e.g. telegram id of the user
+    :param shards_count: count of shards
+    :return: shard in range [0, shards_count)
+    """
+
+    key &= 0xFFFFFFFFFFFFFFFF
+    shard, next_shard = -1, 0
+    while next_shard < shards_count:
+        shard = next_shard
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        next_shard = int((shard + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return shard
+
+
+def get_shard_queue_name(queue_name: str, shard: int) -> str:
+    return f'{queue_name}.shard.{shard}'
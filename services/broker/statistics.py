@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+
+
+class BrokerStatistics(BaseModel):
+    in_flight_count: int
+    processed_count: int
+    retried_count: int
+    dead_lettered_count: int
+    reconnect_count: int
+    total_downtime: float
+    last_downtime: float
+    last_processing_time: float
+    average_processing_time: float
+    max_processing_time: float
@@ -0,0 +1,7 @@
+__all__ = [
+    'SendGovernor',
+    'SendGovernorMiddleware'
+]
+
+from .governor import SendGovernor
+from .middleware import SendGovernorMiddleware
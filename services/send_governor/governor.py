@@ -0,0 +1,25 @@
+from abc import ABC, abstractmethod
+from typing import Union
+
+
+class SendGovernor(ABC):
+    @abstractmethod
+    async def acquire(self, chat_id: Union[int, str], is_message: bool = True) -> None:
+        """
+        Waits until a request to the chat fits into the global and the chat's rate limits and takes it into account.
+        Requests that do not post messages are limited by the global rate only, they wait for pause of the chat.
+
+        :param chat_id: id of the telegram chat (or username of the channel)
+        :param is_message: the request posts a message to the chat
+        """
+        pass
+
+    @abstractmethod
+    async def pause(self, chat_id: Union[int, str], seconds: float) -> None:
+        """
+        Forbids requests to the chat for a while, other chats are not affected.
+
+        :param chat_id: id of the telegram chat (or username of the channel)
+        :param seconds: duration of the pause
+        """
+        pass
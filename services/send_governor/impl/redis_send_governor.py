@@ -0,0 +1,128 @@
+import asyncio
+from typing import Union
+
+from redis.asyncio import Redis
+
+from ..governor import SendGovernor
+
+
+class RedisSendGovernor(SendGovernor):
+    """
+    Token buckets stored in redis, so every process using the same bot token shares one rate budget.
+    Private chats are limited by the chat bucket, groups and channels by the stricter group bucket,
+    and all of them by the global bucket.
+    """
+
+    __redis: Redis
+    __global_rate: float
+    __chat_rate: float
+    __chat_burst: int
+    __group_rate: float
+    __group_burst: int
+    __key_prefix: str
+
+    # KEYS are pairs of bucket and pause keys, ARGV are pairs of rate (tokens per second) and capacity of the bucket,
+    # only pause is checked for zero rate.
+    # Returns '0' when a token was taken from every bucket, otherwise seconds to wait before the next try.
+    __ACQUIRE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local wait = 0
+local tokens = {}
+for i = 1, #KEYS, 2 do
+    local rate = tonumber(ARGV[i])
+    local capacity = tonumber(ARGV[i + 1])
+    local bucket = redis.call('HMGET', KEYS[i], 'tokens', 'updated_at')
+    local available = tonumber(bucket[1]) or capacity
+    local updated_at = tonumber(bucket[2]) or now
+    available = math.min(capacity, available + math.max(0, now - updated_at) * rate)
+    local paused = redis.call('PTTL', KEYS[i + 1])
+    if paused > 0 then
+        wait = math.max(wait, paused / 1000)
+    elseif rate > 0 and available < 1 then
+        wait = math.max(wait, (1 - available) / rate)
+    end
+    tokens[i] = available
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i = 1, #KEYS, 2 do
+    local rate = tonumber(ARGV[i])
+    local capacity = tonumber(ARGV[i + 1])
+    if rate > 0 then
+        redis.call('HSET', KEYS[i], 'tokens', tostring(tokens[i] - 1), 'updated_at', tostring(now))
+        redis.call('EXPIRE', KEYS[i], math.ceil(capacity / rate) + 1)
+    end
+end
+return '0'
+"""
+
+    def __init__(
+            self,
+            redis: Redis,
+            global_rate: float,
+            chat_rate: float,
+            chat_burst: int,
+            group_messages_per_minute: int,
+            key_prefix: str = 'send-governor'
+    ) -> None:
+        """
+        :param redis: redis client shared by all processes of the bot
+        :param global_rate: maximum count of requests per second for the whole bot
+        :param chat_rate: maximum count of requests per second to one private chat
+        :param chat_burst: count of requests to one private chat that may be sent at once
+        :param group_messages_per_minute: maximum count of requests per minute to one group or channel
+        :param key_prefix: prefix of governor keys in redis
+        """
+
+        self.__redis = redis
+        self.__global_rate = global_rate
+        self.__chat_rate = chat_rate
+        self.__chat_burst = chat_burst
+        self.__group_rate = group_messages_per_minute / 60
+        self.__group_burst = group_messages_per_minute
+        self.__key_prefix = key_prefix
+        self.__acquire_script = redis.register_script(self.__ACQUIRE_SCRIPT)
+
+    async def acquire(self, chat_id: Union[int, str], is_message: bool = True) -> None:
+        chat_bucket_key = self.__get_chat_bucket_key(chat_id)
+        global_bucket_key = self.__get_bucket_key('global')
+        keys = [
+            global_bucket_key, self.__get_pause_key(global_bucket_key),
+            chat_bucket_key, self.__get_pause_key(chat_bucket_key),
+        ]
+        if not is_message:
+            args = [self.__global_rate, self.__global_rate, 0, 0]
+        elif self.__is_group(chat_id):
+            args = [self.__global_rate, self.__global_rate, self.__group_rate, self.__group_burst]
+        else:
+            args = [self.__global_rate, self.__global_rate, self.__chat_rate, self.__chat_burst]
+
+        while True:
+            wait = float(await self.__acquire_script(keys=keys, args=args))
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def pause(self, chat_id: Union[int, str], seconds: float) -> None:
+        await self.__redis.set(name=self.__get_pause_key(self.__get_chat_bucket_key(chat_id)),
+                               value=1,
+                               px=max(1, int(seconds * 1000)))
+
+    def __get_chat_bucket_key(self, chat_id: Union[int, str]) -> str:
+        if self.__is_group(chat_id):
+            return self.__get_bucket_key(f'group:{chat_id}')
+        return self.__get_bucket_key(f'chat:{chat_id}')
+
+    def __get_bucket_key(self, name: str) -> str:
+        return f'{self.__key_prefix}:{name}'
+
+    @staticmethod
+    def __get_pause_key(bucket_key: str) -> str:
+        return f'{bucket_key}:paused'
+
+    @staticmethod
+    def __is_group(chat_id: Union[int, str]) -> bool:
+        # Ids of groups and channels are negative, channels may also be addressed by username.
+        return isinstance(chat_id, str) or chat_id < 0
@@ -0,0 +1,60 @@
+import logging
+from typing import TYPE_CHECKING
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod, Response
+from aiogram.methods.base import TelegramType
+
+from .governor import SendGovernor
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+root_logger = logging.getLogger('root')
+
+
+class SendGovernorMiddleware(BaseRequestMiddleware):
+    """
+    Passes every request addressed to a chat through the send governor and retries it after flood control.
+    Only requests posting messages are counted in the chat's limit, edits, deletes and chat actions
+    are limited by the global rate.
+    """
+
+    __MESSAGE_METHODS = frozenset({'copyMessage', 'copyMessages', 'forwardMessage', 'forwardMessages'})
+
+    __governor: SendGovernor
+    __max_retries: int
+
+    def __init__(self, governor: SendGovernor, max_retries: int = 3) -> None:
+        self.__governor = governor
+        self.__max_retries = max_retries
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType[TelegramType],
+            bot: 'Bot',
+            method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, 'chat_id', None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        is_message = self.__is_message(method)
+        attempt = 0
+        while True:
+            await self.__governor.acquire(chat_id, is_message)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == self.__max_retries:
+                    raise
+                attempt += 1
+                root_logger.warning(f'Flood control on {chat_id} for {method.__api_method__},'
+                                    f' retry after {e.retry_after}s')
+                await self.__governor.pause(chat_id, e.retry_after)
+
+    @classmethod
+    def __is_message(cls, method: TelegramMethod[TelegramType]) -> bool:
+        api_method = method.__api_method__
+        return (api_method.startswith('send') and api_method != 'sendChatAction') or api_method in cls.__MESSAGE_METHODS
@@ -120,4 +120,16 @@ class UserServiceAgent(ABC):
         :raises InvalidCityException: no cities by coordinates
         :raises CityAlreadyAddedException: city is already added
         :raise InvalidCoordsException: bad values of coordinates
-        """
\ No newline at end of file
+        """
+
+    @abstractmethod
+    async def report_users_reachability(self, unreachable_telegram_ids: list[int],
+                                        reachable_telegram_ids: list[int]) -> None:
+        """
+        Reports users who blocked the bot and users who started it again, so concerts are matched
+        only for reachable users.
+
+        :param unreachable_telegram_ids: ids of telegram users who blocked the bot
+        :param reachable_telegram_ids: ids of telegram users who started the bot again
+        :raises InternalErrorException: internal error occurred
+        """
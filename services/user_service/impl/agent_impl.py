@@ -168,7 +168,19 @@ class UserServiceAgentImpl(UserServiceAgent):
             logging.log(level=logging.WARNING, msg=str(e))
             raise InternalErrorException(self.__NO_CONNECTION_TEXT) from e
 
-
+    async def report_users_reachability(self, unreachable_telegram_ids: list[int],
+                                        reachable_telegram_ids: list[int]) -> None:
+        try:
+            response = await self.__session.post(url='/users/reachability',
+                                                 json={'unreachable': unreachable_telegram_ids,
+                                                       'reachable': reachable_telegram_ids})
+            parsed_response = DefaultResponse.model_validate_json(await response.text())
+            self.__validate_report_users_reachability(parsed_response.status.code)
+        except ValueError as e:
+            raise InternalErrorException(self.__BAD_ANSWER_TEXT) from e
+        except ClientConnectionError as e:
+            logging.log(level=logging.WARNING, msg=str(e))
+            raise InternalErrorException(self.__NO_CONNECTION_TEXT) from e
 
     @staticmethod
     def __get_users_url(telegram_id: int) -> str:
@@ -304,3 +316,11 @@ class UserServiceAgentImpl(UserServiceAgent):
         if status == ResponseStatusCode.INVALID_COORDS:
             raise InvalidCoordsException()
         raise InternalErrorException('Unknown response code on add city by coordinates')
+
+    @staticmethod
+    def __validate_report_users_reachability(status: ResponseStatusCode) -> None:
+        if status == ResponseStatusCode.SUCCESS:
+            return
+        UserServiceAgentImpl.__check_internal_error(status)
+
+        raise InternalErrorException('Unknown response code on report users reachability')
@@ -3,16 +3,88 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     bot_token: str = ''
+    bot_mode: str = 'polling'
+    webhook_url: str = ''
+    webhook_path: str = '/webhook'
+    webhook_secret: str = ''
+    webhook_host: str = '0.0.0.0'
+    webhook_port: int = 8081
+    webhook_max_connections: int = 40
+    webhook_shutdown_timeout: float = 30.0
+    bot_ingestion_enabled: bool = False
+    bot_ingestion_partitions: int = 64
+    bot_ingestion_dedup_ttl: int = 24 * 60 * 60
+    bot_ingestion_max_length: int = 100_000
+    bot_workers_count: int = 1
+    bot_user_lock_distributed: bool = True
+    bot_user_lock_lease: float = 30.0
+    bot_user_lock_statistics_interval: int = 60
     rabbitmq_user: str = 'rabbit-admin'
     rabbitmq_password: str = 'rabbit-password'
     rabbitmq_queue: str = 'new-concerts-queue'
+    rabbitmq_priority_queue: str = ''
     rabbitmq_host: str = 'localhost'
     rabbitmq_port: int = 5672
+    rabbitmq_prefetch_count: int = 20
+    rabbitmq_robust_connection: bool = True
+    rabbitmq_reconnect_base_delay: float = 1.0
+    rabbitmq_reconnect_max_delay: float = 30.0
+    broker_workers_count: int = 10
+    broker_processes_count: int = 1
+    broker_drain_timeout: float = 30.0
+    broker_batch_size: int = 0
+    broker_batch_max_wait: float = 2.0
+    broker_max_retries: int = 5
+    broker_retry_base_delay: float = 5.0
+    broker_statistics_interval: int = 60
+    broadcast_chunk_size: int = 1000
+    delivery_senders_count: int = 10
+    delivery_queue_size: int = 1000
+    delivery_queue_high_watermark: int = 800
+    delivery_queue_low_watermark: int = 200
+    delivery_schedule_window: int = 0
+    delivery_schedule_batch_size: int = 100
+    delivery_schedule_concurrency: int = 100
+    delivery_schedule_requests_per_job: int = 3
+    delivery_schedule_lease: int = 300
+    delivery_quiet_hours_start: int = 0
+    delivery_quiet_hours_end: int = 0
+    delivery_default_timezone: str = 'Europe/Moscow'
+    delivery_city_timezones: dict[str, str] = {}
+    delivery_outbox_enabled: bool = False
+    delivery_outbox_max_length: int = 5_000
+    delivery_outbox_batch_size: int = 100
+    delivery_outbox_concurrency: int = 100
+    delivery_outbox_claim_timeout: int = 300
+    blocked_users_report_interval: int = 300
+    blocked_users_report_batch_size: int = 1000
     user_service_host: str = 'localhost'
     user_service_port: int = 8080
     redis_host: str = 'localhost'
     redis_port: int = 6379
     redis_password: str = 'redis-password'
+    redis_max_connections: int = 50
+    redis_pool_timeout: float = 5.0
+    redis_socket_timeout: float = 2.0
+    redis_socket_connect_timeout: float = 2.0
+    redis_socket_keepalive: bool = True
+    redis_health_check_interval: int = 30
+    redis_retries: int = 3
+    redis_statistics_interval: int = 60
+    telegram_global_rate: float = 30
+    telegram_chat_rate: float = 1
+    telegram_chat_burst: int = 3
+    telegram_group_messages_per_minute: int = 20
+    concert_pages_ttl: int = 60 * 60
+    log_json: bool = False
+    log_debug_sample_rate: float = 1.0
+    render_cache_size: int = 10_000
+    render_cache_ttl: float = 60 * 60
+    delivery_dedup_mode: str = 'exact'
+    delivery_dedup_grace_period: int = 24 * 60 * 60
+    delivery_dedup_reservation_ttl: int = 5 * 60
+    delivery_dedup_bloom_bits: int = 4096
+    delivery_dedup_bloom_hashes: int = 4
 
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -0,0 +1,4 @@
+import os
+
+# Settings are read from environment when modules of the bot are imported.
+os.environ.setdefault('BOT_TOKEN', '42:TEST')
@@ -0,0 +1,179 @@
+import asyncio
+import itertools
+from typing import Any, Optional
+
+from aio_pika import Message
+
+
+class FakeChannelError(Exception):
+    pass
+
+
+class FakeIncomingMessage:
+    """
+    Incoming message of a fake channel with acknowledgement by delivery tag as in AMQP.
+    """
+
+    def __init__(self, channel: 'FakeChannel', delivery_tag: int, message: Message, redelivered: bool) -> None:
+        self.channel = channel
+        self.delivery_tag = delivery_tag
+        self.body = message.body
+        self.headers = dict(message.headers or {})
+        self.content_type = message.content_type
+        self.type = message.type
+        self.message_id = message.message_id
+        self.redelivered = redelivered
+
+    async def ack(self, multiple: bool = False) -> None:
+        self.channel.ack(self.delivery_tag, multiple)
+
+
+class FakeQueue:
+    def __init__(self, broker: 'FakeAMQP', name: str) -> None:
+        self.broker = broker
+        self.name = name
+        self.arguments: dict[str, Any] = {}
+        # None instead of a message makes consumers of the queue fail as on lost connection.
+        self.messages: asyncio.Queue[tuple[Optional[Message], bool]] = asyncio.Queue()
+
+    def __aiter__(self) -> 'FakeQueue':
+        return self
+
+    async def __anext__(self) -> FakeIncomingMessage:
+        message, redelivered = await self.messages.get()
+        if message is None:
+            raise ConnectionError('Connection reset by broker')
+        return self.broker.channels[-1].deliver(message, redelivered)
+
+    async def get(self, fail: bool = True) -> Optional[FakeIncomingMessage]:
+        if self.messages.empty():
+            return None
+        message, redelivered = self.messages.get_nowait()
+        if message is None:
+            raise ConnectionError('Connection reset by broker')
+        return self.broker.channels[-1].deliver(message, redelivered)
+
+
+class FakeExchange:
+    def __init__(self, broker: 'FakeAMQP') -> None:
+        self.broker = broker
+
+    async def publish(self, message: Message, routing_key: str) -> None:
+        self.broker.published.append((routing_key, message))
+        self.broker.get_queue(routing_key).messages.put_nowait((message, False))
+
+
+class FakeChannel:
+    def __init__(self, broker: 'FakeAMQP') -> None:
+        self.broker = broker
+        self.default_exchange = FakeExchange(broker)
+        self.is_closed = False
+        self.prefetch_count = 0
+        self.unacked: dict[int, FakeIncomingMessage] = {}
+        self.__delivery_tags = itertools.count(1)
+
+    async def set_qos(self, prefetch_count: int) -> None:
+        self.prefetch_count = prefetch_count
+
+    async def declare_queue(self, name: str, durable: bool = False,
+                            arguments: Optional[dict[str, Any]] = None) -> FakeQueue:
+        queue = self.broker.get_queue(name)
+        if arguments is not None and queue.arguments and queue.arguments != arguments:
+            self.is_closed = True
+            raise FakeChannelError(f'PRECONDITION_FAILED - inequivalent arguments for queue {name}')
+        queue.arguments = arguments or queue.arguments
+        return queue
+
+    async def get_queue(self, name: str) -> FakeQueue:
+        return self.broker.get_queue(name)
+
+    def deliver(self, message: Message, redelivered: bool) -> FakeIncomingMessage:
+        incoming = FakeIncomingMessage(self, next(self.__delivery_tags), message, redelivered)
+        self.unacked[incoming.delivery_tag] = incoming
+        return incoming
+
+    def ack(self, delivery_tag: int, multiple: bool) -> None:
+        if self.is_closed:
+            raise FakeChannelError('Channel is closed')
+        if delivery_tag not in self.unacked:
+            # Broker closes the channel on acknowledgement of unknown delivery tag.
+            self.is_closed = True
+            raise FakeChannelError(f'PRECONDITION_FAILED - unknown delivery tag {delivery_tag}')
+        tags = [tag for tag in self.unacked if tag <= delivery_tag] if multiple else [delivery_tag]
+        for tag in tags:
+            self.broker.acked.append(self.unacked.pop(tag))
+
+
+class FakeConnection:
+    def __init__(self, broker: 'FakeAMQP') -> None:
+        self.broker = broker
+        self.is_closed = True
+
+    async def connect(self) -> None:
+        if self.broker.refused_connects > 0:
+            self.broker.refused_connects -= 1
+            raise ConnectionError('Connection refused')
+        self.is_closed = False
+
+    async def channel(self) -> FakeChannel:
+        channel = FakeChannel(self.broker)
+        self.broker.channels.append(channel)
+        return channel
+
+    async def close(self) -> None:
+        self.is_closed = True
+
+    async def __aenter__(self) -> 'FakeConnection':
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+
+class FakeAMQP:
+    """
+    In-memory broker replacing aio-pika connections of RabbitMQBroker in tests.
+    """
+
+    def __init__(self) -> None:
+        self.queues: dict[str, FakeQueue] = {}
+        self.channels: list[FakeChannel] = []
+        self.published: list[tuple[str, Message]] = []
+        self.acked: list[FakeIncomingMessage] = []
+        self.connections: list[FakeConnection] = []
+        self.refused_connects = 0
+
+    def connect(self, url: Any = None) -> FakeConnection:
+        connection = FakeConnection(self)
+        self.connections.append(connection)
+        return connection
+
+    def disconnect(self) -> None:
+        """
+        Closes all connections and channels as on lost connection, unacknowledged messages are not put back.
+        """
+
+        for connection in self.connections:
+            connection.is_closed = True
+        for channel in self.channels:
+            channel.is_closed = True
+        for queue in self.queues.values():
+            queue.messages.put_nowait((None, False))
+
+    def get_queue(self, name: str) -> FakeQueue:
+        if name not in self.queues:
+            self.queues[name] = FakeQueue(self, name)
+        return self.queues[name]
+
+    def put(self, queue_name: str, body: bytes, message_type: Optional[str] = None,
+            message_id: Optional[str] = None, headers: Optional[dict[str, Any]] = None,
+            redelivered: bool = False) -> None:
+        message = Message(body=body, content_type='application/json', type=message_type, message_id=message_id,
+                          headers=headers or {})
+        self.get_queue(queue_name).messages.put_nowait((message, redelivered))
+
+    def get_acked_bodies(self) -> list[bytes]:
+        return [message.body for message in self.acked]
+
+    def get_published(self, queue_name: str) -> list[Message]:
+        return [message for routing_key, message in self.published if routing_key == queue_name]
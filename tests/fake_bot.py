@@ -0,0 +1,28 @@
+from typing import Any, AsyncGenerator, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+
+
+class RecordingSession(BaseSession):
+    """
+    Session of a bot that records requests instead of sending them, every request succeeds.
+    """
+
+    requests: list[TelegramMethod[Any]]
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.requests = []
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[Any], timeout: Optional[int] = None) -> Any:
+        self.requests.append(method)
+        return True
+
+    async def stream_content(self, url: str, headers: Optional[dict[str, Any]] = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        yield b''
+
+    async def close(self) -> None:
+        pass
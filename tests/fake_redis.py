@@ -0,0 +1,33 @@
+import asyncio
+from typing import Any, Optional
+
+import fakeredis.aioredis
+
+
+class FakeRedis(fakeredis.aioredis.FakeRedis):
+    """
+    Redis that records streams of every read of a consumer group. Blocking reads of fakeredis
+    do not let other tasks run, so a read waits here instead of blocking.
+    """
+
+    reads: list[list[str]]
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.reads = []
+
+    async def xreadgroup(self, groupname: str, consumername: str, streams: dict[Any, Any],
+                         count: Optional[int] = None, block: Optional[int] = None, noack: bool = False) -> Any:
+        self.reads.append(list(streams))
+        response = await super().xreadgroup(groupname, consumername, streams, count=count, noack=noack)
+        if block is not None and not any(entries for _, entries in response):
+            await asyncio.sleep(0.01)
+        return response
+
+
+async def wait_until(condition: Any, timeout: float = 2) -> None:
+    async def wait() -> None:
+        while not condition():
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(wait(), timeout=timeout)
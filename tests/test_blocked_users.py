@@ -0,0 +1,77 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any
+
+import pytest
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.methods import SendMessage
+
+import broker_listener
+from bot.fsm_access import FSMAccess
+from model import Concert, User
+from notifications import BlockedUsers, DeliveryDedup
+from services.broker import BrokerEvent
+from tests.fake_redis import FakeRedis
+
+
+def create_concert(title: str) -> Concert:
+    return Concert.model_validate({
+        'title': title,
+        'afisha_url': f'https://afisha.yandex.ru/moscow/concert/{title}',
+        'city': 'Москва',
+        'place': None,
+        'address': 'Тверская, 1',
+        'datetime': datetime(2026, 12, 1, 20, 0).isoformat(),
+        'map_url': None,
+        'min_price': None,
+        'artists': [],
+    })
+
+
+def test_changes_of_registry_are_reported_once_and_restored_after_failed_report() -> None:
+    async def run() -> list[Any]:
+        blocked_users = BlockedUsers(FakeRedis())
+        await blocked_users.block(1)
+        await blocked_users.block(2)
+        await blocked_users.unblock(2)
+        # Nothing is reported for the user who was not blocked.
+        await blocked_users.unblock(3)
+        results: list[Any] = [await blocked_users.get_blocked([1, 2, 3])]
+
+        changes = await blocked_users.pop_unreported(10)
+        results += [changes, await blocked_users.pop_unreported(10)]
+        await blocked_users.restore_unreported(*changes)
+        return results + [await blocked_users.pop_unreported(10)]
+
+    assert asyncio.run(run()) == [{1}, ([1], [2]), ([], []), ([1], [2])]
+
+
+def test_user_who_blocked_the_bot_is_skipped_by_next_deliveries(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Loggers of the listener are created when it is run.
+    monkeypatch.setattr(broker_listener, 'broker_logger', logging.getLogger('broker'), raising=False)
+    redis = FakeRedis()
+    blocked_users = BlockedUsers(redis)
+    monkeypatch.setattr(broker_listener, 'blocked_users', blocked_users)
+    monkeypatch.setattr(broker_listener, 'delivery_dedup', DeliveryDedup(redis))
+    monkeypatch.setattr(broker_listener, 'fsm_access', FSMAccess(redis, broker_listener.bot.id))
+    sent_count = 0
+
+    async def send_message(chat_id: int, text: str, **kwargs: Any) -> Any:
+        nonlocal sent_count
+        sent_count += 1
+        raise TelegramForbiddenError(SendMessage(chat_id=chat_id, text=text), 'bot was blocked by the user')
+
+    monkeypatch.setattr(broker_listener.bot, 'send_message', send_message)
+
+    async def run() -> set[int]:
+        job = await broker_listener.render(1, [create_concert('first')], None)
+        assert job is not None
+        await broker_listener.send(job)
+        user = User.model_validate({'telegram_id': 1, 'creation_datetime': '2024-01-01T00:00:00'})
+        event = BrokerEvent(user=user, concerts=[create_concert('second')])
+        assert await broker_listener.on_message(event) is None
+        return await blocked_users.get_blocked([1])
+
+    assert asyncio.run(run()) == {1}
+    assert sent_count == 1
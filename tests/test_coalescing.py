@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from notifications import coalesce_events
+from services.broker import BrokerEvent
+
+
+def create_event(telegram_id: int, titles: list[str]) -> BrokerEvent:
+    return BrokerEvent.model_validate({
+        'user': {'telegram_id': telegram_id, 'creation_datetime': '2024-01-01T00:00:00'},
+        'concerts': [{
+            'title': title,
+            'afisha_url': f'https://afisha.yandex.ru/moscow/concert/{title}',
+            'city': 'Москва',
+            'place': None,
+            'address': 'Тверская, 1',
+            'datetime': datetime(2026, 12, 1, 20, 0).isoformat(),
+            'map_url': None,
+            'min_price': None,
+            'artists': [],
+        } for title in titles],
+    })
+
+
+def test_events_of_user_are_merged_in_order_of_arrival_without_repeated_concerts() -> None:
+    events = coalesce_events([
+        create_event(2, ['first']),
+        create_event(1, ['second', 'third']),
+        create_event(2, ['first', 'fourth']),
+        create_event(1, []),
+    ])
+
+    assert [event.user.telegram_id for event in events] == [2, 1]
+    assert [[concert.title for concert in event.concerts] for event in events] == [
+        ['first', 'fourth'],
+        ['second', 'third'],
+    ]
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from concert_message_builder import configure_render_cache, get_render_cache_statistics, get_rendered_concert
+from model import Concert
+
+
+def create_concert(title: str) -> Concert:
+    return Concert.model_validate({
+        'title': title,
+        'afisha_url': 'https://afisha.yandex.ru/moscow/concert/concert',
+        'city': 'Москва',
+        'place': 'ВТБ Арена',
+        'address': 'Ленинградский проспект, 36',
+        'datetime': datetime(2026, 12, 1, 20, 0).isoformat(),
+        'map_url': 'https://yandex.ru/maps/?ll=37.558970%2C55.791540&z=16',
+        'min_price': {'price': 2500, 'currency': 'RUB'},
+        'artists': [{'name': 'Artist', 'yandex_music_id': 1}],
+    })
+
+
+def test_concert_is_rendered_again_when_rendered_field_changes() -> None:
+    configure_render_cache(maxsize=10, ttl=60)
+    hits_before = get_render_cache_statistics().hits
+
+    first = get_rendered_concert(create_concert('Concert'))
+    same = get_rendered_concert(create_concert('Concert'))
+    renamed = get_rendered_concert(create_concert('Renamed concert'))
+
+    assert same is first
+    assert 'Renamed concert' in renamed.message
+    assert get_render_cache_statistics().hits == hits_before + 1
+    assert get_render_cache_statistics().size == 2
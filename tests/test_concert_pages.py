@@ -0,0 +1,86 @@
+import asyncio
+import datetime
+from typing import Optional
+
+import fakeredis.aioredis
+from aiogram import Bot
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.state import State
+from aiogram.methods import AnswerCallbackQuery, EditMessageText
+from aiogram.types import CallbackQuery, Chat, Message, User
+
+from bot.handlers.concert_pages import ConcertPages
+from bot.handlers.menu_handlers import show_concerts_page
+from bot.keyboards import ConcertsPageCallbackData
+from bot.states import MenuStates, RegistrationStates
+from tests.fake_bot import RecordingSession
+
+USER_ID = 1
+KEYBOARD_ID = 10
+
+
+def create_callback_query(bot: Bot, callback_data: ConcertsPageCallbackData) -> CallbackQuery:
+    user = User(id=USER_ID, is_bot=False, first_name='user')
+    message = Message(message_id=KEYBOARD_ID, date=datetime.datetime.now(), chat=Chat(id=USER_ID, type='private'),
+                      text='page').as_(bot)
+    return CallbackQuery(id='1', from_user=user, chat_instance='1', message=message,
+                         data=callback_data.pack()).as_(bot)
+
+
+async def turn_page(initial_state: State, version: Optional[str] = None) -> tuple[list[type], Optional[str], dict]:
+    session = RecordingSession()
+    bot = Bot(token='42:TEST', session=session)
+    concert_pages = ConcertPages(fakeredis.aioredis.FakeRedis(), page_size=1)
+    generation = await concert_pages.save(USER_ID, ['first', 'second'])
+    state = FSMContext(MemoryStorage(), StorageKey(bot_id=bot.id, chat_id=USER_ID, user_id=USER_ID))
+    await state.set_state(initial_state)
+
+    callback_data = ConcertsPageCallbackData(page=1, pages=2, version=version or generation)
+    await show_concerts_page(create_callback_query(bot, callback_data), callback_data, state, initial_state.state,
+                             concert_pages)
+    return [type(request) for request in session.requests], await state.get_state(), await state.get_data()
+
+
+def test_page_is_shown_from_menu_state() -> None:
+    requests, state, data = asyncio.run(turn_page(MenuStates.MAIN_MENU))
+
+    assert requests == [AnswerCallbackQuery, EditMessageText]
+    assert state == MenuStates.CONCERTS_SHOW.state
+    assert data == {'last_keyboard_id': KEYBOARD_ID}
+
+
+def test_registration_is_not_interrupted_by_page_button() -> None:
+    requests, state, data = asyncio.run(turn_page(RegistrationStates.ADD_LINK))
+
+    assert requests == [AnswerCallbackQuery]
+    assert state == RegistrationStates.ADD_LINK.state
+    assert data == {}
+
+
+def test_outdated_list_is_closed_only_from_menu_state() -> None:
+    requests, state, data = asyncio.run(turn_page(MenuStates.CONCERTS_SHOW, version='outdated'))
+
+    assert requests == [AnswerCallbackQuery, EditMessageText]
+    assert state == MenuStates.MAIN_MENU.state
+    assert data == {'last_keyboard_id': KEYBOARD_ID}
+
+
+def test_pages_are_read_from_list_until_it_is_replaced() -> None:
+    async def run() -> list[list[str]]:
+        concert_pages = ConcertPages(fakeredis.aioredis.FakeRedis(), page_size=2)
+        generation = await concert_pages.save(USER_ID, ['first', 'second', 'third'])
+        pages = [await concert_pages.get_page(USER_ID, generation, page) for page in (0, 1)]
+        await concert_pages.save(USER_ID, ['fourth'], previous_generation=generation)
+        return pages + [await concert_pages.get_page(USER_ID, generation, 0)]
+
+    assert asyncio.run(run()) == [['first', 'second'], ['third'], []]
+
+
+def test_page_is_rendered_with_numbers_of_concerts_in_the_list() -> None:
+    concert_pages = ConcertPages(fakeredis.aioredis.FakeRedis(), page_size=2)
+
+    assert concert_pages.get_pages_count(0) == 1
+    assert concert_pages.get_pages_count(3) == 2
+    assert concert_pages.render_page(['third'], 1, 2) == '3\nthird\n\nСтраница 2 из 2'
@@ -0,0 +1,45 @@
+import json
+from typing import Any
+
+import pytest
+
+from services.broker import BrokerEvent
+from services.broker.decoding import decode_event, decode_raw, encode_raw
+
+EVENT: dict[str, Any] = {
+    'user': {'telegram_id': 1, 'creation_datetime': '2024-01-01T00:00:00'},
+    'concerts': [{
+        'title': 'concert',
+        'afisha_url': 'https://afisha.yandex.ru/moscow/concert/concert',
+        'city': 'Москва',
+        'place': None,
+        'address': 'Тверская, 1',
+        'datetime': '2026-12-01T20:00:00',
+        'map_url': None,
+        'min_price': None,
+        'artists': [],
+        'description': 'not declared by the model',
+    }],
+}
+
+
+def test_event_is_decoded_from_json_and_msgpack_alike() -> None:
+    msgpack = pytest.importorskip('msgpack')
+
+    from_json = decode_event(json.dumps(EVENT).encode(), 'application/json', BrokerEvent)
+    from_msgpack = decode_event(msgpack.packb(EVENT), 'application/msgpack', BrokerEvent)
+
+    assert from_json == from_msgpack
+    assert from_json.concerts[0].title == 'concert'
+
+
+@pytest.mark.parametrize('body', [b'{"user": {}', b'{"user": {"telegram_id": 1}, "concerts": []}'])
+def test_invalid_event_raises_value_error(body: bytes) -> None:
+    with pytest.raises(ValueError):
+        decode_event(body, 'application/json', BrokerEvent)
+
+
+def test_raw_payload_is_encoded_back_to_same_content_type() -> None:
+    body = json.dumps(EVENT, ensure_ascii=False).encode()
+
+    assert encode_raw(decode_raw(body, 'application/json'), 'application/json') == body
@@ -0,0 +1,84 @@
+import asyncio
+from datetime import datetime
+from typing import Any
+
+import pytest
+
+import broker_listener
+from bot.fsm_access import FSMAccess
+from model import Concert
+from notifications import DeliveryDedup, DeliveryDedupMode
+from tests.fake_redis import FakeRedis
+
+USER_ID = 1
+
+
+def create_concert(title: str) -> Concert:
+    return Concert.model_validate({
+        'title': title,
+        'afisha_url': f'https://afisha.yandex.ru/moscow/concert/{title}',
+        'city': 'Москва',
+        'place': 'ВТБ Арена',
+        'address': 'Ленинградский проспект, 36',
+        'datetime': datetime(2026, 12, 1, 20, 0).isoformat(),
+        'map_url': None,
+        'min_price': None,
+        'artists': [{'name': title, 'yandex_music_id': 1}],
+    })
+
+
+@pytest.mark.parametrize('mode', [DeliveryDedupMode.EXACT, DeliveryDedupMode.BLOOM])
+def test_concert_is_reserved_by_one_sender_until_released_or_delivered(mode: DeliveryDedupMode) -> None:
+    async def run() -> list[Any]:
+        dedup = DeliveryDedup(FakeRedis(), mode=mode)
+        first, second = create_concert('first'), create_concert('second')
+        results: list[Any] = [
+            await dedup.reserve(USER_ID, [first, second]),
+            # Another sender of a redelivered event.
+            await dedup.reserve(USER_ID, [first, second]),
+            # Concerts being sent are still rendered by the check.
+            await dedup.filter_delivered(USER_ID, [first, second]),
+        ]
+        await dedup.release(USER_ID, [second])
+        await dedup.mark_delivered(USER_ID, [first])
+        results += [
+            await dedup.filter_delivered(USER_ID, [first, second]),
+            await dedup.reserve(USER_ID, [first, second]),
+        ]
+        return [[concert.title for concert in concerts] for concerts in results]
+
+    assert asyncio.run(run()) == [['first', 'second'], [], ['first', 'second'], ['second'], ['second']]
+
+
+def test_concerts_sent_before_failure_are_not_sent_by_retry(monkeypatch: pytest.MonkeyPatch) -> None:
+    redis = FakeRedis()
+    monkeypatch.setattr(broker_listener, 'delivery_dedup', DeliveryDedup(redis))
+    monkeypatch.setattr(broker_listener, 'fsm_access', FSMAccess(redis, broker_listener.bot.id))
+    sent: list[str] = []
+    failing_text: list[str] = []
+
+    async def send_message(chat_id: int, text: str, **kwargs: Any) -> Any:
+        if text in failing_text:
+            failing_text.clear()
+            raise RuntimeError('send failed')
+        sent.append(text)
+        return type('SentMessage', (), {'message_id': len(sent)})()
+
+    monkeypatch.setattr(broker_listener.bot, 'send_message', send_message)
+
+    async def run() -> None:
+        job = await broker_listener.render(USER_ID, [create_concert('first'), create_concert('second')], None)
+        assert job is not None
+        failing_text.append(job.messages[1].text)
+        with pytest.raises(RuntimeError):
+            await broker_listener.send(job)
+        # The event is retried by the broker and rendered again.
+        job = await broker_listener.render(USER_ID, [create_concert('first'), create_concert('second')], None)
+        assert job is not None
+        await broker_listener.send(job)
+
+    asyncio.run(run())
+
+    assert len(sent) == 3
+    assert 'first' in sent[0] and 'second' in sent[1]
+    assert sent[2] == broker_listener.CHOOSE_ACTION_TEXT
@@ -0,0 +1,95 @@
+import asyncio
+
+from notifications import DeliveryJob, DeliveryOutbox, OutgoingMessage
+from tests.fake_redis import FakeRedis, wait_until
+
+
+class TemporaryFailure(Exception):
+    pass
+
+
+def create_job(telegram_id: int, text: str) -> DeliveryJob:
+    return DeliveryJob(telegram_id=telegram_id, last_keyboard_id=None, messages=[OutgoingMessage(text=text)],
+                       concerts=[])
+
+
+async def run_outbox(outbox: DeliveryOutbox, sent: list[str], release: asyncio.Event, count: int) -> None:
+    async def send(job: DeliveryJob) -> None:
+        text = job.messages[0].text
+        if text == 'slow':
+            await release.wait()
+        if text == 'failing':
+            raise TemporaryFailure()
+        sent.append(text)
+
+    task = asyncio.create_task(outbox.run(0, 'consumer', send, retryable_exceptions=(TemporaryFailure,)))
+    try:
+        await wait_until(lambda: len(sent) >= count)
+        await asyncio.sleep(0.05)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+def test_jobs_of_user_are_sent_in_order() -> None:
+    async def run() -> list[str]:
+        outbox = DeliveryOutbox(FakeRedis(), read_timeout=0.05)
+        for telegram_id, text in [(1, 'slow'), (1, 'second of user'), (2, 'other user')]:
+            await outbox.add(create_job(telegram_id, text))
+
+        sent: list[str] = []
+        release = asyncio.Event()
+        asyncio.get_running_loop().call_later(0.1, release.set)
+        await run_outbox(outbox, sent, release, 3)
+        return sent
+
+    assert asyncio.run(run()) == ['other user', 'slow', 'second of user']
+
+
+def test_job_after_retried_job_of_user_is_retried_too() -> None:
+    async def run() -> tuple[list[str], int]:
+        outbox = DeliveryOutbox(FakeRedis(), read_timeout=0.05)
+        for telegram_id, text in [(1, 'failing'), (1, 'second of user'), (2, 'other user')]:
+            await outbox.add(create_job(telegram_id, text))
+
+        sent: list[str] = []
+        await run_outbox(outbox, sent, asyncio.Event(), 1)
+        return sent, await outbox.get_length(0)
+
+    sent, length = asyncio.run(run())
+
+    assert sent == ['other user']
+    assert length == 2
+
+
+def test_adding_waits_while_outbox_is_full() -> None:
+    async def run() -> tuple[bool, list[str]]:
+        outbox = DeliveryOutbox(FakeRedis(), max_length=2, read_timeout=0.05)
+        await outbox.add(create_job(1, 'first'))
+        await outbox.add(create_job(2, 'second'))
+        adding = asyncio.create_task(outbox.add(create_job(3, 'third')))
+        await asyncio.sleep(0.1)
+        waited = not adding.done()
+
+        sent: list[str] = []
+        await run_outbox(outbox, sent, asyncio.Event(), 3)
+        await adding
+        return waited, sent
+
+    waited, sent = asyncio.run(run())
+
+    assert waited
+    assert sent == ['first', 'second', 'third']
+
+
+def test_jobs_are_partitioned_by_user() -> None:
+    async def run() -> list[int]:
+        outbox = DeliveryOutbox(FakeRedis(), partitions_count=4)
+        for telegram_id in range(20):
+            await outbox.add(create_job(telegram_id, 'text'))
+        return [await outbox.get_length(partition) for partition in range(4)]
+
+    lengths = asyncio.run(run())
+
+    assert sum(lengths) == 20
+    assert all(length > 0 for length in lengths)
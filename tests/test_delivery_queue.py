@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from notifications import DeliveryQueue
+
+
+def create_queue(sent: list[str], release: asyncio.Event, events: list[str], senders_count: int = 1,
+                 maxsize: int = 20, high_watermark: int = 8, low_watermark: int = 2) -> DeliveryQueue[str]:
+    async def send(job: str) -> None:
+        await release.wait()
+        if job == 'failing':
+            raise RuntimeError('send failed')
+        sent.append(job)
+
+    queue: DeliveryQueue[str] = DeliveryQueue(send_callback=send, senders_count=senders_count, maxsize=maxsize,
+                                              high_watermark=high_watermark, low_watermark=low_watermark)
+    queue.set_backpressure_callbacks(on_pause=lambda: events.append('pause'),
+                                     on_resume=lambda: events.append('resume'))
+    return queue
+
+
+def test_producers_returning_after_queueing_cross_high_watermark() -> None:
+    async def run() -> tuple[list[str], list[str], bool]:
+        sent: list[str] = []
+        events: list[str] = []
+        release = asyncio.Event()
+        queue = create_queue(sent, release, events)
+        queue.start()
+
+        # One producer queues more jobs than there are producers or senders.
+        futures = [await queue.submit(f'job-{i}') for i in range(12)]
+        paused = queue.get_statistics().paused
+        release.set()
+        await asyncio.gather(*futures)
+        await queue.stop()
+        return sent, events, paused
+
+    sent, events, paused = asyncio.run(run())
+    assert paused
+    assert events == ['pause', 'resume']
+    assert sent == [f'job-{i}' for i in range(12)]
+
+
+def test_jobs_with_lower_priority_value_are_sent_first() -> None:
+    async def run() -> list[str]:
+        sent: list[str] = []
+        release = asyncio.Event()
+        queue = create_queue(sent, release, [])
+        queue.start()
+
+        first = await queue.submit('first', priority=10)
+        # The only sender takes the first job and waits, the rest are ordered by priority.
+        await asyncio.sleep(0)
+        futures = [await queue.submit(job, priority=priority)
+                   for job, priority in [('later', 3), ('nearest', 1), ('near', 2), ('also later', 3)]]
+        release.set()
+        await asyncio.gather(first, *futures)
+        await queue.stop()
+        return sent
+
+    assert asyncio.run(run()) == ['first', 'nearest', 'near', 'later', 'also later']
+
+
+def test_failure_of_sending_is_raised_to_producer() -> None:
+    async def run() -> None:
+        release = asyncio.Event()
+        release.set()
+        queue = create_queue([], release, [])
+        queue.start()
+        with pytest.raises(RuntimeError):
+            await queue.deliver('failing')
+        await queue.deliver('ok')
+        await queue.stop()
+
+    asyncio.run(run())
+
+
+def test_watermarks_are_validated() -> None:
+    with pytest.raises(ValueError):
+        create_queue([], asyncio.Event(), [], maxsize=10, high_watermark=20, low_watermark=2)
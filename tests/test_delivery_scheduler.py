@@ -0,0 +1,58 @@
+import asyncio
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from notifications import DeliveryJob, DeliveryScheduler, OutgoingMessage
+from tests.fake_redis import FakeRedis, wait_until
+
+
+def create_job(telegram_id: int, text: str) -> DeliveryJob:
+    return DeliveryJob(telegram_id=telegram_id, last_keyboard_id=None, messages=[OutgoingMessage(text=text)],
+                       concerts=[])
+
+
+def test_jobs_are_sent_with_limited_concurrency_and_one_by_one_for_user() -> None:
+    async def run() -> tuple[int, list[tuple[int, str]]]:
+        scheduler = DeliveryScheduler(FakeRedis(), window=0, rate=1000, concurrency=3, poll_interval=0.01)
+        for telegram_id in range(1, 6):
+            for text in ['first', 'second']:
+                await scheduler.schedule(create_job(telegram_id, text))
+
+        sending_users: set[int] = set()
+        max_sending = 0
+        sent: list[tuple[int, str]] = []
+
+        async def send(job: DeliveryJob) -> None:
+            nonlocal max_sending
+            assert job.telegram_id not in sending_users
+            sending_users.add(job.telegram_id)
+            max_sending = max(max_sending, len(sending_users))
+            await asyncio.sleep(0.02)
+            sending_users.discard(job.telegram_id)
+            sent.append((job.telegram_id, job.messages[0].text))
+
+        task = asyncio.create_task(scheduler.run(send))
+        try:
+            await wait_until(lambda: len(sent) == 10)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        return max_sending, sent
+
+    max_sending, sent = asyncio.run(run())
+
+    assert max_sending <= 3
+    assert sorted(sent) == [(telegram_id, text) for telegram_id in range(1, 6) for text in ['first', 'second']]
+
+
+def test_job_is_sent_out_of_quiet_hours_of_every_city_of_concerts() -> None:
+    scheduler = DeliveryScheduler(FakeRedis(), window=0, rate=1, quiet_hours_start=23, quiet_hours_end=9,
+                                  city_timezones={'Москва': 'Europe/Moscow', 'Владивосток': 'Asia/Vladivostok'})
+    moscow = ZoneInfo('Europe/Moscow')
+    # 05:30 in Vladivostok, quiet hours there end at 02:00 in Moscow, within quiet hours of Moscow.
+    now = datetime(2026, 12, 1, 22, 30, tzinfo=moscow).timestamp()
+
+    send_at = datetime.fromtimestamp(scheduler.get_send_time(now, ['Москва', 'Владивосток']), tz=moscow)
+
+    assert send_at == datetime(2026, 12, 2, 9, 0, tzinfo=moscow)
+    assert scheduler.get_send_time(now, ['Москва']) == now
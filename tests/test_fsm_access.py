@@ -0,0 +1,41 @@
+import asyncio
+from typing import Any, Optional
+
+import fakeredis.aioredis
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.redis import RedisStorage
+
+from bot.fsm_access import FSMAccess
+
+
+class FlowStates(StatesGroup):
+    A = State()
+    B = State()
+
+
+def test_data_of_many_users_is_read_at_once() -> None:
+    async def run() -> list[Optional[dict[str, Any]]]:
+        storage = RedisStorage(redis=fakeredis.aioredis.FakeRedis())
+        fsm_access = FSMAccess.from_storage(storage, 42)
+        await storage.set_data(fsm_access.get_user_key(1), {'last_keyboard_id': 1})
+        await storage.set_data(fsm_access.get_user_key(3), {'last_keyboard_id': 3})
+        return await fsm_access.get_data_many([fsm_access.get_user_key(telegram_id) for telegram_id in (1, 2, 3)])
+
+    assert asyncio.run(run()) == [{'last_keyboard_id': 1}, None, {'last_keyboard_id': 3}]
+
+
+def test_update_sets_state_only_when_it_is_given() -> None:
+    async def run() -> list[Any]:
+        storage = RedisStorage(redis=fakeredis.aioredis.FakeRedis())
+        fsm_access = FSMAccess.from_storage(storage, 42)
+        key = fsm_access.get_user_key(1)
+        await storage.set_state(key, FlowStates.A)
+        await storage.set_data(key, {'cities': ['Москва']})
+
+        await fsm_access.update(key, last_keyboard_id=1)
+        results: list[Any] = [await storage.get_state(key)]
+        await fsm_access.update(key, state=FlowStates.B, last_keyboard_id=2)
+        return results + [await storage.get_state(key), await storage.get_data(key)]
+
+    assert asyncio.run(run()) == [FlowStates.A.state, FlowStates.B.state,
+                                  {'cities': ['Москва'], 'last_keyboard_id': 2}]
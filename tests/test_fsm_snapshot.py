@@ -0,0 +1,142 @@
+import asyncio
+import datetime
+from typing import Any
+
+import fakeredis.aioredis
+from aiogram import Bot, Dispatcher
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.redis import RedisStorage
+from aiogram.types import Chat, Message, Update, User
+
+from bot.fsm_access import FSMAccess
+from bot.fsm_snapshot import FSMSnapshotMiddleware, SnapshotFSMContext
+from bot.handlers.user_ordering import UserEventIsolation
+
+
+class FlowStates(StatesGroup):
+    A = State()
+    B = State()
+
+
+def create_update(update_id: int, user_id: int = 1) -> Update:
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id,
+        date=datetime.datetime.now(),
+        chat=Chat(id=user_id, type='private'),
+        from_user=User(id=user_id, is_bot=False, first_name='user'),
+        text='tap',
+    ))
+
+
+def create_dispatcher(storage: RedisStorage) -> Dispatcher:
+    isolation = UserEventIsolation()
+    dp = Dispatcher(storage=storage, events_isolation=isolation, disable_fsm=True)
+    dp.fsm = FSMSnapshotMiddleware(storage=storage, events_isolation=isolation)
+    dp.update.outer_middleware(dp.fsm)
+    return dp
+
+
+def test_handlers_see_state_of_previous_update() -> None:
+    async def run() -> list[tuple[str, str]]:
+        handled: list[tuple[str, str]] = []
+        dp = create_dispatcher(RedisStorage(redis=fakeredis.aioredis.FakeRedis()))
+
+        @dp.message(FlowStates.A)
+        async def handle_a(message: Message, state: FSMContext) -> None:
+            handled.append(('A', await state.get_state()))
+            await asyncio.sleep(0.05)
+            await state.set_state(FlowStates.B)
+
+        @dp.message(FlowStates.B)
+        async def handle_b(message: Message, state: FSMContext) -> None:
+            handled.append(('B', await state.get_state()))
+
+        bot = Bot(token='42:TEST')
+        await dp.fsm.get_context(bot, chat_id=1, user_id=1).set_state(FlowStates.A)
+        await asyncio.gather(dp.feed_update(bot, create_update(1)), dp.feed_update(bot, create_update(2)))
+        await bot.session.close()
+        return handled
+
+    assert asyncio.run(run()) == [('A', FlowStates.A.state), ('B', FlowStates.B.state)]
+
+
+def test_flush_keeps_fields_changed_outside_of_handler() -> None:
+    async def run() -> dict:
+        storage = RedisStorage(redis=fakeredis.aioredis.FakeRedis())
+        dp = create_dispatcher(storage)
+        bot = Bot(token='42:TEST')
+        context = dp.fsm.get_context(bot, chat_id=1, user_id=1)
+        await context.set_state(FlowStates.A)
+        await context.set_data({'last_keyboard_id': 1, 'cities': ['Москва']})
+
+        @dp.message(FlowStates.A)
+        async def handle_a(message: Message, state: FSMContext) -> None:
+            assert isinstance(state, SnapshotFSMContext)
+            assert (await state.get_data())['cities'] == ['Москва']
+            # Broker listener replaces the keyboard while the handler runs.
+            await FSMAccess.from_storage(storage, bot.id).update(context.key, last_keyboard_id=2)
+            await state.update_data(cities=['Москва', 'Казань'])
+            await state.set_state(FlowStates.B)
+
+        await dp.feed_update(bot, create_update(1))
+        await bot.session.close()
+        assert await context.get_state() == FlowStates.B.state
+        return await context.get_data()
+
+    assert asyncio.run(run()) == {'last_keyboard_id': 2, 'cities': ['Москва', 'Казань']}
+
+
+def test_update_reads_and_writes_fsm_with_one_request_each() -> None:
+    async def run() -> list[int]:
+        redis = fakeredis.aioredis.FakeRedis()
+        storage = RedisStorage(redis=redis)
+        dp = create_dispatcher(storage)
+        bot = Bot(token='42:TEST')
+        await dp.fsm.get_context(bot, chat_id=1, user_id=1).set_state(FlowStates.A)
+
+        @dp.message(FlowStates.A)
+        async def handle_a(message: Message, state: FSMContext) -> None:
+            await state.update_data(last_keyboard_id=message.message_id)
+
+        requests_counts: list[int] = []
+        get_connection = redis.connection_pool.get_connection
+
+        async def count_request(*args: Any, **kwargs: Any) -> Any:
+            requests_counts[-1] += 1
+            return await get_connection(*args, **kwargs)
+
+        redis.connection_pool.get_connection = count_request
+        # Scripts are loaded to redis by the first update.
+        for update_id in range(1, 3):
+            requests_counts.append(0)
+            await dp.feed_update(bot, create_update(update_id))
+        await bot.session.close()
+        return requests_counts
+
+    assert asyncio.run(run())[-1] == 2
+
+
+def test_update_keeps_empty_lists_and_big_integers() -> None:
+    async def run() -> dict:
+        storage = RedisStorage(redis=fakeredis.aioredis.FakeRedis())
+        fsm_access = FSMAccess.from_storage(storage, 42)
+        key = fsm_access.get_user_key(1)
+        await storage.set_data(key, {'cities': [], 'concerts_generation': 2 ** 60 + 1})
+        await fsm_access.update(key, state=FlowStates.B, last_keyboard_id=3)
+        return await storage.get_data(key)
+
+    assert asyncio.run(run()) == {'cities': [], 'concerts_generation': 2 ** 60 + 1, 'last_keyboard_id': 3}
+
+
+def test_merge_into_outdated_data_is_retried_with_current_data() -> None:
+    async def run() -> dict:
+        storage = RedisStorage(redis=fakeredis.aioredis.FakeRedis())
+        fsm_access = FSMAccess.from_storage(storage, 42)
+        key = fsm_access.get_user_key(1)
+        await storage.set_data(key, {'last_keyboard_id': 2})
+        # Data was read before the broker listener replaced the keyboard.
+        await fsm_access.merge(key, {'cities': ['Москва']}, raw_data='{"last_keyboard_id": 1}')
+        return await storage.get_data(key)
+
+    assert asyncio.run(run()) == {'last_keyboard_id': 2, 'cities': ['Москва']}
@@ -0,0 +1,118 @@
+import asyncio
+import datetime
+
+from aiogram.types import Chat, Message, Update, User
+
+from bot.ingestion import UpdateQueue
+from services.broker import get_shard
+from tests.fake_redis import FakeRedis, wait_until
+
+PARTITIONS_COUNT = 4
+
+
+def create_update(update_id: int, chat_id: int) -> Update:
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id,
+        date=datetime.datetime.now(),
+        chat=Chat(id=chat_id, type='private'),
+        from_user=User(id=chat_id, is_bot=False, first_name='user'),
+        text=str(update_id),
+    ))
+
+
+def get_chats_of_different_partitions() -> tuple[int, int]:
+    first_chat = 1
+    second_chat = next(chat_id for chat_id in range(2, 100)
+                       if get_shard(chat_id, PARTITIONS_COUNT) != get_shard(first_chat, PARTITIONS_COUNT))
+    return first_chat, second_chat
+
+
+def test_partitions_are_read_at_once_and_handled_concurrently() -> None:
+    slow_chat, fast_chat = get_chats_of_different_partitions()
+
+    async def run() -> tuple[list[tuple[int, int]], list[list[str]]]:
+        redis = FakeRedis()
+        update_queue = UpdateQueue(redis, PARTITIONS_COUNT, read_timeout=0.05)
+        handled: list[tuple[int, int]] = []
+        slow_update_handled = asyncio.Event()
+
+        async def on_update(update: Update) -> None:
+            if update.update_id == 1:
+                # Updates of another partition are handled while this one waits.
+                await slow_update_handled.wait()
+            handled.append((update.message.chat.id, update.update_id))
+            if update.update_id == 4:
+                slow_update_handled.set()
+
+        for update_id, chat_id in enumerate([slow_chat, slow_chat, fast_chat, fast_chat], start=1):
+            await update_queue.publish(create_update(update_id, chat_id))
+
+        stopped = asyncio.Event()
+        consuming = asyncio.create_task(update_queue.consume(0, 1, on_update, stopped))
+        await wait_until(lambda: len(handled) == 4)
+        stopped.set()
+        await consuming
+        return handled, redis.reads
+
+    handled, reads = asyncio.run(run())
+
+    assert handled == [(fast_chat, 3), (fast_chat, 4), (slow_chat, 1), (slow_chat, 2)]
+    assert all(len(streams) == PARTITIONS_COUNT for streams in reads)
+
+
+def test_updates_taken_before_restart_are_handled_first() -> None:
+    chat_id = 1
+
+    async def run() -> tuple[list[int], int]:
+        redis = FakeRedis()
+        update_queue = UpdateQueue(redis, PARTITIONS_COUNT, read_timeout=0.05)
+        handled: list[int] = []
+
+        async def on_update(update: Update) -> None:
+            handled.append(update.update_id)
+
+        for update_id in range(1, 4):
+            await update_queue.publish(create_update(update_id, chat_id))
+        # The worker took the updates and stopped before handling them.
+        stream_key = f'bot-updates:{get_shard(chat_id, PARTITIONS_COUNT)}'
+        await redis.xgroup_create(stream_key, 'bot-workers', id='0', mkstream=True)
+        await redis.xreadgroup('bot-workers', 'worker-0', {stream_key: '>'}, count=2)
+        await update_queue.publish(create_update(4, chat_id))
+
+        stopped = asyncio.Event()
+        consuming = asyncio.create_task(update_queue.consume(0, 1, on_update, stopped))
+        await wait_until(lambda: len(handled) == 4)
+        stopped.set()
+        await consuming
+        return handled, await redis.xlen(stream_key)
+
+    handled, left_count = asyncio.run(run())
+
+    assert handled == [1, 2, 3, 4]
+    assert left_count == 0
+
+
+def test_stop_leaves_unhandled_updates_in_partition() -> None:
+    chat_id = 1
+
+    async def run() -> tuple[list[int], int]:
+        redis = FakeRedis()
+        update_queue = UpdateQueue(redis, PARTITIONS_COUNT, read_timeout=0.05)
+        handled: list[int] = []
+        stopped = asyncio.Event()
+
+        async def on_update(update: Update) -> None:
+            # The worker is stopped while the first update is handled.
+            stopped.set()
+            await asyncio.sleep(0.05)
+            handled.append(update.update_id)
+
+        for update_id in range(1, 4):
+            await update_queue.publish(create_update(update_id, chat_id))
+        await update_queue.consume(0, 1, on_update, stopped)
+        return handled, await redis.xlen(f'bot-updates:{get_shard(chat_id, PARTITIONS_COUNT)}')
+
+    handled, left_count = asyncio.run(run())
+
+    assert handled == [1]
+    assert left_count == 2
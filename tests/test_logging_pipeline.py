@@ -0,0 +1,64 @@
+import asyncio
+import datetime
+import logging
+from typing import Optional
+
+import pytest
+from aiogram import Bot
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import CallbackQuery, Chat, Message, User
+
+from bot.handlers.menu_handlers import go_to_menu
+from bot.keyboards import KeyboardCallbackData
+from bot.states import MenuStates
+from logging_pipeline import UserDebugSamplingFilter, is_user_sampled, set_log_user
+from settings import settings
+from tests.fake_bot import RecordingSession
+
+
+class CountingStorage(MemoryStorage):
+    get_state_count: int = 0
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        self.get_state_count += 1
+        return await super().get_state(key)
+
+
+def create_record(level: int) -> logging.LogRecord:
+    return logging.LogRecord('bot', level, __file__, 1, 'message %s', ('argument',), None)
+
+
+def test_handler_logs_state_from_middleware_without_reading_storage(caplog: pytest.LogCaptureFixture) -> None:
+    async def run() -> int:
+        bot = Bot(token='42:TEST', session=RecordingSession())
+        storage = CountingStorage()
+        state = FSMContext(storage, StorageKey(bot_id=bot.id, chat_id=1, user_id=1))
+        message = Message(message_id=10, date=datetime.datetime.now(), chat=Chat(id=1, type='private'),
+                          text='menu').as_(bot)
+        callback_query = CallbackQuery(id='1', from_user=User(id=1, is_bot=False, first_name='user'),
+                                       chat_instance='1', message=message, data=KeyboardCallbackData.BACK).as_(bot)
+        await go_to_menu(callback_query, state, MenuStates.HELP.state)
+        return storage.get_state_count
+
+    with caplog.at_level(logging.INFO, logger='bot'):
+        get_state_count = asyncio.run(run())
+
+    assert get_state_count == 0
+    assert f'on state:{MenuStates.HELP.state} for go_to_menu' in caplog.text
+
+
+def test_debug_records_are_dropped_only_for_users_not_sampled(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, 'log_debug_sample_rate', 0.0)
+    sampling_filter = UserDebugSamplingFilter()
+
+    set_log_user(1)
+    try:
+        assert not sampling_filter.filter(create_record(logging.DEBUG))
+        assert sampling_filter.filter(create_record(logging.INFO))
+    finally:
+        set_log_user(None)
+    # Records written outside of updates and events are not sampled.
+    assert sampling_filter.filter(create_record(logging.DEBUG))
+    assert is_user_sampled(None)
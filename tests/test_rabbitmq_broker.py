@@ -0,0 +1,456 @@
+import asyncio
+import json
+from typing import Any, Optional
+
+import pytest
+
+from services.broker import (BroadcastEvent, BrokerEvent, BrokerRetryableException, BROADCAST_EVENT_TYPE, get_shard,
+                            get_shard_queue_name)
+from services.broker.impl import rabbitmq_broker
+from services.broker.impl.rabbitmq_broker import RabbitMQBroker
+from tests.fake_amqp import FakeAMQP, FakeChannel
+
+QUEUE_NAME = 'events'
+
+
+def create_event_body(telegram_id: int, title: str = 'concert') -> bytes:
+    return json.dumps({
+        'user': {'telegram_id': telegram_id, 'creation_datetime': '2024-01-01T00:00:00'},
+        'concerts': [{
+            'title': title,
+            'afisha_url': f'https://afisha.yandex.ru/moscow/concert/{title}',
+            'city': 'Москва',
+            'place': None,
+            'address': 'Тверская, 1',
+            'datetime': '2026-12-01T20:00:00',
+            'map_url': None,
+            'min_price': None,
+            'artists': [],
+        }],
+    }).encode()
+
+
+def create_broadcast_body(telegram_ids: list[int]) -> bytes:
+    event = json.loads(create_event_body(0))
+    return json.dumps({'telegram_ids': telegram_ids, 'concerts': event['concerts']}).encode()
+
+
+async def start_broker(amqp: FakeAMQP, monkeypatch: pytest.MonkeyPatch, listen: Any, **kwargs: Any) \
+        -> tuple[RabbitMQBroker, asyncio.Task[None]]:
+    monkeypatch.setattr(rabbitmq_broker, 'Connection', amqp.connect)
+    broker = RabbitMQBroker(**kwargs)
+    await broker.connect(queue_name=QUEUE_NAME, user_name='user', password='password', host='localhost', port=5672)
+    return broker, asyncio.create_task(listen(broker))
+
+
+async def on_error(exception: Exception) -> None:
+    raise AssertionError(f'Unexpected broker error: {exception}')
+
+
+async def wait_until(condition: Any, timeout: float = 1) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError('Condition is not met in time')
+        await asyncio.sleep(0.001)
+
+
+async def stop(task: asyncio.Task[None]) -> None:
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+def test_message_is_acknowledged_when_its_completion_is_done(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def run() -> None:
+        amqp = FakeAMQP()
+        completions: dict[int, asyncio.Future[None]] = {}
+        handled: list[int] = []
+
+        async def on_message(event: BrokerEvent) -> Optional[asyncio.Future[None]]:
+            handled.append(event.user.telegram_id)
+            completions[event.user.telegram_id] = asyncio.get_running_loop().create_future()
+            return completions[event.user.telegram_id]
+
+        _, task = await start_broker(amqp, monkeypatch, lambda broker: broker.start_listening(on_message, on_error),
+                                     prefetch_count=10, workers_count=1)
+        for telegram_id in (1, 2, 3):
+            amqp.put(QUEUE_NAME, create_event_body(telegram_id))
+
+        # The only worker takes events of other users while completion of the first one is pending.
+        await wait_until(lambda: len(handled) == 3)
+        assert amqp.acked == []
+
+        completions[2].set_result(None)
+        await wait_until(lambda: len(amqp.acked) == 1)
+        assert json.loads(amqp.acked[0].body)['user']['telegram_id'] == 2
+
+        completions[1].set_result(None)
+        completions[3].set_result(None)
+        await wait_until(lambda: len(amqp.acked) == 3)
+        await stop(task)
+
+    asyncio.run(run())
+
+
+def test_next_event_of_user_waits_for_completion_of_previous_one(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def run() -> None:
+        amqp = FakeAMQP()
+        completions: list[asyncio.Future[None]] = []
+        handled: list[str] = []
+
+        async def on_message(event: BrokerEvent) -> asyncio.Future[None]:
+            handled.append(event.concerts[0].title)
+            completions.append(asyncio.get_running_loop().create_future())
+            return completions[-1]
+
+        _, task = await start_broker(amqp, monkeypatch, lambda broker: broker.start_listening(on_message, on_error),
+                                     prefetch_count=10, workers_count=1)
+        amqp.put(QUEUE_NAME, create_event_body(1, 'first'))
+        amqp.put(QUEUE_NAME, create_event_body(1, 'second'))
+
+        await wait_until(lambda: len(handled) == 1)
+        await asyncio.sleep(0.01)
+        assert handled == ['first']
+
+        completions[0].set_result(None)
+        await wait_until(lambda: handled == ['first', 'second'])
+        completions[1].set_result(None)
+        await wait_until(lambda: len(amqp.acked) == 2)
+        await stop(task)
+
+    asyncio.run(run())
+
+
+def test_event_waiting_for_previous_event_of_user_does_not_hold_other_users(
+        monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async def run() -> None:
+        amqp = FakeAMQP()
+        completions: dict[str, asyncio.Future[None]] = {}
+        handled: list[str] = []
+
+        async def on_message(event: BrokerEvent) -> asyncio.Future[None]:
+            title = event.concerts[0].title
+            handled.append(title)
+            completions[title] = asyncio.get_running_loop().create_future()
+            return completions[title]
+
+        # Both users are handled by the only worker.
+        _, task = await start_broker(amqp, monkeypatch, lambda broker: broker.start_listening(on_message, on_error),
+                                     prefetch_count=10, workers_count=1)
+        amqp.put(QUEUE_NAME, create_event_body(1, 'a1'))
+        amqp.put(QUEUE_NAME, create_event_body(1, 'a2'))
+        amqp.put(QUEUE_NAME, create_event_body(2, 'b1'))
+
+        await wait_until(lambda: handled == ['a1', 'b1'])
+        completions['b1'].set_result(None)
+        await wait_until(lambda: len(amqp.acked) == 1)
+        assert handled == ['a1', 'b1']
+
+        completions['a1'].set_result(None)
+        await wait_until(lambda: handled == ['a1', 'b1', 'a2'])
+        completions['a2'].set_result(None)
+        await wait_until(lambda: len(amqp.acked) == 3)
+        assert [json.loads(body)['concerts'][0]['title'] for body in amqp.get_acked_bodies()] == ['b1', 'a1', 'a2']
+        await stop(task)
+
+    asyncio.run(run())
+
+
+def test_failed_completion_is_retried(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def run() -> None:
+        amqp = FakeAMQP()
+
+        async def fail() -> None:
+            raise BrokerRetryableException('telegram is unavailable')
+
+        async def on_message(event: BrokerEvent) -> Any:
+            return fail()
+
+        _, task = await start_broker(amqp, monkeypatch, lambda broker: broker.start_listening(on_message, on_error),
+                                     prefetch_count=10, workers_count=1, max_retries=2)
+        amqp.put(QUEUE_NAME, create_event_body(1))
+        await wait_until(lambda: len(amqp.acked) == 1)
+        retried = amqp.get_published(f'{QUEUE_NAME}.retry.5000ms')
+        assert len(retried) == 1
+        assert retried[0].headers['x-retry-count'] == 1
+        await stop(task)
+
+    asyncio.run(run())
+
+
+def test_stopping_waits_for_pending_completions(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def run() -> None:
+        amqp = FakeAMQP()
+
+        async def complete_later() -> None:
+            await asyncio.sleep(0.05)
+
+        async def on_message(event: BrokerEvent) -> Any:
+            return complete_later()
+
+        _, task = await start_broker(amqp, monkeypatch, lambda broker: broker.start_listening(on_message, on_error),
+                                     prefetch_count=10, workers_count=1)
+        amqp.put(QUEUE_NAME, create_event_body(1))
+        await asyncio.sleep(0.01)
+        await stop(task)
+        assert len(amqp.acked) == 1
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize('message_id, handled_count', [('event-1', 1), (None, 2)])
+def test_redelivered_message_is_not_handled_again_only_when_it_has_id(
+        monkeypatch: pytest.MonkeyPatch, message_id: Optional[str], handled_count: int
+) -> None:
+    async def run() -> int:
+        amqp = FakeAMQP()
+        handled: list[int] = []
+
+        async def on_message(event: BrokerEvent) -> None:
+            handled.append(event.user.telegram_id)
+            if len(handled) == 1:
+                # Channel is lost while the message is handled, so its acknowledgement fails.
+                amqp.channels[-1].is_closed = True
+                amqp.channels.append(FakeChannel(amqp))
+
+        _, task = await start_broker(amqp, monkeypatch, lambda broker: broker.start_listening(on_message, on_error),
+                                     prefetch_count=10, workers_count=1)
+        amqp.put(QUEUE_NAME, create_event_body(1), message_id=message_id)
+        await wait_until(lambda: len(handled) == 1)
+        await asyncio.sleep(0.01)
+        assert amqp.acked == []
+
+        amqp.put(QUEUE_NAME, create_event_body(1), message_id=message_id, redelivered=True)
+        await wait_until(lambda: len(amqp.acked) == 1)
+        await stop(task)
+        return len(handled)
+
+    assert asyncio.run(run()) == handled_count
+
+
+def test_batch_of_priority_messages_does_not_acknowledge_buffered_messages(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def run() -> None:
+        amqp = FakeAMQP()
+        batches: list[list[str]] = []
+        releases: list[asyncio.Event] = []
+
+        async def on_batch(events: list[BrokerEvent]) -> None:
+            batches.append([event.concerts[0].title for event in events])
+            releases.append(asyncio.Event())
+            await releases[-1].wait()
+
+        monkeypatch.setattr(rabbitmq_broker, 'Connection', amqp.connect)
+        broker = RabbitMQBroker(prefetch_count=10, workers_count=1)
+        await broker.connect(queue_name=QUEUE_NAME, user_name='user', password='password', host='localhost',
+                             port=5672, priority_queue_name='urgent')
+        task = asyncio.create_task(broker.start_batch_listening(on_batch, on_error, batch_size=2, max_wait=0.01))
+        for telegram_id, title in enumerate(['n1', 'n2', 'n3', 'n4']):
+            amqp.put(QUEUE_NAME, create_event_body(telegram_id, title))
+        await wait_until(lambda: len(batches) == 1)
+
+        # Urgent messages get higher delivery tags than buffered messages of the main queue.
+        amqp.put('urgent', create_event_body(10, 'p1'))
+        amqp.put('urgent', create_event_body(11, 'p2'))
+        await asyncio.sleep(0.01)
+        releases[0].set()
+        await wait_until(lambda: len(batches) == 2)
+        assert batches[1] == ['p1', 'p2']
+
+        releases[1].set()
+        await wait_until(lambda: len(batches) == 3)
+        acked_titles = [json.loads(body)['concerts'][0]['title'] for body in amqp.get_acked_bodies()]
+        assert sorted(acked_titles) == ['n1', 'n2', 'p1', 'p2']
+
+        releases[2].set()
+        await wait_until(lambda: len(amqp.acked) == 6)
+        assert not amqp.channels[-1].is_closed
+        await stop(task)
+
+    asyncio.run(run())
+
+
+def test_retry_queues_are_declared_again_after_change_of_delay(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def run() -> None:
+        amqp = FakeAMQP()
+
+        async def on_message(event: BrokerEvent) -> None:
+            pass
+
+        for retry_base_delay in (5, 10):
+            _, task = await start_broker(amqp, monkeypatch,
+                                         lambda broker: broker.start_listening(on_message, on_error),
+                                         max_retries=2, retry_base_delay=retry_base_delay)
+            await wait_until(lambda: f'{QUEUE_NAME}.retry.{retry_base_delay * 2000}ms' in amqp.queues)
+            await stop(task)
+
+        assert amqp.queues[f'{QUEUE_NAME}.retry.10000ms'].arguments['x-message-ttl'] == 10000
+        assert amqp.queues[f'{QUEUE_NAME}.retry.20000ms'].arguments['x-message-ttl'] == 20000
+        assert not any(channel.is_closed for channel in amqp.channels)
+
+    asyncio.run(run())
+
+
+def test_dead_letters_are_replayed_without_retry_headers(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def run() -> int:
+        amqp = FakeAMQP()
+        monkeypatch.setattr(rabbitmq_broker, 'Connection', amqp.connect)
+        broker = RabbitMQBroker(max_retries=2)
+        await broker.connect(queue_name=QUEUE_NAME, user_name='user', password='password', host='localhost',
+                             port=5672)
+        for telegram_id in (1, 2, 3):
+            amqp.put(f'{QUEUE_NAME}.dead-letter', create_event_body(telegram_id),
+                     headers={'x-retry-count': 2, 'x-error': 'telegram is unavailable', 'x-trace': 'kept'})
+
+        with pytest.raises(ValueError):
+            await broker.replay_dead_letters(rate=0)
+        replayed_count = await broker.replay_dead_letters(rate=1000, limit=2)
+
+        replayed = amqp.get_published(QUEUE_NAME)
+        assert [message.headers for message in replayed] == [{'x-trace': 'kept'}, {'x-trace': 'kept'}]
+        assert amqp.queues[f'{QUEUE_NAME}.dead-letter'].messages.qsize() == 1
+        return replayed_count
+
+    assert asyncio.run(run()) == 2
+
+
+def test_events_of_different_users_are_handled_concurrently_and_of_one_user_in_order(
+        monkeypatch: pytest.MonkeyPatch
+) -> None:
+    async def run() -> None:
+        amqp = FakeAMQP()
+        handling: set[int] = set()
+        overlapped: list[tuple[int, int]] = []
+        handled: list[tuple[int, str]] = []
+
+        async def on_message(event: BrokerEvent) -> None:
+            telegram_id = event.user.telegram_id
+            assert telegram_id not in handling
+            overlapped.extend((telegram_id, other) for other in handling)
+            handling.add(telegram_id)
+            await asyncio.sleep(0.02)
+            handling.discard(telegram_id)
+            handled.append((telegram_id, event.concerts[0].title))
+
+        broker, task = await start_broker(amqp, monkeypatch,
+                                          lambda broker: broker.start_listening(on_message, on_error),
+                                          prefetch_count=10, workers_count=2)
+        for title in ('first', 'second', 'third'):
+            for telegram_id in (1, 2):
+                amqp.put(QUEUE_NAME, create_event_body(telegram_id, title))
+        await wait_until(lambda: broker.get_statistics().in_flight_count > 0)
+        await wait_until(lambda: len(amqp.acked) == 6)
+        await stop(task)
+
+        assert amqp.channels[-1].prefetch_count == 10
+        assert len(overlapped) > 0
+        for telegram_id in (1, 2):
+            assert [title for user, title in handled if user == telegram_id] == ['first', 'second', 'third']
+        statistics = broker.get_statistics()
+        assert statistics.processed_count == 6
+        assert statistics.in_flight_count == 0
+        assert statistics.max_processing_time >= 0.02
+
+    asyncio.run(run())
+
+
+def test_listening_is_resumed_after_connection_is_lost(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def run() -> None:
+        amqp = FakeAMQP()
+        completions: list[asyncio.Future[None]] = []
+        handled: list[str] = []
+
+        async def on_message(event: BrokerEvent) -> Optional[asyncio.Future[None]]:
+            handled.append(event.concerts[0].title)
+            completions.append(asyncio.get_running_loop().create_future())
+            return completions[-1]
+
+        broker, task = await start_broker(amqp, monkeypatch,
+                                          lambda broker: broker.start_listening(on_message, on_error),
+                                          prefetch_count=10, workers_count=1, robust=True,
+                                          reconnect_base_delay=0.02, reconnect_max_delay=0.02)
+        amqp.put(QUEUE_NAME, create_event_body(1, 'first'), message_id='first')
+        await wait_until(lambda: len(handled) == 1)
+
+        amqp.refused_connects = 1
+        amqp.disconnect()
+        # Completion of the message handled before the loss can't be acknowledged on the lost channel.
+        completions[0].set_result(None)
+        amqp.put(QUEUE_NAME, create_event_body(1, 'first'), message_id='first', redelivered=True)
+        amqp.put(QUEUE_NAME, create_event_body(1, 'second'), message_id='second')
+        await wait_until(lambda: len(handled) == 2)
+        completions[1].set_result(None)
+        await wait_until(lambda: len(amqp.acked) == 2)
+        await stop(task)
+
+        assert handled == ['first', 'second']
+        assert [message.message_id for message in amqp.acked] == ['first', 'second']
+        statistics = broker.get_statistics()
+        assert statistics.reconnect_count == 1
+        # The first reconnection attempt is refused.
+        assert len(amqp.connections) == 3
+        assert statistics.last_downtime > 0
+
+    asyncio.run(run())
+
+
+def test_events_are_routed_to_shard_queues_of_their_users(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def run() -> None:
+        amqp = FakeAMQP()
+        _, task = await start_broker(amqp, monkeypatch, lambda broker: broker.start_routing(2, on_error))
+        events = [(telegram_id, title) for title in ('first', 'second') for telegram_id in range(1, 6)]
+        for telegram_id, title in events:
+            amqp.put(QUEUE_NAME, create_event_body(telegram_id, title))
+        await wait_until(lambda: len(amqp.acked) == len(events))
+        await stop(task)
+
+        for shard in (0, 1):
+            published = amqp.get_published(get_shard_queue_name(QUEUE_NAME, shard))
+            routed = [json.loads(message.body) for message in published]
+            routed_events = [(event['user']['telegram_id'], event['concerts'][0]['title']) for event in routed]
+            assert routed_events == [event for event in events if get_shard(event[0], 2) == shard]
+
+    asyncio.run(run())
+
+
+def test_broadcast_is_handled_by_its_own_callback(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def run() -> None:
+        amqp = FakeAMQP()
+        broadcasts: list[list[int]] = []
+
+        async def on_message(event: BrokerEvent) -> None:
+            raise AssertionError('Broadcast is handled as an event of a user')
+
+        async def on_broadcast(event: BroadcastEvent) -> None:
+            broadcasts.append(event.telegram_ids)
+
+        _, task = await start_broker(amqp, monkeypatch,
+                                     lambda broker: broker.start_listening(on_message, on_error, on_broadcast))
+        amqp.put(QUEUE_NAME, create_broadcast_body([1, 2, 3]), message_type=BROADCAST_EVENT_TYPE)
+        await wait_until(lambda: len(amqp.acked) == 1)
+        await stop(task)
+
+        assert broadcasts == [[1, 2, 3]]
+
+    asyncio.run(run())
+
+
+def test_broadcast_recipients_are_split_between_shard_queues(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def run() -> None:
+        amqp = FakeAMQP()
+        _, task = await start_broker(amqp, monkeypatch, lambda broker: broker.start_routing(2, on_error))
+        telegram_ids = list(range(1, 11))
+        amqp.put(QUEUE_NAME, create_broadcast_body(telegram_ids), message_type=BROADCAST_EVENT_TYPE)
+        await wait_until(lambda: len(amqp.acked) == 1)
+        await stop(task)
+
+        for shard in (0, 1):
+            published = amqp.get_published(get_shard_queue_name(QUEUE_NAME, shard))
+            assert len(published) == 1
+            assert published[0].type == BROADCAST_EVENT_TYPE
+            broadcast = json.loads(published[0].body)
+            assert broadcast['telegram_ids'] == [telegram_id for telegram_id in telegram_ids
+                                                 if get_shard(telegram_id, 2) == shard]
+            assert broadcast['concerts'][0]['title'] == 'concert'
+
+    asyncio.run(run())
@@ -0,0 +1,25 @@
+import asyncio
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from redis_connection import InstrumentedConnectionPool
+
+
+def test_failed_connects_are_not_counted_as_connections_in_use() -> None:
+    async def run() -> None:
+        # Nothing listens on the port, so every acquired connection fails to connect.
+        pool = InstrumentedConnectionPool(host='127.0.0.1', port=1, max_connections=2, timeout=0.1,
+                                          socket_connect_timeout=0.1)
+        for _ in range(3):
+            with pytest.raises(RedisConnectionError):
+                await pool.get_connection()
+
+        statistics = pool.get_statistics()
+        assert statistics.in_use_connections == 0
+        assert statistics.acquired_count == 0
+        assert statistics.failed_count == 3
+        assert statistics.max_wait_time > 0
+        await pool.disconnect()
+
+    asyncio.run(run())
@@ -0,0 +1,47 @@
+import asyncio
+from typing import Any
+
+from aiogram import Bot
+from aiogram.methods import DeleteMessage, EditMessageText, SendChatAction, SendMessage, TelegramMethod
+
+from services.send_governor import SendGovernorMiddleware
+from services.send_governor.impl.redis_send_governor import RedisSendGovernor
+from tests.fake_redis import FakeRedis
+
+
+def create_middleware() -> SendGovernorMiddleware:
+    # One message to a chat at once and then one per 100 seconds.
+    governor = RedisSendGovernor(FakeRedis(), global_rate=100, chat_rate=0.01, chat_burst=1,
+                                 group_messages_per_minute=20)
+    return SendGovernorMiddleware(governor)
+
+
+async def make_request(bot: Bot, method: TelegramMethod[Any]) -> Any:
+    return True
+
+
+async def request(middleware: SendGovernorMiddleware, bot: Bot, method: TelegramMethod[Any]) -> bool:
+    # Returns False if the request waits for the rate limit.
+    try:
+        await asyncio.wait_for(middleware(make_request, bot, method), timeout=0.2)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+def test_only_messages_are_counted_in_chat_limit() -> None:
+    async def run() -> list[bool]:
+        middleware = create_middleware()
+        bot = Bot(token='42:TEST')
+        methods: list[TelegramMethod[Any]] = [
+            SendMessage(chat_id=1, text='notification'),
+            EditMessageText(chat_id=1, message_id=1, text='Удалено'),
+            DeleteMessage(chat_id=1, message_id=2),
+            SendChatAction(chat_id=1, action='typing'),
+            SendMessage(chat_id=1, text='next notification'),
+        ]
+        passed = [await request(middleware, bot, method) for method in methods]
+        await bot.session.close()
+        return passed
+
+    assert asyncio.run(run()) == [True, True, True, True, False]
@@ -0,0 +1,16 @@
+from services.broker import get_shard
+
+
+def test_keys_are_moved_only_to_added_shard() -> None:
+    keys = range(1, 10_001)
+    shards = [get_shard(key, 4) for key in keys]
+    grown_shards = [get_shard(key, 5) for key in keys]
+
+    assert set(shards) == {0, 1, 2, 3}
+    assert all(grown == shard or grown == 4 for shard, grown in zip(shards, grown_shards))
+    # Every shard gets about the same share of keys.
+    assert 1_700 < grown_shards.count(4) < 2_300
+
+
+def test_single_shard_takes_all_keys() -> None:
+    assert {get_shard(key, 1) for key in (0, 1, 2 ** 40, 2 ** 64 + 5)} == {0}
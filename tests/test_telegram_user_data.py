@@ -0,0 +1,7 @@
+from model import NotificationsMode, TelegramUserData
+
+
+def test_users_saved_before_digest_mode_get_message_per_concert() -> None:
+    user_data = TelegramUserData.model_validate({'last_keyboard_id': 42})
+
+    assert user_data.notifications_mode == NotificationsMode.FULL
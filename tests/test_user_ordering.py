@@ -0,0 +1,91 @@
+import asyncio
+import datetime
+
+import fakeredis.aioredis
+from aiogram import Bot, Dispatcher, F
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Chat, Message, Update, User
+
+from bot.handlers.user_ordering import UserEventIsolation
+
+
+class FlowStates(StatesGroup):
+    A = State()
+    B = State()
+
+
+def create_update(update_id: int, user_id: int = 1) -> Update:
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id,
+        date=datetime.datetime.now(),
+        chat=Chat(id=user_id, type='private'),
+        from_user=User(id=user_id, is_bot=False, first_name='user'),
+        text='tap',
+    ))
+
+
+def create_dispatcher(isolation: UserEventIsolation, handled: list[str]) -> Dispatcher:
+    dp = Dispatcher(storage=MemoryStorage(), events_isolation=isolation)
+
+    @dp.message(FlowStates.A, F.text == 'tap')
+    async def handle_a(message: Message, state: FSMContext) -> None:
+        handled.append('A')
+        # Second update of the user arrives while the first one waits here.
+        await asyncio.sleep(0.05)
+        await state.set_state(FlowStates.B)
+
+    @dp.message(FlowStates.B, F.text == 'tap')
+    async def handle_b(message: Message, state: FSMContext) -> None:
+        handled.append('B')
+
+    return dp
+
+
+async def feed_concurrently(isolation: UserEventIsolation) -> list[str]:
+    handled: list[str] = []
+    dp = create_dispatcher(isolation, handled)
+    bot = Bot(token='42:TEST')
+    await dp.fsm.get_context(bot, chat_id=1, user_id=1).set_state(FlowStates.A)
+    await asyncio.gather(dp.feed_update(bot, create_update(1)), dp.feed_update(bot, create_update(2)))
+    await bot.session.close()
+    return handled
+
+
+def test_second_update_is_routed_by_state_of_first_one() -> None:
+    assert asyncio.run(feed_concurrently(UserEventIsolation())) == ['A', 'B']
+
+
+def test_second_update_is_routed_by_state_of_first_one_with_redis_lease() -> None:
+    redis = fakeredis.aioredis.FakeRedis()
+    assert asyncio.run(feed_concurrently(UserEventIsolation(redis=redis, retry_interval=0.01))) == ['A', 'B']
+
+
+def test_updates_of_different_users_are_not_serialized() -> None:
+    async def run() -> float:
+        isolation = UserEventIsolation()
+        dp = create_dispatcher(isolation, [])
+        bot = Bot(token='42:TEST')
+        for user_id in (1, 2):
+            await dp.fsm.get_context(bot, chat_id=user_id, user_id=user_id).set_state(FlowStates.A)
+        started_at = asyncio.get_running_loop().time()
+        await asyncio.gather(dp.feed_update(bot, create_update(1, user_id=1)),
+                             dp.feed_update(bot, create_update(2, user_id=2)))
+        await bot.session.close()
+        return asyncio.get_running_loop().time() - started_at
+
+    assert asyncio.run(run()) < 0.09
+
+
+def test_lease_is_released_after_update() -> None:
+    async def run() -> None:
+        redis = fakeredis.aioredis.FakeRedis()
+        isolation = UserEventIsolation(redis=redis)
+        async with isolation.lock(key=StorageKey(bot_id=42, chat_id=7, user_id=7)):
+            assert await redis.exists('user-lock:7') == 1
+        assert await redis.exists('user-lock:7') == 0
+        assert isolation.get_statistics().locked_users_count == 0
+
+    asyncio.run(run())
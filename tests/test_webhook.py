@@ -0,0 +1,58 @@
+import asyncio
+import datetime
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Message
+from aiohttp.test_utils import TestClient, TestServer
+
+from bot.webhook import create_webhook_app
+from settings import Settings
+from tests.fake_bot import RecordingSession
+
+SECRET = 'secret'
+
+
+def create_update(update_id: int) -> dict:
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(datetime.datetime.now().timestamp()),
+            'chat': {'id': update_id, 'type': 'private'},
+            'from': {'id': update_id, 'is_bot': False, 'first_name': 'user'},
+            'text': 'text',
+        },
+    }
+
+
+def test_updates_are_handled_with_limited_concurrency_only_with_secret() -> None:
+    async def run() -> tuple[list[int], list[int], list[int]]:
+        dp = Dispatcher()
+        handled: list[int] = []
+        handling_counts: list[int] = []
+        handling_count = 0
+
+        @dp.message()
+        async def handle(message: Message) -> None:
+            nonlocal handling_count
+            handling_count += 1
+            handling_counts.append(handling_count)
+            await asyncio.sleep(0.01)
+            handled.append(message.message_id)
+            handling_count -= 1
+
+        settings = Settings(webhook_secret=SECRET, webhook_max_connections=1)
+        app = create_webhook_app(dp, Bot(token='42:TEST', session=RecordingSession()), settings)
+        async with TestClient(TestServer(app)) as client:
+            headers = {'X-Telegram-Bot-Api-Secret-Token': SECRET}
+            responses = await asyncio.gather(*[client.post(settings.webhook_path, json=create_update(update_id),
+                                                           headers=headers)
+                                               for update_id in (1, 2, 3)])
+            unauthorized = await client.post(settings.webhook_path, json=create_update(4))
+        return sorted(handled), handling_counts, [response.status for response in [*responses, unauthorized]]
+
+    handled, handling_counts, statuses = asyncio.run(run())
+
+    assert handled == [1, 2, 3]
+    assert handling_counts == [1, 1, 1]
+    assert statuses == [200, 200, 200, 401]
@@ -1,8 +1,20 @@
 from aiogram import Bot
 from aiogram.client.default import DefaultBotProperties
+from redis.asyncio import Redis
 
+from services.send_governor import SendGovernorMiddleware
+from services.send_governor.impl.redis_send_governor import RedisSendGovernor
 from settings import Settings
 
 
-def create_bot(settings: Settings) -> Bot:
-    return Bot(token=settings.bot_token, default=DefaultBotProperties())
+def create_bot(settings: Settings, redis: Redis) -> Bot:
+    bot = Bot(token=settings.bot_token, default=DefaultBotProperties())
+    governor = RedisSendGovernor(
+        redis=redis,
+        global_rate=settings.telegram_global_rate,
+        chat_rate=settings.telegram_chat_rate,
+        chat_burst=settings.telegram_chat_burst,
+        group_messages_per_minute=settings.telegram_group_messages_per_minute,
+    )
+    bot.session.middleware(SendGovernorMiddleware(governor))
+    return bot
@@ -0,0 +1,50 @@
+import logging
+import multiprocessing
+import signal
+from multiprocessing.process import BaseProcess
+from typing import Callable
+
+root_logger = logging.getLogger('root')
+
+
+def start_workers(target: Callable[[int], None], indexes: list[int], name_prefix: str) -> list[BaseProcess]:
+    """
+    Starts a spawned worker process for every index.
+
+    :param target: module level function running a worker, it is called with the index of the worker
+    :param indexes: indexes of workers to start
+    :param name_prefix: prefix of names of worker processes
+    :return: started worker processes
+    """
+
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=_run_worker, args=(target, index), name=f'{name_prefix}-{index}')
+               for index in indexes]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+def stop_workers(workers: list[BaseProcess], timeout: float) -> None:
+    """
+    Stops workers by SIGTERM, workers not stopped in time are killed.
+
+    :param workers: worker processes
+    :param timeout: seconds for a worker to finish work being done
+    """
+
+    for worker in workers:
+        if worker.is_alive():
+            worker.terminate()
+    for worker in workers:
+        worker.join(timeout=timeout)
+        if worker.is_alive():
+            root_logger.warning(f'Worker {worker.name} is not stopped in time, killing it')
+            worker.kill()
+            worker.join()
+
+
+def _run_worker(target: Callable[[int], None], index: int) -> None:
+    # Interruption from terminal is handled by the launcher, workers are stopped by SIGTERM after it.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    target(index)